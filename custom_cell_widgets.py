@@ -1,10 +1,15 @@
 # coding:utf-8
-# QTableWidget举例，控制场景中所有物体的显示，位移
+# QTableView举例，控制场景中所有物体的显示，位移
+import array
+import collections
+import contextlib
+
 from PySide2 import QtCore
 from PySide2 import QtWidgets
 from PySide2 import QtGui
 from shiboken2 import wrapInstance
 import maya.OpenMayaUI as omui
+import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
 
@@ -13,10 +18,560 @@ def maya_main_window():
     return wrapInstance(long(main_window_ptr), QtWidgets.QWidget)
 
 
-class TableExampleDialog(QtWidgets.QDialog):
+def float_to_string(value):
+    return "{0:.4f}".format(value)  # 令浮点数变成保留四位数的字符串
+
+
+class MeshTableModel(QtCore.QAbstractTableModel):
+    """ 场景中所有mesh的transform，数据按列保存，分块读取，第一页读取完成后就可以显示 """
+
+    VISIBILITY_COLUMN = 0
+    NAME_COLUMN = 1
+    TRANSLATE_X_COLUMN = 2
+
+    HEADER_LABELS = ["", "Name", "TransX", "TransY", "TransZ"]
+    TRANSLATE_ATTRIBUTES = ["tx", "ty", "tz"]
+
+    FIRST_PAGE_SIZE = 200  # 刷新时立即读取的行数，足够填满一屏
+    CHUNK_SIZE = 1000  # 之后每次空闲时读取的行数
+
+    loading_progress = QtCore.Signal(int, int)  # 已经读取的数量, 总数
+
+    def __init__(self, parent=None):
+        super(MeshTableModel, self).__init__(parent)
+
+        self.paths = []  # transform的长路径
+        self.nodes = []  # transform的MObjectHandle，用于注册回调和重新读取
+        self.translates = array.array("d")  # 每行三个值: x0, y0, z0, x1, y1, z1...
+        self.visibilities = array.array("b")
+        self.pending_paths = []  # 还没有读取属性的transform
+
+        self.load_timer = QtCore.QTimer(self)
+        self.load_timer.setInterval(0)  # 处理完界面事件后马上读取下一块
+        self.load_timer.timeout.connect(self.load_next_chunk)
+
+    def refresh(self):
+        """ 一次ls得到所有mesh，transform的路径就是mesh长路径的父路径，不需要listRelatives """
+        self.load_timer.stop()
+        mesh_paths = cmds.ls(typ="mesh", long=True) or []
+        transform_paths = collections.OrderedDict.fromkeys(path.rsplit("|", 1)[0] for path in mesh_paths) # 一个transform下可能有多个mesh
+
+        self.beginResetModel()
+        self.paths = []
+        self.nodes = []
+        self.translates = array.array("d")
+        self.visibilities = array.array("b")
+        self.pending_paths = list(transform_paths)
+        self.endResetModel()
+
+        self.load_chunk(self.FIRST_PAGE_SIZE)
+        if self.pending_paths:
+            self.load_timer.start()
+
+    def cancel_loading(self):
+        self.load_timer.stop()
+        self.pending_paths = []
+
+    def is_loading(self):
+        return bool(self.pending_paths)
+
+    def load_next_chunk(self):
+        self.load_chunk(self.CHUNK_SIZE)
+        if not self.pending_paths:
+            self.load_timer.stop()
+
+    def load_chunk(self, count):
+        """ 用一个MSelectionList读取一块transform的属性，然后一次插入所有的行 """
+        paths = self.pending_paths[:count]
+        del self.pending_paths[:count]
+
+        selection = om2.MSelectionList()
+        loaded_paths = []
+        for path in paths:
+            try:
+                selection.add(path)
+            except RuntimeError: # 读取之前节点已经被删除
+                continue
+            loaded_paths.append(path)
+
+        nodes = []
+        translates = array.array("d")
+        visibilities = array.array("b")
+        for i in range(len(loaded_paths)):
+            node = selection.getDependNode(i)
+            nodes.append(om2.MObjectHandle(node))
+            translate, visible = self.read_transform(node)
+            translates.extend(translate)
+            visibilities.append(visible)
+
+        if loaded_paths:
+            first_row = len(self.paths)
+            self.beginInsertRows(QtCore.QModelIndex(), first_row, first_row + len(loaded_paths) - 1)
+            self.paths.extend(loaded_paths)
+            self.nodes.extend(nodes)
+            self.translates.extend(translates)
+            self.visibilities.extend(visibilities)
+            self.endInsertRows()
+
+        self.loading_progress.emit(len(self.paths), len(self.paths) + len(self.pending_paths))
+
+    @staticmethod
+    def read_transform(node):
+        """ 通过plug读取位移和显示，返回((x, y, z), visibility) """
+        transform_fn = om2.MFnDependencyNode(node)
+        translate_plug = transform_fn.findPlug("translate", False)
+        translate = (translate_plug.child(0).asDouble(), translate_plug.child(1).asDouble(), translate_plug.child(2).asDouble())
+        return translate, transform_fn.findPlug("visibility", False).asBool()
+
+    def add_paths(self, paths):
+        """ 场景中新建的mesh，和刷新时一样分块读取后添加到最后 """
+        self.pending_paths.extend(paths)
+        if not self.load_timer.isActive():
+            self.load_timer.start()
+
+    def read_rows(self, rows):
+        """ 重新读取指定行的属性，只发送一次dataChanged """
+        rows = [row for row in rows if self.nodes[row].isValid()]
+        if not rows:
+            return
+
+        for row in rows:
+            translate, visible = self.read_transform(self.nodes[row].object())
+            self.translates[row * 3:row * 3 + 3] = array.array("d", translate)
+            self.visibilities[row] = visible
+        self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), self.columnCount() - 1))
+
+    def update_paths(self, rows):
+        """ 节点或者它的父级改名、重新设置父级后，通过节点重新得到长路径 """
+        rows = [row for row in rows if self.nodes[row].isValid()]
+        if not rows:
+            return
+
+        changed_rows = []
+        for row in rows:
+            path = om2.MFnDagNode(self.nodes[row].object()).fullPathName()
+            if path != self.paths[row]:
+                self.paths[row] = path
+                changed_rows.append(row)
+
+        if changed_rows:
+            self.dataChanged.emit(self.index(min(changed_rows), self.NAME_COLUMN), self.index(max(changed_rows), self.NAME_COLUMN))
+
+    def remove_rows(self, rows):
+        """ 删除已经不在场景中的节点，从后往前每段连续的行删除一次 """
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            last_row = first_row = rows.pop(0)
+            while rows and rows[0] == first_row - 1:
+                first_row = rows.pop(0)
+
+            self.beginRemoveRows(QtCore.QModelIndex(), first_row, last_row)
+            del self.paths[first_row:last_row + 1]
+            del self.nodes[first_row:last_row + 1]
+            del self.translates[first_row * 3:last_row * 3 + 3]
+            del self.visibilities[first_row:last_row + 1]
+            self.endRemoveRows()
+
+    def node_name(self, row):
+        return self.paths[row].rsplit("|", 1)[-1]
+
+    def translate(self, row):
+        return tuple(self.translates[row * 3:row * 3 + 3])
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADER_LABELS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADER_LABELS[section]
+        return None
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if index.column() == self.VISIBILITY_COLUMN:
+            return flags | QtCore.Qt.ItemIsUserCheckable  # 设置复选框
+        return flags | QtCore.Qt.ItemIsEditable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        column = index.column()
+        if column == self.VISIBILITY_COLUMN:
+            if role == QtCore.Qt.CheckStateRole:
+                return QtCore.Qt.Checked if self.visibilities[row] else QtCore.Qt.Unchecked
+
+        elif column == self.NAME_COLUMN:
+            if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+                return self.node_name(row)
+            if role == QtCore.Qt.ToolTipRole:
+                return self.paths[row]
+
+        elif role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return float_to_string(self.translates[row * 3 + column - self.TRANSLATE_X_COLUMN])
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        """ 修改时直接设置maya中的属性，设置失败时返回False，单元格保持原来的值 """
+        if not index.isValid():
+            return False
+
+        row = index.row()
+        column = index.column()
+        if column == self.VISIBILITY_COLUMN and role == QtCore.Qt.CheckStateRole:
+            return self.set_attribute(row, column, "visibility", value == QtCore.Qt.Checked)
+        if column == self.NAME_COLUMN and role == QtCore.Qt.EditRole:
+            return self.rename(row, value)
+        if column >= self.TRANSLATE_X_COLUMN and role == QtCore.Qt.EditRole:
+            try:
+                value = self.parse_value(column, value)
+            except ValueError:
+                return False
+            return self.set_attribute(row, column, self.TRANSLATE_ATTRIBUTES[column - self.TRANSLATE_X_COLUMN], value)
+        return False
+
+    def cell_value(self, row, column):
+        """ 单元格的python值: visibility为bool，名字为字符串，位移为float """
+        if column == self.VISIBILITY_COLUMN:
+            return bool(self.visibilities[row])
+        if column == self.NAME_COLUMN:
+            return self.node_name(row)
+        return self.translates[row * 3 + column - self.TRANSLATE_X_COLUMN]
+
+    def parse_value(self, column, text):
+        """ 把粘贴的文本转换成单元格的值，不能转换时抛出ValueError """
+        text = text.strip()
+        if column == self.VISIBILITY_COLUMN:
+            if text.lower() in ("1", "true", "on", "yes"):
+                return True
+            if text.lower() in ("0", "false", "off", "no"):
+                return False
+            raise ValueError(text)
+        if column == self.NAME_COLUMN:
+            return text
+        return float(text)
+
+    def set_attribute(self, row, column, attribute, value):
+        attr_name = "{0}.{1}".format(self.paths[row], attribute)
+        try:
+            cmds.setAttr(attr_name, value)
+        except RuntimeError:  # 属性被锁定或者有连接
+            return False
+
+        new_value = cmds.getAttr(attr_name)  # 重新读取，属性可能有范围限制
+        if column == self.VISIBILITY_COLUMN:
+            self.visibilities[row] = bool(new_value)
+        else:
+            self.translates[row * 3 + column - self.TRANSLATE_X_COLUMN] = new_value
+
+        index = self.index(row, column)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def rename(self, row, new_name):
+        """ 改名后更新这一行和子节点的长路径 """
+        old_path = self.paths[row]
+        if not new_name or new_name == self.node_name(row):
+            return False
+
+        try:
+            actual_new_name = cmds.rename(old_path, new_name)
+        except RuntimeError:
+            return False
+
+        new_path = "{0}|{1}".format(old_path.rsplit("|", 1)[0], actual_new_name.rsplit("|", 1)[-1])
+        prefix = old_path + "|"
+        for child_row, path in enumerate(self.paths):
+            if path.startswith(prefix):
+                self.paths[child_row] = new_path + path[len(old_path):]
+        self.paths[row] = new_path
+
+        index = self.index(row, self.NAME_COLUMN)
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class MeshBatchEditor(object):
+    """ 批量修改多个单元格: 先在python中检查所有的值，有一个不正确就不做任何修改，
+        然后把所有setAttr放在同一个undo块中，最后只重新读取和刷新一次改变了的行。
+        名字不会批量修改，名字列的单元格会被跳过 """
+
+    def __init__(self, table_model, scene_sync=None):
+        self.table_model = table_model
+        self.scene_sync = scene_sync
+
+    def paste(self, top_row, left_column, text):
+        """ text为从表格软件复制的文本，行之间用换行分开，列之间用制表符分开，超出表格的部分被忽略 """
+        model = self.table_model
+        values = {}
+        for row_offset, line in enumerate(text.rstrip("\r\n").splitlines()):
+            row = top_row + row_offset
+            if row >= model.rowCount():
+                break
+            for column_offset, cell_text in enumerate(line.split("\t")):
+                column = left_column + column_offset
+                if column >= model.columnCount():
+                    break
+                values[(row, column)] = self.parse_cell(row, column, cell_text)
+        return self.apply("pasteMeshCells", values)
+
+    def fill(self, indexes, text):
+        """ 所有选中的单元格设置为同一个值 """
+        values = {}
+        for index in indexes:
+            values[(index.row(), index.column())] = self.parse_cell(index.row(), index.column(), text)
+        return self.apply("fillMeshCells", values)
+
+    def fill_down(self, indexes):
+        """ 每一列中选中的第一个单元格的值填充到这一列其他选中的单元格 """
+        top_rows = {}
+        for index in indexes:
+            top_rows[index.column()] = min(index.row(), top_rows.get(index.column(), index.row()))
+
+        values = {}
+        for index in indexes:
+            column = index.column()
+            values[(index.row(), column)] = self.table_model.cell_value(top_rows[column], column)
+        return self.apply("fillDownMeshCells", values)
+
+    def parse_cell(self, row, column, text):
+        try:
+            return self.table_model.parse_value(column, text)
+        except ValueError:
+            raise ValueError("Invalid {0} value in row {1}: {2!r}".format(
+                self.table_model.HEADER_LABELS[column] or "visibility", row + 1, text))
+
+    def apply(self, chunk_name, values):
+        """ values为{(行, 列): 值}，每个位移通道单独setAttr，只设置值改变了的通道，
+            一个通道被锁定或者有连接时不影响同一行的其它通道。返回(修改的行数, 有设置失败的行数) """
+        model = self.table_model
+
+        channels = {}
+        visibilities = {}
+        for (row, column), value in values.items():
+            if value == model.cell_value(row, column):
+                continue
+            if column == model.VISIBILITY_COLUMN:
+                visibilities[row] = value
+            elif column >= model.TRANSLATE_X_COLUMN:
+                channels[(row, column)] = value
+
+        changed_rows = set()
+        failed_rows = set()
+        cmds.undoInfo(openChunk=True, chunkName=chunk_name)  # 一次ctrl+z撤销所有修改
+        try:
+            with self.suppress_callbacks():  # 修改过的行在最后一次性重新读取，不需要回调
+                for (row, column), value in sorted(channels.items()):
+                    attribute = model.TRANSLATE_ATTRIBUTES[column - model.TRANSLATE_X_COLUMN]
+                    try:
+                        cmds.setAttr("{0}.{1}".format(model.paths[row], attribute), value)
+                    except RuntimeError:  # 属性被锁定或者有连接
+                        failed_rows.add(row)
+                        continue
+                    changed_rows.add(row)
+
+                for row, visible in sorted(visibilities.items()):
+                    try:
+                        cmds.setAttr("{0}.visibility".format(model.paths[row]), visible)
+                    except RuntimeError:
+                        failed_rows.add(row)
+                        continue
+                    changed_rows.add(row)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+        # 设置后的值可能被范围限制修改，undo块关闭后重新读取一次，只发送一次dataChanged
+        model.read_rows(sorted(changed_rows))
+        return len(changed_rows), len(failed_rows)
+
+    @contextlib.contextmanager
+    def suppress_callbacks(self):
+        if self.scene_sync:
+            with self.scene_sync.suppressed():
+                yield
+        else:
+            yield
+
+
+class MeshSceneSync(QtCore.QObject):
+    """ 场景改变时只更新改变了的行: 每个transform注册一个属性改变回调，回调中只记录改变了的节点，
+        由QTimer每帧最多刷新一次表格。在视图中拖动大量物体时回调只做一次判断和一次set.add """
+
+    FRAME_INTERVAL = 16  # 毫秒，每秒最多刷新60次
+
+    WATCHED_ATTRIBUTES = frozenset(["translate", "translateX", "translateY", "translateZ", "visibility"])
+
+    def __init__(self, table_model, parent=None):
+        super(MeshSceneSync, self).__init__(parent)
+
+        self.table_model = table_model
 
-    ATTR_ROLE = QtCore.Qt.UserRole
-    VALUE_ROLE = QtCore.Qt.UserRole + 1
+        self._row_by_node = {}  # MObjectHandle.hashCode() -> 行
+        self._callback_ids = {}  # MObjectHandle.hashCode() -> 属性改变回调
+        self._global_callback_ids = []
+        self._suppressed = 0
+
+        self._dirty_nodes = set()
+        self._moved_nodes = {}  # MObjectHandle.hashCode() -> MObjectHandle，改名或重新设置父级的DAG节点
+        self._removed_nodes = set()
+        self._meshes_added = False
+        self.flush_count = 0
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.FRAME_INTERVAL)
+        self._timer.timeout.connect(self.flush)
+
+        self.table_model.rowsInserted.connect(self.on_rows_inserted)
+        self.table_model.modelReset.connect(self.clear_nodes)
+
+    @contextlib.contextmanager
+    def suppressed(self):
+        """ 在with块中忽略属性改变回调，用于表格自己批量设置属性时 """
+        self._suppressed += 1
+        try:
+            yield
+        finally:
+            self._suppressed -= 1
+
+    def is_active(self):
+        return bool(self._global_callback_ids)
+
+    def start(self):
+        """ 注册全局的添加、删除、改名和重新设置父级的回调，已经读取的行注册属性改变回调 """
+        if self.is_active():
+            return
+
+        self._global_callback_ids.append(om2.MDGMessage.addNodeAddedCallback(self._on_mesh_added, "mesh"))
+        self._global_callback_ids.append(om2.MDGMessage.addNodeRemovedCallback(self._on_node_removed, "transform"))
+        self._global_callback_ids.append(om2.MNodeMessage.addNameChangedCallback(om2.MObject.kNullObj, self._on_name_changed))
+        self._global_callback_ids.append(om2.MDagMessage.addParentAddedCallback(self._on_parent_added))
+        self.on_rows_inserted(QtCore.QModelIndex(), 0, self.table_model.rowCount() - 1)
+
+    def stop(self):
+        self.clear_nodes()
+        om2.MMessage.removeCallbacks(self._global_callback_ids)
+        self._global_callback_ids = []
+
+    def on_rows_inserted(self, parent, first_row, last_row):
+        """ 新读取的行总是添加在最后 """
+        if not self.is_active():
+            return
+
+        for row in range(first_row, last_row + 1):
+            handle = self.table_model.nodes[row]
+            node_hash = handle.hashCode()
+            self._row_by_node[node_hash] = row
+            self._callback_ids[node_hash] = om2.MNodeMessage.addAttributeChangedCallback(
+                handle.object(), self._on_attribute_changed, node_hash)
+
+    def clear_nodes(self):
+        om2.MMessage.removeCallbacks(list(self._callback_ids.values()))
+        self._callback_ids = {}
+        self._row_by_node = {}
+        self.clear_changes()
+
+    def clear_changes(self):
+        self._timer.stop()
+        self._dirty_nodes = set()
+        self._moved_nodes = {}
+        self._removed_nodes = set()
+        self._meshes_added = False
+
+    def callback_count(self):
+        return len(self._callback_ids) + len(self._global_callback_ids)
+
+    def schedule(self):
+        if not self._timer.isActive():  # 不重新开始计时，连续的改变也会每帧刷新一次
+            self._timer.start()
+
+    def _on_attribute_changed(self, message, plug, other_plug, node_hash):
+        if self._suppressed or not message & om2.MNodeMessage.kAttributeSet:
+            return
+        if plug.partialName(useLongNames=True) in self.WATCHED_ATTRIBUTES:
+            self._dirty_nodes.add(node_hash)
+            self.schedule()
+
+    def _on_node_removed(self, node, client_data):
+        node_hash = om2.MObjectHandle(node).hashCode()
+        if node_hash in self._row_by_node:
+            self._removed_nodes.add(node_hash)
+            self.schedule()
+
+    def _on_name_changed(self, node, previous_name, client_data):
+        if node.hasFn(om2.MFn.kDagNode):  # 所有节点的重命名都会触发，只需要DAG节点
+            self.mark_moved(node)
+
+    def _on_parent_added(self, child, parent, client_data):
+        self.mark_moved(child.node())
+
+    def mark_moved(self, node):
+        """ 只记录节点，刷新时只更新这个节点和它下面的行的路径 """
+        handle = om2.MObjectHandle(node)
+        self._moved_nodes[handle.hashCode()] = handle
+        self.schedule()
+
+    def rows_below(self, nodes):
+        """ 节点自身和所有子孙节点中在表格里的行 """
+        rows = set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            row = self._row_by_node.get(om2.MObjectHandle(node).hashCode())
+            if row is not None:
+                rows.add(row)
+            dag_fn = om2.MFnDagNode(node)
+            stack.extend(dag_fn.child(i) for i in range(dag_fn.childCount()))
+        return rows
+
+    def _on_mesh_added(self, node, client_data):
+        self._meshes_added = True
+        self.schedule()
+
+    def flush(self):
+        """ 按删除、路径、属性、新建的顺序更新表格 """
+        self._timer.stop()
+        model = self.table_model
+        self.flush_count += 1
+
+        if self._removed_nodes:
+            removed_rows = [self._row_by_node[node_hash] for node_hash in self._removed_nodes]
+            om2.MMessage.removeCallbacks([self._callback_ids.pop(node_hash) for node_hash in self._removed_nodes])
+            self._dirty_nodes -= self._removed_nodes
+            model.remove_rows(removed_rows)
+            self._row_by_node = dict((handle.hashCode(), row) for row, handle in enumerate(model.nodes))
+
+        if self._moved_nodes:
+            moved_nodes = [handle.object() for handle in self._moved_nodes.values() if handle.isValid()]
+            model.update_paths(sorted(self.rows_below(moved_nodes)))
+
+        if self._dirty_nodes:
+            model.read_rows([self._row_by_node[node_hash] for node_hash in self._dirty_nodes])
+
+        if self._meshes_added:
+            known_paths = set(model.paths)
+            known_paths.update(model.pending_paths)
+            new_paths = collections.OrderedDict()
+            for path in cmds.ls(typ="mesh", long=True) or []:
+                transform_path = path.rsplit("|", 1)[0]
+                if transform_path not in known_paths:
+                    new_paths[transform_path] = None
+            if new_paths:
+                model.add_paths(list(new_paths))
+
+        self.clear_changes()
+
+
+class TableExampleDialog(QtWidgets.QDialog):
 
     def __init__(self, parent=maya_main_window()):
         super(TableExampleDialog, self).__init__(parent)
@@ -25,27 +580,46 @@ class TableExampleDialog(QtWidgets.QDialog):
         self.setFixedWidth(500)
         self.setWindowFlags(self.windowFlags() ^ QtCore.Qt.WindowContextHelpButtonHint)
 
+        self.create_actions()
         self.create_widgets()
         self.create_layouts()
         self.create_connections()
 
+    def create_actions(self):
+        self.copy_action = QtWidgets.QAction("Copy", self)
+        self.copy_action.setShortcut(QtGui.QKeySequence.Copy)
+        self.paste_action = QtWidgets.QAction("Paste", self)
+        self.paste_action.setShortcut(QtGui.QKeySequence.Paste)
+        self.fill_down_action = QtWidgets.QAction("Fill Down", self)
+        self.fill_down_action.setShortcut(QtGui.QKeySequence("Ctrl+D"))
+
     def create_widgets(self):
-        self.table_wdg = QtWidgets.QTableWidget()
-        self.table_wdg.setColumnCount(5)
-        self.table_wdg.setColumnWidth(0, 22)
-        self.table_wdg.setColumnWidth(2, 70)
-        self.table_wdg.setColumnWidth(3, 70)
-        self.table_wdg.setColumnWidth(4, 70)
-        self.table_wdg.setHorizontalHeaderLabels(["", "Name", "TransX", "TransY", "TransZ"])
-        header_view = self.table_wdg.horizontalHeader()
+        self.table_model = MeshTableModel(self)
+        self.scene_sync = MeshSceneSync(self.table_model, self)  # 在视图中修改物体时只更新改变了的行
+        self.batch_editor = MeshBatchEditor(self.table_model, self.scene_sync)
+
+        self.table_view = QtWidgets.QTableView()
+        self.table_view.setModel(self.table_model)
+        self.table_view.setColumnWidth(0, 22)
+        self.table_view.setColumnWidth(2, 70)
+        self.table_view.setColumnWidth(3, 70)
+        self.table_view.setColumnWidth(4, 70)
+        header_view = self.table_view.horizontalHeader()
         header_view.setSectionResizeMode(1, QtWidgets.QHeaderView.Stretch)  # 设置标题栏为自动填充窗口
+        self.table_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)  # 行高固定，行数很多时不需要计算每一行
+        for action in (self.copy_action, self.paste_action, self.fill_down_action):
+            action.setShortcutContext(QtCore.Qt.WidgetShortcut)  # 只在表格有焦点时使用快捷键
+            self.table_view.addAction(action)
+        self.table_view.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)  # 右键菜单显示这些action
 
+        self.status_label = QtWidgets.QLabel()
         self.refresh_btn = QtWidgets.QPushButton("Refresh")
         self.close_btn = QtWidgets.QPushButton("Close")
 
     def create_layouts(self):
         button_layout = QtWidgets.QHBoxLayout()
         button_layout.setSpacing(2)
+        button_layout.addWidget(self.status_label)
         button_layout.addStretch()
         button_layout.addWidget(self.refresh_btn)
         button_layout.addWidget(self.close_btn)
@@ -54,147 +628,94 @@ class TableExampleDialog(QtWidgets.QDialog):
         main_layout.setContentsMargins(2, 2, 2, 2)
         # main_layout.setSpacing(2)
         # main_layout.addStretch()
-        main_layout.addWidget(self.table_wdg)
+        main_layout.addWidget(self.table_view)
         main_layout.addLayout(button_layout)
 
     def create_connections(self):
-        self.set_cell_changed_connection_enabled(True)
+        self.table_model.loading_progress.connect(self.update_status)
+        self.copy_action.triggered.connect(self.copy_cells)
+        self.paste_action.triggered.connect(self.paste_cells)
+        self.fill_down_action.triggered.connect(self.fill_down)
         self.refresh_btn.clicked.connect(self.refresh_table)
         self.close_btn.clicked.connect(self.close)
 
-    def set_cell_changed_connection_enabled(self, enabled):  # 设置单元格信号与槽的连接状态  目的是使执行refresh时不执行槽函数
-        if enabled:
-            self.table_wdg.cellChanged.connect(self.on_cell_changed)
-        else:
-            self.table_wdg.cellChanged.disconnect(self.on_cell_changed)
-
     def showEvent(self, e):
         super(TableExampleDialog, self).showEvent(e)  # 当启动窗口时执行这个函数
+        self.scene_sync.start()
         self.refresh_table()
 
+    def closeEvent(self, e):
+        super(TableExampleDialog, self).closeEvent(e)
+        self.table_model.cancel_loading()
+        self.scene_sync.stop()
+
     def keyPressEvent(self, e):
         super(TableExampleDialog, self).keyPressEvent(e)
         e.accept()  # 当在工具窗口中使用键盘时不会影响到maya主窗口的对象
 
     def refresh_table(self):
-        self.set_cell_changed_connection_enabled(False)
-
-        self.table_wdg.setRowCount(0)  # 将tableWidget 的所有项清空
-
-        meshes = cmds.ls(typ="mesh")
-        for i in range(len(meshes)):
-            transform_name = cmds.listRelatives(meshes[i], parent=True)[0]
-            translation = cmds.getAttr("{}.translate".format(transform_name))[0]
-            visible = cmds.getAttr("{}.visibility".format(transform_name))
-
-            self.table_wdg.insertRow(i)
-            self.insert_item(i, 0, "", "visibility", visible, True)
-            self.insert_item(i, 1, transform_name, None, transform_name, False)
-            self.insert_item(i, 2, self.float_to_string(translation[0]), "tx", translation[0], False)
-            self.insert_item(i, 3, self.float_to_string(translation[1]), "ty", translation[0], False)
-            self.insert_item(i, 4, self.float_to_string(translation[2]), "tz", translation[0], False)
-
-        self.set_cell_changed_connection_enabled(True)
-
-    def insert_item(self, row, column, text, attr, value, is_boolean):
-        item = QtWidgets.QTableWidgetItem(text)
-        self.set_item_attr(item, attr)
-        self.set_item_value(item, value)
-        if is_boolean:
-            item.setFlags(QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled)  # 设置复选框
-            self.set_item_checked(item, value)
-
-        self.table_wdg.setItem(row, column, item)
-
-    def on_cell_changed(self, row, column):
-        # 单元格进行改变时先将信号与槽断开连接，当rename执行完成以后再连接起来
-        # 控制信号与槽连接状态的目的就是控制什么时候改变单元格的信息时执行槽函数
-        self.set_cell_changed_connection_enabled(False)
-
-        item = self.table_wdg.item(row, column)
-        if column == 1:
-            self.rename(item)
-        else:
-            is_boolean = column == 0
-            self.update_attr(self.get_full_attr_name(row, item), item, is_boolean)
-
-        self.set_cell_changed_connection_enabled(True)
-
-    def rename(self, item):
-        old_name = self.get_item_value(item)
-        new_name = self.get_item_text(item)
-        if old_name != new_name:
-            actual_new_name = cmds.rename(old_name, new_name)
-            if actual_new_name != new_name:
-                self.set_item_text(item, actual_new_name)
-            self.set_item_value(item, actual_new_name)
-
-    def update_attr(self, attr_name, item, is_boolean):
-        if is_boolean:
-            value = self.is_item_checked(item)
-            self.set_item_text(item, "")
-        else:
-            text = self.get_item_text(item)
-            try:
-                value = float(text)
-            except ValueError:
-                self.revert_original_value(item, is_boolean)
-                return
-        try:
-            cmds.setAttr(attr_name, value)
-        except:
-            self.revert_original_value(item, is_boolean)
-            return
+        """ 第一页读取完成后就返回，剩下的在空闲时分块读取 """
+        self.table_model.refresh()
 
-        new_value = cmds.getAttr(attr_name)
-        if is_boolean:
-            self.set_item_checked(item, new_value)
-        else:
-            self.set_item_text(item, self.float_to_string(new_value))
-        self.set_item_value(item, new_value)
-
-
-    def set_item_text(self, item, text):
-        item.setText(text)
+    def selected_indexes(self):
+        return self.table_view.selectionModel().selectedIndexes()
 
-    def get_item_text(self, item):
-        return item.text()
-
-    def set_item_checked(self, item, checked):
-        if checked:
-            item.setCheckState(QtCore.Qt.Checked)
-        else:
-            item.setCheckState(QtCore.Qt.Unchecked)
-
-    def is_item_checked(self, item):
-        return item.checkState() == QtCore.Qt.Checked
-
-    def set_item_attr(self, item, attr):
-        item.setData(self.ATTR_ROLE, attr)
-
-    def get_item_attr(self, item):
-        return item.data(self.ATTR_ROLE)
-
-    def set_item_value(self, item, value):
-        item.setData(self.VALUE_ROLE, value)
-
-    def get_full_attr_name(self, row, item):
-        node_name = self.table_wdg.item(row, 1).data(self.VALUE_ROLE)
-        attr_name = self.get_item_attr(item)
-        return "{0}.{1}".format(node_name, attr_name)
-
-    def get_item_value(self, item):
-        return item.data(self.VALUE_ROLE)
+    def copy_cells(self):
+        """ 复制为制表符分开的文本，可以粘贴到表格软件或者其他行 """
+        indexes = self.selected_indexes()
+        if not indexes:
+            return
 
-    def float_to_string(self, value):
-        return "{0:.4f}".format(value)  # 令浮点数变成保留四位数的字符串
+        rows = sorted(set(index.row() for index in indexes))
+        columns = sorted(set(index.column() for index in indexes))
+        lines = []
+        for row in rows:
+            cells = []
+            for column in columns:
+                value = self.table_model.cell_value(row, column)
+                if column == MeshTableModel.VISIBILITY_COLUMN:
+                    cells.append("1" if value else "0")
+                elif column == MeshTableModel.NAME_COLUMN:
+                    cells.append(value)
+                else:
+                    cells.append(repr(value))  # 保留完整的精度
+            lines.append("\t".join(cells))
+        QtWidgets.QApplication.clipboard().setText("\n".join(lines))
+
+    def paste_cells(self):
+        """ 只有一个值时填充所有选中的单元格，否则从选中区域的左上角开始粘贴 """
+        indexes = self.selected_indexes()
+        text = QtWidgets.QApplication.clipboard().text()
+        if not indexes or not text:
+            return
 
-    def revert_original_value(self, item, is_boolean):
-        original_value = self.get_item_value(item)
-        if is_boolean:
-            self.set_item_checked(item, original_value)
+        try:
+            if "\t" in text or "\n" in text.strip():
+                result = self.batch_editor.paste(min(index.row() for index in indexes),
+                                                 min(index.column() for index in indexes), text)
+            else:
+                result = self.batch_editor.fill(indexes, text)
+        except ValueError as e:
+            self.status_label.setText(str(e))
+            return
+        self.show_edit_result(*result)
+
+    def fill_down(self):
+        indexes = self.selected_indexes()
+        if indexes:
+            self.show_edit_result(*self.batch_editor.fill_down(indexes))
+
+    def show_edit_result(self, changed_count, failed_count):
+        message = "{0} rows changed".format(changed_count)
+        if failed_count:
+            message += ", {0} locked".format(failed_count)
+        self.status_label.setText(message)
+
+    def update_status(self, loaded_count, total_count):
+        if loaded_count < total_count:
+            self.status_label.setText("Loading {0}/{1}".format(loaded_count, total_count))
         else:
-            self.set_item_text(item, self.flate_to_string(original_value))
+            self.status_label.setText("{0} meshes".format(total_count))
 
 
 if __name__ == '__main__':
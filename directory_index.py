@@ -0,0 +1,503 @@
+# coding:utf-8
+# 文件浏览器共用的目录读取和磁盘索引: 按目录保存子节点和目录的修改时间，修改时间没变的目录再次打开时不需要重新读取
+# 还有内存中的文件名索引，用来快速模糊查找文件
+import binascii
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from PySide2 import QtCore
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir  # python2需要单独安装scandir模块
+    except ImportError:
+        scandir = None
+
+
+INDEX_FILE_NAME = "directory_index.db"
+
+
+def is_ignored(file_name):
+    """ 过滤后缀为pyc的文件 """
+    return file_name.lower().endswith(".pyc")
+
+
+def list_directory(dir_path):
+    """ 返回目录下的(文件名, 是否是目录)，目录在前并且不区分大小写排序 """
+    entries = []
+    try:
+        if scandir:
+            for entry in scandir(dir_path):
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+        else:
+            for file_name in os.listdir(dir_path):
+                entries.append((file_name, os.path.isdir(os.path.join(dir_path, file_name))))
+    except OSError:  # 没有权限或者目录已经被删除
+        return []
+
+    entries = [entry for entry in entries if not is_ignored(entry[0])]
+    entries.sort(key=lambda entry: (not entry[1], entry[0].lower()))
+    return entries
+
+
+def has_children(dir_path):
+    """ 读到第一个子节点就返回，只用来决定是否显示展开的箭头 """
+    try:
+        if scandir:
+            for entry in scandir(dir_path):
+                if not is_ignored(entry.name):
+                    return True
+        else:
+            for file_name in os.listdir(dir_path):
+                if not is_ignored(file_name):
+                    return True
+    except OSError:
+        pass
+    return False
+
+
+def join_path(dir_path, file_name):
+    return "{0}/{1}".format(dir_path, file_name)
+
+
+class DirectoryIndex(object):
+    """ 保存在sqlite文件中的目录索引，可以在多个线程中使用 """
+
+    # 修改时间的精度，刚修改过的目录在同一个时间单位内可能还会变化，这时不保存到索引
+    MTIME_RESOLUTION = 2.0
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = None
+        self.lock = threading.Lock()
+
+        self.listed_count = 0  # 从磁盘读取的目录数量
+        self.cached_count = 0  # 直接使用索引的目录数量
+
+    def open(self):
+        if self.connection is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.isdir(db_dir):
+                os.makedirs(db_dir)
+
+            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.connection.execute("PRAGMA synchronous=OFF")  # 索引丢失了只需要重新读取目录
+            self.connection.execute("CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime REAL, entries TEXT)")
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def clear(self):
+        with self.lock:
+            self.open().execute("DELETE FROM directories")
+            self.connection.commit()
+
+    @staticmethod
+    def directory_mtime(dir_path):
+        """ 目录不存在时返回None """
+        try:
+            return os.stat(dir_path).st_mtime
+        except OSError:
+            return None
+
+    def is_recent(self, mtime):
+        """ 刚修改过的目录在同一个时间单位内可能还会变化，修改时间不能说明内容没变 """
+        return mtime is None or time.time() - mtime < self.MTIME_RESOLUTION
+
+    def read_entry(self, dir_path, file_name, is_dir):
+        """ 返回保存到索引中的(文件名, 是否是目录, 是否有子节点, 子目录的修改时间)
+        先读取修改时间再检查子节点，中间有变化时修改时间对不上，下次会重新检查 """
+        if not is_dir:
+            return (file_name, False, False, None)
+        child_path = join_path(dir_path, file_name)
+        mtime = self.directory_mtime(child_path)
+        return (file_name, True, has_children(child_path), mtime)
+
+    def cached_entries(self, dir_path, mtime):
+        """ 修改时间和索引中的一样时返回[(文件名, 是否是目录, 是否有子节点), ...]，否则返回None
+
+        子目录中添加或删除文件只改变子目录的修改时间，所以每个子目录都要和保存的修改时间比较，变化了只重新检查这一个子目录
+        """
+        with self.lock:
+            row = self.open().execute("SELECT mtime, entries FROM directories WHERE path=?", (dir_path,)).fetchone()
+        if row is None or row[0] != mtime:
+            return None
+
+        entries = json.loads(row[1])
+        changed = False
+        for index, entry in enumerate(entries):
+            if len(entry) != 4:  # 旧的索引没有保存子目录的修改时间
+                return None
+            file_name, is_dir, dir_has_children, child_mtime = entry
+            if is_dir:
+                current_mtime = self.directory_mtime(join_path(dir_path, file_name))
+                if current_mtime != child_mtime or self.is_recent(current_mtime):
+                    entries[index] = self.read_entry(dir_path, file_name, is_dir)
+                    changed = True
+
+        self.cached_count += 1
+        if changed:
+            self.write(dir_path, mtime, entries)
+        return [tuple(entry[:3]) for entry in entries]
+
+    def store(self, dir_path, mtime, entries):
+        """ entries是read_entry返回的[(文件名, 是否是目录, 是否有子节点, 子目录的修改时间), ...] """
+        self.listed_count += 1
+        if not self.is_recent(mtime):
+            self.write(dir_path, mtime, entries)
+
+    def write(self, dir_path, mtime, entries):
+        with self.lock:
+            self.open().execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                                (dir_path, mtime, json.dumps(entries, separators=(",", ":"))))
+            self.connection.commit()
+
+    def list_directory(self, dir_path):
+        """ 返回[(文件名, 是否是目录, 是否有子节点), ...]，只有修改时间变化的目录才从磁盘读取 """
+        mtime = self.directory_mtime(dir_path)
+        if mtime is None:
+            return []
+
+        entries = self.cached_entries(dir_path, mtime)
+        if entries is None:
+            entries = [self.read_entry(dir_path, file_name, is_dir) for file_name, is_dir in list_directory(dir_path)]
+            self.store(dir_path, mtime, entries)
+            entries = [entry[:3] for entry in entries]
+        return entries
+
+
+class DirectoryScanner(QtCore.QObject):
+    """ 在后台线程中读取目录，分批把结果发送给界面，信号跨线程时会自动排队到主线程 """
+
+    # 所有信号的第一个参数都是请求时的generation，界面用它忽略已经取消的结果
+    entries_found = QtCore.Signal(int, str, object)  # 目录路径, [(文件名, 文件路径, 是否是目录, 是否有子节点), ...]
+    progress_changed = QtCore.Signal(int, str, int, int)  # 目录路径, 已经处理的数量, 总数
+    paths_found = QtCore.Signal(int, str, object)  # 根目录路径, [文件路径, ...]
+    finished = QtCore.Signal(int, str, bool)  # 目录路径, 是否被取消
+
+    BATCH_SIZE = 1000
+    BATCH_INTERVAL = 0.05  # 秒，结果不够一批时最多等待这么久也要发送
+
+    def __init__(self, directory_index=None, parent=None):
+        super(DirectoryScanner, self).__init__(parent)
+
+        self.directory_index = directory_index  # 修改时间没变的目录直接使用索引中的结果
+        self.generation = 0
+
+    def cancel(self):
+        """ 可以在任意线程调用，正在读取和排队中的目录都会停止 """
+        self.generation += 1
+
+    @QtCore.Slot(str, int)
+    def scan(self, dir_path, generation):
+        """ 只读取一层，子目录只检查是否有内容，展开时再读取 """
+        if generation != self.generation:
+            self.finished.emit(generation, dir_path, True)
+            return
+
+        mtime = None
+        entries = None
+        if self.directory_index:
+            mtime = self.directory_index.directory_mtime(dir_path)
+            entries = self.directory_index.cached_entries(dir_path, mtime)
+        from_index = entries is not None
+        if not from_index:
+            entries = list_directory(dir_path)
+
+        found_entries = []  # 从磁盘读取时保存到索引的结果
+        batch = []
+        last_emit_time = time.time()
+        for index, entry in enumerate(entries):
+            if generation != self.generation:
+                self.finished.emit(generation, dir_path, True)
+                return
+
+            file_path = join_path(dir_path, entry[0])
+            if from_index:
+                file_name, is_dir, dir_has_children = entry
+            elif self.directory_index:
+                found_entry = self.directory_index.read_entry(dir_path, entry[0], entry[1])
+                file_name, is_dir, dir_has_children = found_entry[:3]
+                found_entries.append(found_entry)
+            else:
+                file_name, is_dir = entry
+                dir_has_children = is_dir and has_children(file_path)
+
+            batch.append((file_name, file_path, is_dir, dir_has_children))
+            if len(batch) >= self.BATCH_SIZE or time.time() - last_emit_time >= self.BATCH_INTERVAL:
+                self.entries_found.emit(generation, dir_path, batch)
+                self.progress_changed.emit(generation, dir_path, index + 1, len(entries))
+                batch = []
+                last_emit_time = time.time()
+
+        if self.directory_index and not from_index:
+            self.directory_index.store(dir_path, mtime, found_entries)
+
+        if batch:
+            self.entries_found.emit(generation, dir_path, batch)
+        self.progress_changed.emit(generation, dir_path, len(entries), len(entries))
+        self.finished.emit(generation, dir_path, False)
+
+    @QtCore.Slot(str, int)
+    def crawl(self, root_path, generation):
+        """ 读取根目录下所有的文件给搜索使用，不跟随链接的目录，避免循环 """
+        dir_paths = [root_path]
+        batch = []
+        last_emit_time = time.time()
+        while dir_paths:
+            if generation != self.generation:
+                self.finished.emit(generation, root_path, True)
+                return
+
+            dir_path = dir_paths.pop()
+            if self.directory_index:
+                entries = self.directory_index.list_directory(dir_path)
+            else:
+                entries = [(file_name, is_dir, is_dir) for file_name, is_dir in list_directory(dir_path)]
+
+            for file_name, is_dir, dir_has_children in entries:
+                file_path = join_path(dir_path, file_name)
+                if not is_dir:
+                    batch.append(file_path)
+                elif dir_has_children and not os.path.islink(file_path):  # 空目录不需要读取
+                    dir_paths.append(file_path)
+
+            if len(batch) >= self.BATCH_SIZE or time.time() - last_emit_time >= self.BATCH_INTERVAL:
+                self.paths_found.emit(generation, root_path, batch)
+                batch = []
+                last_emit_time = time.time()
+
+        if batch:
+            self.paths_found.emit(generation, root_path, batch)
+        self.finished.emit(generation, root_path, False)
+
+
+BIT_MASKS = [1 << bit for bit in range(8)]
+
+
+def bits_to_int(bits):
+    """ bytearray转成python的整数，bits[0]的最低位是整数的第0位 """
+    if hasattr(int, "from_bytes"):
+        return int.from_bytes(bits, "little")
+    return int(binascii.hexlify(bytes(bits[::-1])) or b"0", 16)  # python2没有int.from_bytes
+
+
+class FuzzyPathIndex(object):
+    """ 内存中的文件名索引，按文件名的三元组(trigram)和单词开头查找，有错字或者只输入一部分也可以找到
+
+    只能在一个线程中使用，后台线程读取到的路径通过信号分批交给add_paths
+    很多文件都有的三元组同时保存一份位图，查找时用python整数的位运算一次统计所有文件，不逐个id计数
+    """
+
+    MAX_RESULTS = 200
+    MATCH_RATIO = 0.6  # 至少包含查询中这个比例的三元组才算匹配
+
+    # 三元组的id数量超过文件数量的1/32时使用位图，低于1/64时删除位图，位图占用的内存不会超过id列表
+    BITMAP_RATIO = 32
+    SPARSE_RATIO = 64
+    BITMAP_STEP_MASK = 1023  # 每1024个id检查一次，更少的id直接从列表创建位图也很快
+
+    NAME_START = "\0"  # 文件名开头，"\0li"表示文件名以li开头
+    WORD_START = "/"  # 单词开头，文件名中不会出现"/"，"/pa"表示有单词以pa开头
+
+    WORD_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+")  # 按下划线、大小写和数字拆分单词
+
+    ONE_BIT_RE = re.compile("1")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.paths = []  # id -> 文件路径，删除后为None
+        self.name_lengths = []  # id -> 文件名长度，排序用
+        self.path_ids = {}  # 文件路径 -> id
+        self.grams = {}  # 三元组 -> [id, ...]
+        self.gram_bitmaps = {}  # 很多文件都有的三元组 -> [bytearray, 已经添加的id数量]，第id位表示文件是否有这个三元组
+        self.removed_count = 0
+
+    def __len__(self):
+        return len(self.path_ids)
+
+    @classmethod
+    def name_grams(cls, file_name):
+        lower_name = file_name.lower()
+        grams = set([lower_name[i:i + 3] for i in range(len(lower_name) - 2)])
+        grams.add(cls.NAME_START + lower_name[:1])
+        grams.add(cls.NAME_START + lower_name[:2])
+
+        for word in cls.WORD_RE.findall(os.path.splitext(file_name)[0]):  # 后缀名不算单词，不然所有文件都有py开头的单词
+            word = word.lower()
+            grams.add(cls.WORD_START + word[:1])
+            grams.add(cls.WORD_START + word[:2])
+        return grams
+
+    @classmethod
+    def query_grams(cls, query):
+        """ 查询的三元组，加上开头的两个字符，在文件名或者单词开头匹配的分数更高 """
+        grams = set([query[i:i + 3] for i in range(len(query) - 2)])
+        grams.add(cls.NAME_START + query[:2])
+        grams.add(cls.WORD_START + query[:2])
+        return grams
+
+    def add_paths(self, paths):
+        """ 增量更新，已经存在的路径会被忽略 """
+        for path in paths:
+            if path in self.path_ids:
+                continue
+
+            path_id = len(self.paths)
+            file_name = path.rsplit("/", 1)[-1]
+            self.paths.append(path)
+            self.name_lengths.append(len(file_name))
+            self.path_ids[path] = path_id
+            for gram in self.name_grams(file_name):
+                ids = self.grams.get(gram)
+                if ids is None:
+                    self.grams[gram] = [path_id]
+                    continue
+
+                ids.append(path_id)
+                # 每添加BITMAP_STEP个id才检查一次是否需要位图，不为每个id查找位图
+                if not len(ids) & self.BITMAP_STEP_MASK and len(ids) * self.BITMAP_RATIO > path_id:
+                    self.gram_bitmaps.setdefault(gram, [bytearray(), 0])
+
+        self.update_bitmaps()
+
+    def update_bitmaps(self):
+        """ 每批路径添加完以后，把位图中还没有的id一起加上，已经不常见的三元组删除位图 """
+        size = (len(self.paths) >> 3) + 1
+        for gram, bitmap in list(self.gram_bitmaps.items()):
+            ids = self.grams[gram]
+            if len(ids) * self.SPARSE_RATIO < len(self.paths):
+                del self.gram_bitmaps[gram]
+                continue
+
+            bits, bit_count = bitmap
+            if len(bits) < size:
+                bits.extend(bytearray(size - len(bits)))
+            for path_id in ids[bit_count:]:
+                bits[path_id >> 3] |= BIT_MASKS[path_id & 7]
+            bitmap[1] = len(ids)
+
+    def remove_paths(self, paths):
+        """ 只做标记，删除的数量超过剩下的数量时再重建索引 """
+        for path in paths:
+            path_id = self.path_ids.pop(path, None)
+            if path_id is not None:
+                self.paths[path_id] = None
+                self.removed_count += 1
+
+        if self.removed_count > len(self.path_ids):
+            paths = [path for path in self.paths if path is not None]
+            self.clear()
+            self.add_paths(paths)
+
+    def remove_directory(self, dir_path):
+        """ 删除目录下所有的文件 """
+        prefix = dir_path.rstrip("/") + "/"
+        self.remove_paths([path for path in self.path_ids if path.startswith(prefix)])
+
+    def search(self, query, limit=None):
+        """ 返回按匹配程度排序的文件路径 """
+        limit = limit or self.MAX_RESULTS
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        if len(query) < 3:
+            # 一两个字符时没有三元组，文件名开头匹配的在前，然后是单词开头匹配的
+            levels = [self.grams.get(self.NAME_START + query, []), self.grams.get(self.WORD_START + query, [])]
+        else:
+            levels = self.count_levels(query, limit)
+
+        results = []
+        found = set()
+        for path_ids in levels:
+            if self.removed_count:
+                path_ids = [path_id for path_id in path_ids if self.paths[path_id] is not None]
+            if found:
+                path_ids = [path_id for path_id in path_ids if path_id not in found]
+            # 同一级中文件名短的在前，只排序需要显示的部分，然后把包含完整查询字符串的排在前面
+            paths = [self.paths[path_id] for path_id in
+                     heapq.nsmallest(limit - len(results), path_ids, key=self.name_lengths.__getitem__)]
+            paths.sort(key=lambda path: query not in path.rsplit("/", 1)[-1].lower())
+            results.extend(paths)
+            found.update(path_ids)
+            if len(results) >= limit:
+                break
+        return results
+
+    def count_levels(self, query, limit):
+        """ 按匹配的三元组数量从多到少返回[[id, ...], ...]，只返回足够显示的几级 """
+        need = max(1, int(math.ceil((len(query) - 2) * self.MATCH_RATIO)))  # 开头的两个不是必须匹配的
+        grams = self.query_grams(query)
+        planes = self.count_planes(grams)
+
+        # 从最多的数量开始，用每一位是0还是1选出匹配数量正好是level的文件，累加到足够显示为止
+        all_bits = (1 << len(self.paths)) - 1
+        levels = []
+        total = 0
+        for level in range(min(len(grams), (1 << len(planes)) - 1), need - 1, -1):
+            mask = all_bits
+            for bit, plane in enumerate(planes):
+                mask &= plane if level >> bit & 1 else ~plane
+                if not mask:
+                    break
+            if mask:
+                path_ids = self.bit_positions(mask)
+                levels.append(path_ids)
+                total += len(path_ids)
+                if total >= limit:
+                    break
+        return levels
+
+    def count_planes(self, grams):
+        """ 每个文件包含多少个grams中的三元组，按二进制位分开保存: planes[k]的第id位是文件id的数量的第k位
+
+        每个三元组的位图像加法器一样逐位加上去，每次运算都处理所有文件，不需要为每个文件计数
+        """
+        planes = []
+        for gram in grams:
+            carry = self.gram_bits(gram)
+            for bit, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[bit], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        return planes
+
+    def gram_bits(self, gram):
+        """ 三元组的位图转成的整数，不常见的三元组没有保存位图，从id列表创建 """
+        bitmap = self.gram_bitmaps.get(gram)
+        if bitmap is None:
+            return bits_to_int(self.ids_to_bits(self.grams.get(gram, ())))
+        return bits_to_int(bitmap[0])
+
+    @staticmethod
+    def ids_to_bits(ids):
+        bits = bytearray((ids[-1] >> 3) + 1 if ids else 0)  # id列表是从小到大添加的
+        for path_id in ids:
+            bits[path_id >> 3] |= 1 << (path_id & 7)
+        return bits
+
+    @classmethod
+    def bit_positions(cls, number):
+        """ 整数中为1的位，从小到大 """
+        return [match.start() for match in cls.ONE_BIT_RE.finditer(bin(number)[:1:-1])]
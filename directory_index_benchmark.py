@@ -0,0 +1,170 @@
+# coding:utf-8
+# 目录索引性能测试: 在10万个文件的目录树上对比第一次打开(没有索引)和再次打开(使用索引)的耗时
+# 在maya的脚本编辑器中: import directory_index_benchmark; directory_index_benchmark.main()
+# 在maya外(需要PySide2): python directory_index_benchmark.py
+import os
+import shutil
+import tempfile
+import time
+
+from PySide2 import QtCore
+from PySide2 import QtWidgets
+
+import fake_maya
+fake_maya.install_if_missing()
+
+import directory_index
+import tree_view_dialog
+
+
+def create_tree(root_path, group_count=20, dirs_per_group=50, files_per_dir=100):
+    """ 创建group_count * dirs_per_group * files_per_dir个文件，每个目录还有一个会被过滤掉的pyc文件 """
+    dir_paths = []
+    for group_index in range(group_count):
+        group_path = os.path.join(root_path, "group{0}".format(group_index))
+        for dir_index in range(dirs_per_group):
+            dir_path = os.path.join(group_path, "dir{0}".format(dir_index))
+            os.makedirs(dir_path)
+            for file_index in range(files_per_dir):
+                open(os.path.join(dir_path, "file{0}.py".format(file_index)), "w").close()
+            open(os.path.join(dir_path, "file0.pyc"), "w").close()
+            dir_paths.append(dir_path)
+        dir_paths.append(group_path)
+    dir_paths.append(root_path)
+
+    # 刚修改过的目录不会保存到索引，把修改时间改成一小时前，相当于已经存在的项目目录
+    old_time = time.time() - 3600
+    for dir_path in dir_paths:
+        os.utime(dir_path, (old_time, old_time))
+    return group_count * dirs_per_group * files_per_dir
+
+
+def walk(index, dir_path):
+    """ 读取所有目录，返回文件数量 """
+    file_count = 0
+    for file_name, is_dir, dir_has_children in index.list_directory(dir_path):
+        if is_dir:
+            file_count += walk(index, directory_index.join_path(dir_path, file_name))
+        else:
+            file_count += 1
+    return file_count
+
+
+def touch_directories(root_path, count):
+    """ 在几个目录里添加文件，只有这些目录的修改时间会变化 """
+    changed_time = time.time() - 1800
+    for dir_index in range(count):
+        dir_path = os.path.join(root_path, "group{0}".format(dir_index), "dir{0}".format(dir_index))
+        open(os.path.join(dir_path, "added.py"), "w").close()
+        os.utime(dir_path, (changed_time, changed_time))
+
+
+def fetch_all(model, parent=QtCore.QModelIndex()):
+    """ 相当于在TreeViewDialog中展开所有目录，返回创建的行数 """
+    if model.canFetchMore(parent):
+        model.fetchMore(parent)
+    count = model.rowCount(parent)
+    for row in range(model.rowCount(parent)):
+        count += fetch_all(model, model.index(row, 0, parent))
+    return count
+
+
+def check_stale_children(temp_dir):
+    """ 空的子目录中添加文件后，只有子目录的修改时间变化，父目录的索引中也要知道它有子节点了 """
+    root_path = os.path.join(temp_dir, "stale").replace("\\", "/")
+    sub_path = os.path.join(root_path, "empty_sub")
+    os.makedirs(sub_path)
+    old_time = time.time() - 3600
+    for dir_path in (sub_path, root_path):
+        os.utime(dir_path, (old_time, old_time))
+    db_path = os.path.join(temp_dir, "stale.db")
+
+    index = directory_index.DirectoryIndex(db_path)
+    assert index.list_directory(root_path) == [("empty_sub", True, False)], index.list_directory(root_path)
+    index.close()
+
+    open(os.path.join(sub_path, "added.py"), "w").close()
+    os.utime(sub_path, (old_time + 60, old_time + 60))
+    assert directory_index.has_children(sub_path)
+
+    index = directory_index.DirectoryIndex(db_path)
+    assert index.list_directory(root_path) == [("empty_sub", True, True)], index.list_directory(root_path)
+    assert index.cached_count == 1 and index.listed_count == 0
+    index.close()
+
+    index = directory_index.DirectoryIndex(db_path)
+    model = tree_view_dialog.IndexedFileSystemModel(index)
+    model.setRootPath(root_path)
+    fetch_all(model, QtCore.QModelIndex())
+    assert model.hasChildren(model.index(0, 0)) and fetch_all(model) == 2
+
+    found = []
+    scanner = directory_index.DirectoryScanner(index)
+    scanner.entries_found.connect(lambda generation, dir_path, entries: found.extend(entries))
+    scanner.scan(root_path, scanner.generation)
+    assert found == [("empty_sub", sub_path.replace("\\", "/"), True, True)], found
+    index.close()
+    print("Directory index: child added to an indexed empty subdirectory shows up in the parent - ok")
+
+
+def benchmark_walk(root_path, db_path, file_count):
+    print("Directory index walk over {0} files".format(file_count))
+    results = []
+    for name in ("cold", "warm", "warm, 5 changed"):
+        if name == "warm, 5 changed":
+            touch_directories(root_path, 5)
+
+        index = directory_index.DirectoryIndex(db_path)  # 每次都重新打开，和重新打开界面一样
+        start = time.time()
+        found_count = walk(index, root_path)
+        elapsed = time.time() - start
+        index.close()
+
+        results.append((name, elapsed, found_count))
+        print("  {0:16s} {1:.4f}s, {2:6d} files, {3:5d} dirs listed, {4:5d} from index".format(
+            name, elapsed, found_count, index.listed_count, index.cached_count))
+
+    assert results[0][2] == results[1][2] == file_count, results
+    assert results[2][2] == file_count + 5, results
+
+
+def benchmark_tree_view(root_path, db_path):
+    """ TreeViewDialog使用的模式，展开所有目录 """
+    print("TreeViewDialog model, expand all")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    for name in ("cold", "warm"):
+        index = directory_index.DirectoryIndex(db_path)
+        start = time.time()
+        model = tree_view_dialog.IndexedFileSystemModel(index)
+        model.setRootPath(root_path.replace("\\", "/"))
+        model.setNameFilters(["*.py"])
+        row_count = fetch_all(model)
+        elapsed = time.time() - start
+        index.close()
+
+        print("  {0:16s} {1:.4f}s, {2:6d} rows, {3:5d} dirs listed, {4:5d} from index".format(
+            name, elapsed, row_count, index.listed_count, index.cached_count))
+
+
+def main(group_count=20, dirs_per_group=50, files_per_dir=100):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    temp_dir = tempfile.mkdtemp()
+    try:
+        root_path = os.path.join(temp_dir, "tree").replace("\\", "/")
+        db_path = os.path.join(temp_dir, directory_index.INDEX_FILE_NAME)
+
+        start = time.time()
+        file_count = create_tree(root_path, group_count, dirs_per_group, files_per_dir)
+        print("Created {0} files in {1:.2f}s".format(file_count, time.time() - start))
+
+        check_stale_children(temp_dir)
+        benchmark_walk(root_path, db_path, file_count)
+        benchmark_tree_view(root_path, db_path)
+        print("Index size: {0:.1f} KB".format(os.path.getsize(db_path) / 1024.0))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,678 @@
+# coding:utf-8
+# 性能测试用的假maya模块: 在内存中模拟场景节点，并统计每个命令的调用次数
+# 在maya中运行测试时只替换被测模块里的cmds/om2/omui，不会影响真正的maya会话
+import collections
+import sys
+import types
+import uuid as uuid_module
+
+
+LIGHT_TYPES = ["ambientLight", "directionalLight", "pointLight", "spotLight", "areaLight", "volumeLight"]
+SHAPE_TYPES = LIGHT_TYPES + ["mesh", "camera", "nurbsCurve"]
+# 复合属性的子属性: 名字 -> (复合属性, 序号)，短名字也可以使用
+CHILD_ATTRIBUTES = {"translateX": ("translate", 0), "translateY": ("translate", 1), "translateZ": ("translate", 2)}
+SHORT_ATTRIBUTE_NAMES = {"tx": "translateX", "ty": "translateY", "tz": "translateZ"}
+
+
+class FakeNode(object):
+
+    def __init__(self, name, node_type, parent=None, attributes=None):
+        self.name = name
+        self.node_type = node_type
+        self.parent = parent
+        self.children = []
+        self.uuid = str(uuid_module.uuid4()).upper()
+        self.attributes = dict(attributes or {})
+        self.locked_attributes = set() # cmds.setAttr(attr, lock=True)
+
+    def path(self):
+        names = []
+        node = self
+        while node:
+            names.append(node.name)
+            node = node.parent
+        return "|" + "|".join(reversed(names))
+
+    def hasFn(self, fn_type):
+        """ 节点同时充当MObject和MDagPath """
+        if fn_type == FakeOpenMaya.MFn.kDagNode:
+            return self.node_type == "transform" or self.node_type in SHAPE_TYPES
+        return True
+
+    def node(self):
+        return self
+
+    def fullPathName(self):
+        return self.path()
+
+
+class FakeScene(object):
+    """ 内存中的假场景 """
+
+    def __init__(self):
+        self.nodes = collections.OrderedDict()  # 节点名 -> FakeNode
+        self.nodes_by_uuid = {}
+        self.selection = []
+        self.loaded_plugins = set()  # cmds.pluginInfo(name, query=True, loaded=True)
+
+    def create_node(self, node_type, name, parent=None, **attributes):
+        parent_node = self.find(parent) if parent else None
+        node = FakeNode(name, node_type, parent_node, attributes)
+        if node_type == "transform" or node_type in SHAPE_TYPES:
+            node.attributes.setdefault("visibility", True)
+        if node_type == "transform":
+            node.attributes.setdefault("translate", (0.0, 0.0, 0.0))
+        if parent_node:
+            parent_node.children.append(node)
+        self.nodes[name] = node
+        self.nodes_by_uuid[node.uuid] = node
+        return node
+
+    def create_light(self, light_type="pointLight", name=None, parent=None, **attributes):
+        """ 创建一个transform和一个灯光shape """
+        name = name or "{0}{1}".format(light_type, len(self.nodes) + 1)
+        self.create_node("transform", name, parent=parent)
+
+        attributes.setdefault("intensity", 1.0)
+        attributes.setdefault("color", (1.0, 1.0, 1.0))
+        if light_type != "ambientLight":
+            attributes.setdefault("emitDiffuse", True)
+            attributes.setdefault("emitSpecular", True)
+        return self.create_node(light_type, "{0}Shape".format(name), parent=name, **attributes)
+
+    def delete_node(self, name):
+        node = self.find(name)
+        for child in list(node.children):
+            self.delete_node(child.name)
+        if node.parent:
+            node.parent.children.remove(node)
+        del self.nodes[node.name]
+        del self.nodes_by_uuid[node.uuid]
+
+    def rename(self, name, new_name):
+        node = self.find(name)
+        del self.nodes[node.name]
+        node.name = new_name
+        self.nodes[new_name] = node
+        return new_name
+
+    def find(self, name):
+        """ 通过名字、长路径或uuid查找节点 """
+        if isinstance(name, FakeNode):
+            return name
+        node = self.nodes.get(name.rsplit("|", 1)[-1])
+        if node and ("|" not in name or node.path() == name): # 重新设置父级后旧的长路径失效
+            return node
+        node = self.nodes_by_uuid.get(name)
+        if node:
+            return node
+        raise ValueError("No object matches name: {0}".format(name))
+
+    def is_type(self, node, node_type):
+        if node_type == "light":
+            return node.node_type in LIGHT_TYPES
+        if node_type == "shape":
+            return node.node_type in SHAPE_TYPES
+        if node_type == "dagNode":
+            return node.node_type == "transform" or node.node_type in SHAPE_TYPES
+        if node_type == "dependNode":
+            return True
+        return node.node_type == node_type
+
+
+class FakeCmds(object):
+    """ 假的maya.cmds，只实现示例中用到的命令，每次调用都会计数 """
+
+    def __init__(self, scene=None):
+        self.scene = scene or FakeScene()
+        self.call_counts = collections.Counter()
+        self.script_jobs = {}
+        self._next_job_number = 1
+        self._open_undo_chunks = 0
+        self.undo_chunk_count = 0
+        self.om2 = None # 设置为FakeOpenMaya后，修改场景时会触发注册的回调
+
+    def reset_counts(self):
+        self.call_counts.clear()
+
+    def total_calls(self):
+        return sum(self.call_counts.values())
+
+    def _count(self, command):
+        self.call_counts[command] += 1
+
+    def _split_attr(self, attr_name):
+        node_name, attribute = attr_name.split(".", 1)
+        return self.scene.find(node_name), SHORT_ATTRIBUTE_NAMES.get(attribute, attribute)
+
+    def ls(self, *args, **kwargs):
+        self._count("ls")
+        node_type = kwargs.get("typ", kwargs.get("type"))
+
+        if kwargs.get("selection", kwargs.get("sl")):
+            nodes = [self.scene.find(name) for name in self.scene.selection]
+        elif args:
+            names = args[0] if isinstance(args[0], (list, tuple)) else args
+            nodes = []
+            for name in names:
+                try:
+                    nodes.append(self.scene.find(name))
+                except ValueError:
+                    pass
+        else:
+            nodes = list(self.scene.nodes.values())
+
+        if node_type:
+            nodes = [node for node in nodes if self.scene.is_type(node, node_type)]
+        if kwargs.get("lights"):
+            nodes = [node for node in nodes if self.scene.is_type(node, "light")]
+        if kwargs.get("dagObjects", kwargs.get("dag")):
+            nodes = [node for node in nodes if self.scene.is_type(node, "dagNode")]
+        if kwargs.get("shapes"):
+            nodes = [node for node in nodes if self.scene.is_type(node, "shape")]
+        if kwargs.get("assemblies"):
+            nodes = [node for node in nodes if node.node_type == "transform" and not node.parent]
+
+        if kwargs.get("uuid"):
+            return [node.uuid for node in nodes]
+
+        result = []
+        for node in nodes:
+            result.append(node.path() if kwargs.get("long") else node.name)
+            if kwargs.get("showType"):
+                result.append(node.node_type)
+        return result
+
+    def getAttr(self, attr_name):
+        self._count("getAttr")
+        node, attribute = self._split_attr(attr_name)
+        if attribute in CHILD_ATTRIBUTES:
+            parent_attribute, child_index = CHILD_ATTRIBUTES[attribute]
+            return node.attributes[parent_attribute][child_index]
+        value = node.attributes[attribute]
+        if isinstance(value, tuple):
+            return [value]
+        return value
+
+    def setAttr(self, attr_name, *values, **kwargs):
+        self._count("setAttr")
+        node, attribute = self._split_attr(attr_name)
+        if "lock" in kwargs:
+            if kwargs["lock"]:
+                node.locked_attributes.add(attribute)
+            else:
+                node.locked_attributes.discard(attribute)
+            return
+        locked_children = [child for child, (parent_attribute, i) in CHILD_ATTRIBUTES.items()
+                           if parent_attribute == attribute and child in node.locked_attributes]
+        if attribute in node.locked_attributes or locked_children: # 复合属性有一个子属性被锁定时整个设置失败
+            raise RuntimeError("setAttr: The attribute '{0}' is locked or connected and cannot be modified.".format(attr_name))
+        if attribute in CHILD_ATTRIBUTES:
+            parent_attribute, child_index = CHILD_ATTRIBUTES[attribute]
+            value = list(node.attributes[parent_attribute])
+            value[child_index] = float(values[0])
+            node.attributes[parent_attribute] = tuple(value)
+        else:
+            node.attributes[attribute] = values[0] if len(values) == 1 else tuple(values)
+        if self.om2:
+            self.om2.notify_attribute_set(node, attribute)
+
+    def listRelatives(self, name, parent=False, children=False, fullPath=False, **kwargs):
+        self._count("listRelatives")
+        node = self.scene.find(name)
+        if parent:
+            nodes = [node.parent] if node.parent else []
+        else:
+            nodes = list(node.children)
+        if not nodes:
+            return None
+        return [related.path() if fullPath else related.name for related in nodes]
+
+    def objectType(self, name):
+        self._count("objectType")
+        return self.scene.find(name).node_type
+
+    def select(self, *args, **kwargs):
+        self._count("select")
+        names = args[0] if args and isinstance(args[0], (list, tuple)) else list(args)
+        if kwargs.get("add"):
+            self.scene.selection.extend(name for name in names if name not in self.scene.selection)
+        elif kwargs.get("deselect", kwargs.get("d")):
+            self.scene.selection = [name for name in self.scene.selection if name not in names]
+        elif kwargs.get("clear", kwargs.get("cl")):
+            self.scene.selection = []
+        else:
+            self.scene.selection = list(names)
+
+    def rename(self, name, new_name):
+        self._count("rename")
+        node = self.scene.find(name)
+        previous_name = node.name
+        self.scene.rename(name, new_name)
+        if self.om2:
+            self.om2.notify_name_changed(node, previous_name)
+        return new_name
+
+    def createNode(self, node_type, name=None, parent=None, **kwargs):
+        self._count("createNode")
+        node = self.scene.create_node(node_type, name or "{0}{1}".format(node_type, len(self.scene.nodes) + 1), parent=parent)
+        if self.om2:
+            self.om2.notify_node_added(node)
+        return node.name
+
+    def parent(self, name, parent_name, shape=False, **kwargs):
+        self._count("parent")
+        node = self.scene.find(name)
+        new_parent = self.scene.find(parent_name)
+        if node.parent:
+            node.parent.children.remove(node)
+        node.parent = new_parent
+        new_parent.children.append(node)
+        if self.om2:
+            self.om2.notify_parent_added(node)
+        return [node.name]
+
+    def delete(self, name):
+        self._count("delete")
+        node = self.scene.find(name)
+        if self.om2:
+            self.om2.notify_node_removed(node)
+        self.scene.delete_node(name)
+
+    def scriptJob(self, **kwargs):
+        self._count("scriptJob")
+        if "kill" in kwargs:
+            self.script_jobs.pop(kwargs["kill"], None)
+            return None
+        if "exists" in kwargs:
+            return kwargs["exists"] in self.script_jobs
+
+        job_number = self._next_job_number
+        self._next_job_number += 1
+        self.script_jobs[job_number] = kwargs
+        return job_number
+
+    def evalDeferred(self, command, **kwargs):
+        self._count("evalDeferred")
+        if callable(command):
+            command()
+        else:
+            exec(command, {"cmds": self})
+
+    def undoInfo(self, **kwargs):
+        self._count("undoInfo")
+        if kwargs.get("openChunk"):
+            self._open_undo_chunks += 1
+            self.undo_chunk_count += 1
+        elif kwargs.get("closeChunk"):
+            self._open_undo_chunks -= 1
+
+    def window(self, *args, **kwargs):
+        self._count("window")
+        if kwargs.get("exists"):
+            return False
+        return "window{0}".format(self.call_counts["window"])
+
+    def deleteUI(self, *args, **kwargs):
+        self._count("deleteUI")
+
+    def colorSliderGrp(self, *args, **kwargs):
+        self._count("colorSliderGrp")
+        if not args:
+            name = "colorSliderGrp{0}".format(self.call_counts["colorSliderGrp"])
+            self.scene.nodes.setdefault("__ui__", FakeNode("__ui__", "ui")).attributes[name] = (1.0, 1.0, 1.0)
+            return name
+
+        controls = self.scene.nodes["__ui__"].attributes
+        if kwargs.get("q") or kwargs.get("query"):
+            return list(controls.get(args[0], (1.0, 1.0, 1.0)))
+        if "rgbValue" in kwargs:
+            controls[args[0]] = tuple(kwargs["rgbValue"])
+
+    def about(self, **kwargs):
+        self._count("about")
+        if kwargs.get("version") or kwargs.get("v"):
+            return "2018"
+        return False
+
+    def pluginInfo(self, *args, **kwargs):
+        self._count("pluginInfo")
+        return args[0] in self.scene.loaded_plugins if args else False
+
+    def internalVar(self, **kwargs):
+        self._count("internalVar")
+        return "/tmp/maya/"
+
+
+class FakeOpenMaya(object):
+    """ 假的maya.api.OpenMaya，只实现读取plug和注册回调用到的部分 """
+
+    class MFn(object):
+        kDagNode = 107
+
+    def __init__(self, scene=None):
+        self.scene = scene or FakeScene()
+        self.call_counts = collections.Counter()
+        self.callbacks = {}
+        self._node_callback_ids = {} # id(节点) -> 回调id，用于快速找到某个节点的回调
+        self._next_callback_id = 1
+
+        fake = self
+
+        class MObject(object):
+            kNullObj = None
+
+        class MPlug(object):
+
+            def __init__(self, node, attribute, index=None):
+                self._node = node
+                self._attribute = attribute
+                self._index = index
+
+            def _value(self):
+                value = self._node.attributes[self._attribute]
+                return value[self._index] if self._index is not None else value
+
+            def asFloat(self):
+                fake._count("MPlug.asFloat")
+                return float(self._value())
+
+            def asDouble(self):
+                fake._count("MPlug.asDouble")
+                return float(self._value())
+
+            def asBool(self):
+                fake._count("MPlug.asBool")
+                return bool(self._value())
+
+            def child(self, index):
+                return MPlug(self._node, self._attribute, index)
+
+            def partialName(self, useLongNames=False, **kwargs):
+                return self._attribute
+
+            def node(self):
+                return self._node
+
+        class MFnDependencyNode(object):
+
+            def __init__(self, node=None):
+                self._node = node
+
+            def findPlug(self, attribute, want_networked_plug):
+                fake._count("MFnDependencyNode.findPlug")
+                return MPlug(self._node, attribute)
+
+            def hasAttribute(self, attribute):
+                return attribute in self._node.attributes
+
+            def name(self):
+                return self._node.name
+
+            def typeName(self):
+                return self._node.node_type
+
+            def uuid(self):
+                return MUuid(self._node.uuid)
+
+        class MFnDagNode(MFnDependencyNode):
+
+            def fullPathName(self):
+                fake._count("MFnDagNode.fullPathName")
+                return self._node.path()
+
+            def childCount(self):
+                return len(self._node.children)
+
+            def child(self, index):
+                return self._node.children[index]
+
+        class MUuid(object):
+
+            def __init__(self, value):
+                self._value = value
+
+            def asString(self):
+                return self._value
+
+        class MSelectionList(object):
+
+            def __init__(self):
+                self._nodes = []
+                self._node_ids = set()
+
+            def add(self, name):
+                """ 和maya一样，已经在列表中的节点不会重复添加 """
+                fake._count("MSelectionList.add")
+                try:
+                    node = fake.scene.find(name)
+                except ValueError as error:
+                    raise RuntimeError(str(error))
+                if id(node) not in self._node_ids:
+                    self._node_ids.add(id(node))
+                    self._nodes.append(node)
+                return self
+
+            def length(self):
+                return len(self._nodes)
+
+            def getDependNode(self, index):
+                return self._nodes[index]
+
+            def getDagPath(self, index):
+                return self._nodes[index]
+
+        class MObjectHandle(object):
+
+            def __init__(self, node):
+                self._node = node
+
+            def hashCode(self):
+                return id(self._node)
+
+            def object(self):
+                return self._node
+
+            def isValid(self):
+                return self._node.name in fake.scene.nodes
+
+        class MNodeMessage(object):
+            kAttributeSet = 1 << 0
+            kConnectionMade = 1 << 1
+            kConnectionBroken = 1 << 2
+
+            @staticmethod
+            def addAttributeChangedCallback(node, function, client_data=None):
+                return fake._add_callback("attributeChanged", node, function, client_data)
+
+            @staticmethod
+            def addNameChangedCallback(node, function, client_data=None):
+                return fake._add_callback("nameChanged", node, function, client_data)
+
+        class MDGMessage(object):
+
+            @staticmethod
+            def addNodeAddedCallback(function, node_type="dependNode", client_data=None):
+                return fake._add_callback("nodeAdded", node_type, function, client_data)
+
+            @staticmethod
+            def addNodeRemovedCallback(function, node_type="dependNode", client_data=None):
+                return fake._add_callback("nodeRemoved", node_type, function, client_data)
+
+        class MDagMessage(object):
+
+            @staticmethod
+            def addParentAddedDagPathCallback(dag_path, function, client_data=None):
+                return fake._add_callback("parentAdded", dag_path, function, client_data)
+
+            @staticmethod
+            def addParentAddedCallback(function, client_data=None):
+                return fake._add_callback("anyParentAdded", None, function, client_data)
+
+        class MMessage(object):
+
+            @staticmethod
+            def removeCallback(callback_id):
+                fake._count("MMessage.removeCallback")
+                fake.callbacks.pop(callback_id, None)
+
+            @staticmethod
+            def removeCallbacks(callback_ids):
+                for callback_id in callback_ids:
+                    MMessage.removeCallback(callback_id)
+
+        self.MObject = MObject
+        self.MFn = FakeOpenMaya.MFn
+        self.MPlug = MPlug
+        self.MFnDependencyNode = MFnDependencyNode
+        self.MFnDagNode = MFnDagNode
+        self.MUuid = MUuid
+        self.MSelectionList = MSelectionList
+        self.MObjectHandle = MObjectHandle
+        self.MNodeMessage = MNodeMessage
+        self.MDGMessage = MDGMessage
+        self.MDagMessage = MDagMessage
+        self.MMessage = MMessage
+
+    def reset_counts(self):
+        self.call_counts.clear()
+
+    def total_calls(self):
+        return sum(self.call_counts.values())
+
+    def _count(self, name):
+        self.call_counts[name] += 1
+
+    def _callbacks(self, kind):
+        return [callback for callback in list(self.callbacks.values()) if callback[0] == kind]
+
+    def notify_attribute_set(self, node, attribute):
+        for callback_id in list(self._node_callback_ids.get(id(node), [])):
+            kind, target, function, client_data = self.callbacks.get(callback_id, (None, None, None, None))
+            if kind == "attributeChanged":
+                function(self.MNodeMessage.kAttributeSet, self.MPlug(node, attribute), self.MPlug(None, None), client_data)
+
+    def notify_name_changed(self, node, previous_name):
+        for kind, target, function, client_data in self._callbacks("nameChanged"):
+            if target is None or target is node:
+                function(node, previous_name, client_data)
+
+    def notify_parent_added(self, node):
+        for callback_id in list(self._node_callback_ids.get(id(node), [])):
+            kind, target, function, client_data = self.callbacks.get(callback_id, (None, None, None, None))
+            if kind == "parentAdded":
+                function(node, node.parent, client_data)
+        for kind, target, function, client_data in self._callbacks("anyParentAdded"):
+            function(node, node.parent, client_data)
+
+    def notify_node_added(self, node):
+        for kind, node_type, function, client_data in self._callbacks("nodeAdded"):
+            if self.scene.is_type(node, node_type):
+                function(node, client_data)
+
+    def notify_node_removed(self, node):
+        for child in node.children:
+            self.notify_node_removed(child)
+        for kind, node_type, function, client_data in self._callbacks("nodeRemoved"):
+            if self.scene.is_type(node, node_type):
+                function(node, client_data)
+
+    def _add_callback(self, kind, target, function, client_data):
+        self._count("add_{0}_callback".format(kind))
+        callback_id = self._next_callback_id
+        self._next_callback_id += 1
+        self.callbacks[callback_id] = (kind, target, function, client_data)
+        self._node_callback_ids.setdefault(id(target), []).append(callback_id)
+        return callback_id
+
+
+class FakeMQtUtil(object):
+    """ 假的OpenMayaUI.MQtUtil，为colorSliderGrp等控件创建真正的Qt控件 """
+
+    _widgets = {}
+
+    @classmethod
+    def _pointer(cls, widget):
+        import shiboken2
+        return shiboken2.getCppPointer(widget)[0]
+
+    @classmethod
+    def mainWindow(cls):
+        from PySide2 import QtWidgets
+        if "__main_window__" not in cls._widgets:
+            cls._widgets["__main_window__"] = QtWidgets.QMainWindow()
+        return cls._pointer(cls._widgets["__main_window__"])
+
+    @classmethod
+    def findControl(cls, name):
+        from PySide2 import QtWidgets
+        widget = QtWidgets.QWidget()
+        widget.setObjectName(name)
+        QtWidgets.QWidget(widget).setObjectName("slider")
+        QtWidgets.QWidget(widget).setObjectName("port")
+        cls._widgets[name] = widget
+        return cls._pointer(widget)
+
+
+def patch_module(module, scene):
+    """ 把被测模块中的cmds/om2/omui替换成假的版本，返回(cmds, om2, 还原函数) """
+    fake_cmds = FakeCmds(scene)
+    fake_om2 = FakeOpenMaya(scene)
+    fake_cmds.om2 = fake_om2
+    originals = {}
+    for name, value in (("cmds", fake_cmds), ("om2", fake_om2), ("omui", _namespace(MQtUtil=FakeMQtUtil))):
+        if hasattr(module, name):
+            originals[name] = getattr(module, name)
+            setattr(module, name, value)
+
+    def restore():
+        for name, value in originals.items():
+            setattr(module, name, value)
+
+    return fake_cmds, fake_om2, restore
+
+
+def _namespace(**kwargs):
+    namespace = types.ModuleType("namespace")
+    namespace.__dict__.update(kwargs)
+    return namespace
+
+
+def install_if_missing():
+    """ 在maya外运行测试时，把假的maya模块注册到sys.modules，使示例模块可以被导入 """
+    try:
+        import maya.cmds  # noqa: F401
+        return False
+    except ImportError:
+        pass
+
+    from PySide2 import QtWidgets
+    if not QtWidgets.QApplication.instance():
+        install_if_missing.app = QtWidgets.QApplication(sys.argv[:1])
+
+    try:
+        import __builtin__ as builtins
+    except ImportError:
+        import builtins
+    if not hasattr(builtins, "long"):  # 示例代码为Python 2编写，使用了long
+        builtins.long = int
+
+    scene = FakeScene()
+    maya = _namespace()
+    maya_api = _namespace()
+    maya.cmds = FakeCmds(scene)
+    maya.OpenMayaUI = _namespace(MQtUtil=FakeMQtUtil)
+    maya.OpenMaya = _namespace()
+    maya.utils = _namespace(executeDeferred=lambda function, *args: function(*args))
+    maya_api.OpenMaya = FakeOpenMaya(scene)
+    maya.cmds.om2 = maya_api.OpenMaya
+    maya.api = maya_api
+
+    sys.modules["maya"] = maya
+    sys.modules["maya.cmds"] = maya.cmds
+    sys.modules["maya.OpenMayaUI"] = maya.OpenMayaUI
+    sys.modules["maya.OpenMaya"] = maya.OpenMaya
+    sys.modules["maya.utils"] = maya.utils
+    sys.modules["maya.api"] = maya_api
+    sys.modules["maya.api.OpenMaya"] = maya_api.OpenMaya
+    return True
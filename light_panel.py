@@ -1,11 +1,13 @@
 # coding:utf-8
 # 灯光面板(script Jobs)
+import contextlib
 from functools import partial
 from PySide2 import QtCore
 from PySide2 import QtWidgets
 from PySide2 import QtGui
 from shiboken2 import wrapInstance
 import maya.OpenMayaUI as omui
+import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
 
@@ -13,295 +15,811 @@ def maya_main_window():
     main_window_ptr = omui.MQtUtil.mainWindow()
     return wrapInstance(long(main_window_ptr), QtWidgets.QWidget)
 
-class CustomColorButton(QtWidgets.QWidget): # 自定义颜色按钮
+def get_light_type_icon(light_type):
+    """ 根据灯光类型得到图标 """
+    icon = QtGui.QIcon()
+    if light_type == "ambientLight":
+        icon = QtGui.QIcon(":ambientLight.svg")
+    elif light_type == "directionalLight":
+        icon = QtGui.QIcon(":directionalLight.svg")
+    elif light_type == "pointLight":
+        icon = QtGui.QIcon(":pointLight.svg")
+    elif light_type == "spotLight":
+        icon = QtGui.QIcon(":spotLight.svg")
+    else:
+        icon = QtGui.QIcon(":Light.png")
+
+    return icon
+
+def get_color_from_maya_editor(color):
+    """ 打开maya的颜色编辑器，取消时返回None """
+    cmds.colorEditor(rgbValue=(color.redF(), color.greenF(), color.blueF()))
+    if not cmds.colorEditor(query=True, result=True):
+        return None
+
+    rgb = cmds.colorEditor(query=True, rgb=True)
+    return QtGui.QColor.fromRgbF(rgb[0], rgb[1], rgb[2])
+
+def set_light_attribute(light_data, attribute, value):
+    """ 设置灯光的属性，visibility在transform上，其它属性在shape上。属性被锁定或者有连接时抛出RuntimeError """
+    if attribute == "visibility":
+        cmds.setAttr("{0}.visibility".format(light_data.transform_path), value)
+    elif attribute == "color":
+        cmds.setAttr("{0}.color".format(light_data.shape_name), value[0], value[1], value[2])
+    else:
+        cmds.setAttr("{0}.{1}".format(light_data.shape_name, attribute), value)
+
+def get_depend_nodes(paths):
+    """ 返回每个路径的MObject。MSelectionList.add会合并已经添加过的节点(比如多个灯光共用的transform)，
+        之后的序号都会错位，所以每次添加后检查长度，重复的节点单独查询 """
+    selection = om2.MSelectionList()
+    nodes = []
+    for path in paths:
+        count = selection.length()
+        selection.add(path)
+        if selection.length() > count:
+            nodes.append(selection.getDependNode(count))
+        else:
+            nodes.append(om2.MSelectionList().add(path).getDependNode(0))
+    return nodes
 
-    color_changed = QtCore.Signal(QtGui.QColor) # 自定义信号
+class LightData(object):
+    """ 单个灯光在读取快照时的属性值 """
 
-    def __init__(self, color=QtCore.Qt.white, parent=None): # 表示可以类接收一个颜色参数,默认是白色
-        super(CustomColorButton, self).__init__(parent)
+    __slots__ = ["shape_name", "uuid", "light_type", "transform_path",
+                 "visibility", "intensity", "color", "emit_diffuse", "emit_specular"]
 
-        self.setObjectName("CustomColorButton")
+    SUPPORTED_TYPES = ["ambientLight", "directionalLight", "pointLight", "spotLight", "areaLight"] # 有强度和颜色的灯光类型
+    EMIT_TYPES = ["directionalLight", "pointLight", "spotLight", "areaLight"] # 有emitDiffuse和emitSpecular的灯光类型
 
-        self.create_control()
+    ATTRIBUTE_FIELDS = {
+        "visibility": "visibility",
+        "intensity": "intensity",
+        "color": "color",
+        "emitDiffuse": "emit_diffuse",
+        "emitSpecular": "emit_specular",
+    }
 
-        self.set_size(50, 14)
-        self.set_color(color) # 设置初始颜色,如果对象有传过来颜色设置则为对象的颜色
+    def __init__(self, shape_name, uuid, light_type, transform_path):
+        self.shape_name = shape_name # 灯光shape的长路径
+        self.uuid = uuid
+        self.light_type = light_type
+        self.transform_path = transform_path # 灯光transform的长路径
 
-    def create_control(self):
-        """ 1. 创建colorSliderGrp """
-        window = cmds.window()
-        self._name = cmds.colorSliderGrp()
-        # print("original name: {0}".format(self._name))
+        self.visibility = True
+        self.intensity = None # 不支持的灯光类型为None
+        self.color = None
+        self.emit_diffuse = None
+        self.emit_specular = None
 
-        """ 2. 找到colorSliderGrp控件 """
-        color_slider_obj = omui.MQtUtil.findControl(self._name) # color_slider_obj是一个c++的形式
-        if color_slider_obj:
-            self._color_slider_widget = wrapInstance(long(color_slider_obj), QtWidgets.QWidget)
-        
-            """ 3. 将colorSliderGrp控件的父级设置为这个自定义控件 """
-            main_layout = QtWidgets.QVBoxLayout(self)
-            main_layout.setObjectName("main_layout")
-            main_layout.setContentsMargins(0, 0, 0, 0)
-            main_layout.addWidget(self._color_slider_widget)
-
-            """ 4. 更新colorSliderGrp的control name (之前是属于maya的) """
-            self._name = self._color_slider_widget.objectName()
-            # print("new name: {0}".format(self._name))
-
-            """ 5. 识别或存储 colorSliderGrp的子控件(在必要的时候可以隐藏它) """
-            # children = self._color_slider_widget.children()
-            # for child in children:
-            #     print(child)
-            #     print(child.objectName())
-            # print("---")
-
-            self._slider_widget = self._color_slider_widget.findChild(QtWidgets.QWidget, "slider")
-            if self._slider_widget:
-                self._slider_widget.hide()
-            
-            self._color_widget = self._color_slider_widget.findChild(QtWidgets.QWidget, "port")
-
-            cmds.colorSliderGrp(self._name, e=True, changeCommand=partial(self.on_color_changed))
-
-        cmds.deleteUI(window, window=True)
-          
-    
-    def set_size(self, width, height):
-        self._color_slider_widget.setFixedWidth(width)
-        self._color_widget.setFixedHeight(height)
-    
-    def set_color(self, color):
-        color = QtGui.QColor(color)
+    def transform_name(self):
+        return self.transform_path.rsplit("|", 1)[-1]
 
-        if color != self.get_color():
-            cmds.colorSliderGrp(self._name, e=True, rgbValue=(color.redF(), color.greenF(), color.blueF())) # F代表以浮点数表示
-            self.on_color_changed()
-    
-    def get_color(self):
-        color = cmds.colorSliderGrp(self._name, q=True, rgbValue=True)
+    def qcolor(self):
+        return QtGui.QColor(self.color[0] * 255, self.color[1] * 255, self.color[2] * 255)
 
-        color = QtGui.QColor(color[0] *255, color[1] * 255, color[2] * 255)
-        return color
-      
-    def on_color_changed(self, *args):
-        self.color_changed.emit(self.get_color())
 
-class LightItem(QtWidgets.QWidget):
-    # 自定义灯光控件，一个灯光对应一个控件
+class LightSnapshot(object):
+    """ 灯光属性快照: 用少量cmds.ls调用和一次OpenMaya遍历读取所有灯光的属性，
+        代替每个灯光十几次的getAttr/listRelatives/objectType """
 
-    SUPPORTED_TYPES = ["ambientLight", "directionalLight", "pointLight", "spotLight", "areaLight"]
-    EMIT_TYPES = ["directionalLight", "pointLight", "spotLight", "areaLight"]
+    ATTRIBUTES = ["visibility", "intensity", "color", "emitDiffuse", "emitSpecular"]
 
-    node_deleted = QtCore.Signal(str) # 自定义节点删除时的信号
+    def __init__(self, light_data_list):
+        self.light_data_list = light_data_list
+        self._light_data_by_uuid = dict((light_data.uuid, light_data) for light_data in light_data_list)
 
-    def __init__(self, shape_name, parent=None):
-        super(LightItem, self).__init__(parent)
+    def __iter__(self):
+        return iter(self.light_data_list)
 
-        self.setFixedHeight(26)
+    def __len__(self):
+        return len(self.light_data_list)
 
-        self.shape_name = shape_name # 灯光的shape名字
-        self.uuid = cmds.ls(shape_name, uuid=True) # 灯光的uuid
+    def get(self, uuid):
+        return self._light_data_by_uuid.get(uuid)
 
-        self.script_jobs = []
+    @classmethod
+    def read(cls, lights=None):
+        """ 读取快照，lights为None时读取场景中的所有灯光 """
+        if lights is None:
+            paths_and_types = cmds.ls(typ="light", long=True, showType=True) # [路径, 类型, 路径, 类型...]
+            uuids = cmds.ls(typ="light", uuid=True)
+        elif lights:
+            paths_and_types = cmds.ls(lights, long=True, showType=True)
+            uuids = cmds.ls(lights, uuid=True)
+        else:
+            return cls([])
+
+        paths = paths_and_types[0::2]
+        light_types = paths_and_types[1::2]
+
+        transform_paths = [path.rsplit("|", 1)[0] for path in paths] # 灯光的transform，可能有多个灯光在同一个transform下
+        shape_nodes = get_depend_nodes(paths)
+        transform_nodes = get_depend_nodes(transform_paths)
+
+        light_data_list = []
+        for i, path in enumerate(paths):
+            light_data = LightData(path, uuids[i], light_types[i], transform_paths[i])
+
+            shape_fn = om2.MFnDependencyNode(shape_nodes[i])
+            transform_fn = om2.MFnDependencyNode(transform_nodes[i])
+            cls.read_attributes(light_data, shape_fn, transform_fn, cls.ATTRIBUTES)
+
+            light_data_list.append(light_data)
+
+        return cls(light_data_list)
+
+    @classmethod
+    def update_attributes(cls, dirty_lights):
+        """ 只重新读取改变了的属性，dirty_lights为[(light_data, 属性列表)]，
+            返回节点路径已经失效(被重新设置了父级)、需要整个重新读取的uuid列表 """
+        invalid_uuids = []
+        for light_data, attributes in dirty_lights:
+            selection = om2.MSelectionList()
+            try:
+                selection.add(light_data.shape_name)
+                selection.add(light_data.transform_path)
+            except RuntimeError:
+                invalid_uuids.append(light_data.uuid)
+                continue
+
+            shape_fn = om2.MFnDependencyNode(selection.getDependNode(0))
+            transform_fn = om2.MFnDependencyNode(selection.getDependNode(1))
+            cls.read_attributes(light_data, shape_fn, transform_fn, attributes)
+
+        return invalid_uuids
+
+    @staticmethod
+    def resolve_paths(light_data_list):
+        """ 设置属性前通过uuid重新查询shape和transform的长路径，灯光或它的父级被改名、重新设置父级后缓存的路径会失效。
+            返回已经被删除的灯光的uuid列表 """
+        if not light_data_list:
+            return []
+
+        uuids = [light_data.uuid for light_data in light_data_list]
+        paths_by_uuid = dict(zip(cmds.ls(uuids, uuid=True), cmds.ls(uuids, long=True)))
+
+        missing_uuids = []
+        for light_data in light_data_list:
+            path = paths_by_uuid.get(light_data.uuid)
+            if path is None:
+                missing_uuids.append(light_data.uuid)
+                continue
+            light_data.shape_name = path
+            light_data.transform_path = path.rsplit("|", 1)[0]
+
+        return missing_uuids
+
+    @staticmethod
+    def read_attributes(light_data, shape_fn, transform_fn, attributes):
+        """ 通过plug读取指定的属性并保存到light_data中 """
+        for attribute in attributes:
+            if attribute == "visibility":
+                light_data.visibility = transform_fn.findPlug("visibility", False).asBool()
+            elif light_data.light_type not in LightData.SUPPORTED_TYPES:
+                continue
+            elif attribute == "intensity":
+                light_data.intensity = shape_fn.findPlug("intensity", False).asFloat()
+            elif attribute == "color":
+                color_plug = shape_fn.findPlug("color", False)
+                light_data.color = (color_plug.child(0).asFloat(), color_plug.child(1).asFloat(), color_plug.child(2).asFloat())
+            elif light_data.light_type not in LightData.EMIT_TYPES:
+                continue
+            elif attribute == "emitDiffuse":
+                light_data.emit_diffuse = shape_fn.findPlug("emitDiffuse", False).asBool()
+            elif attribute == "emitSpecular":
+                light_data.emit_specular = shape_fn.findPlug("emitSpecular", False).asBool()
+
+
+class LightTableModel(QtCore.QAbstractTableModel):
+    """ 灯光表格模型，数据来自LightSnapshot，视图只会绘制和编辑可见的行 """
+
+    TYPE_COLUMN = 0
+    VISIBILITY_COLUMN = 1
+    NAME_COLUMN = 2
+    INTENSITY_COLUMN = 3
+    COLOR_COLUMN = 4
+    EMIT_DIFFUSE_COLUMN = 5
+    EMIT_SPECULAR_COLUMN = 6
+
+    HEADER_LABELS = ["", "", "Light", "Intensity", "Color", "Emit Diffuse", "Emit Spec"]
+
+    LIGHT_DATA_ROLE = QtCore.Qt.UserRole
+
+    ATTRIBUTE_COLUMNS = {
+        "visibility": VISIBILITY_COLUMN,
+        "intensity": INTENSITY_COLUMN,
+        "color": COLOR_COLUMN,
+        "emitDiffuse": EMIT_DIFFUSE_COLUMN,
+        "emitSpecular": EMIT_SPECULAR_COLUMN,
+    }
+
+    def __init__(self, parent=None):
+        super(LightTableModel, self).__init__(parent)
+
+        self.light_data_list = []
+        self._row_by_uuid = {}
+        self._icons = {} # 灯光类型 -> 图标，同类型的灯光共用一个图标
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.light_data_list)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADER_LABELS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADER_LABELS[section]
+        return None
+
+    def set_snapshot(self, snapshot):
+        """ 用快照重置整个模型 """
+        self.beginResetModel()
+        self.light_data_list = list(snapshot)
+        self.update_row_index()
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.light_data_list = []
+        self.update_row_index()
+        self.endResetModel()
+
+    def insert_lights(self, light_data_list):
+        """ 在末尾插入新的灯光，已有的行保持不变 """
+        if not light_data_list:
+            return
 
-        self.create_widgets()
-        self.create_layout()
-        self.create_connections()
+        first_row = len(self.light_data_list)
+        self.beginInsertRows(QtCore.QModelIndex(), first_row, first_row + len(light_data_list) - 1)
+        self.light_data_list.extend(light_data_list)
+        self.update_row_index()
+        self.endInsertRows()
+
+    def remove_lights(self, uuids):
+        """ 删除指定uuid的灯光，连续的行一次删除 """
+        rows = sorted((self.row_for_uuid(uuid) for uuid in uuids if self.row_for_uuid(uuid) >= 0), reverse=True)
+        while rows:
+            last_row = rows.pop(0)
+            first_row = last_row
+            while rows and rows[0] == first_row - 1:
+                first_row = rows.pop(0)
+
+            self.beginRemoveRows(QtCore.QModelIndex(), first_row, last_row)
+            del self.light_data_list[first_row:last_row + 1]
+            self.endRemoveRows()
+
+        self.update_row_index()
+
+    def update_row_index(self):
+        self._row_by_uuid = dict((light_data.uuid, row) for row, light_data in enumerate(self.light_data_list))
+
+    def light_data(self, row):
+        return self.light_data_list[row]
+
+    def light_data_for_uuid(self, uuid):
+        row = self.row_for_uuid(uuid)
+        if row < 0:
+            return None
+        return self.light_data_list[row]
+
+    def row_for_uuid(self, uuid):
+        return self._row_by_uuid.get(uuid, -1)
+
+    def update_light(self, light_data, attributes=None):
+        """ 用新读取的数据替换对应的行，attributes不为None时只刷新这些属性对应的单元格 """
+        row = self.row_for_uuid(light_data.uuid)
+        if row < 0:
+            return
 
-        self.create_script_jobs()
-    
-    def create_widgets(self):
-        """ 创建控件 """
-        self.light_type_btn = QtWidgets.QPushButton()
-        self.light_type_btn.setFixedSize(20, 20)
-        self.light_type_btn.setFlat(True) # 设置按钮的显示形式
+        self.light_data_list[row] = light_data
+        if attributes is None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+        else:
+            for attribute in attributes:
+                index = self.index(row, self.ATTRIBUTE_COLUMNS[attribute])
+                self.dataChanged.emit(index, index)
 
-        self.visiblity_cb = QtWidgets.QCheckBox()
-        
-        self.transform_name_label = QtWidgets.QLabel("placeholder")
-        self.transform_name_label.setFixedWidth(120)
-        self.transform_name_label.setAlignment(QtCore.Qt.AlignCenter)
-
-        light_type = self.get_light_type()
-        if light_type in self.SUPPORTED_TYPES:
-            self.intensity_dsb = QtWidgets.QDoubleSpinBox()
-            self.intensity_dsb.setRange(0.0, 100.0)
-            self.intensity_dsb.setDecimals(3) # 设置数值到小数点后三位
-            self.intensity_dsb.setSingleStep(0.1)
-            self.intensity_dsb.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons) # 设置spinbox没有上下箭头
-
-            self.color_btn = CustomColorButton()
-
-            if light_type in self.EMIT_TYPES:
-                self.emit_diffuse_cb = QtWidgets.QCheckBox()
-                self.emit_specular_cb = QtWidgets.QCheckBox()
-        
-        self.update_values()
-    
-    def create_layout(self):
-        """ 创建布局 """
-        main_layout = QtWidgets.QHBoxLayout(self)
-        main_layout.setContentsMargins(0, 0, 0, 0)
-        main_layout.addWidget(self.light_type_btn)
-        main_layout.addWidget(self.visiblity_cb)
-        main_layout.addWidget(self.transform_name_label)
-
-        light_type = self.get_light_type()
-        if light_type in self.SUPPORTED_TYPES:
-            main_layout.addWidget(self.intensity_dsb)
-            main_layout.addSpacing(10)
-            main_layout.addWidget(self.color_btn)
-
-            if light_type in self.EMIT_TYPES:
-                main_layout.addSpacing(34)
-                main_layout.addWidget(self.emit_diffuse_cb)
-                main_layout.addSpacing(50)
-                main_layout.addWidget(self.emit_specular_cb)
-
-        main_layout.addStretch()
-    
-    def create_connections(self):
-        """ 创建信号与槽的连接 """
-        self.light_type_btn.clicked.connect(self.select_light)
-        self.visiblity_cb.toggled.connect(self.set_visibility)
-        
-        light_type = self.get_light_type()
-        if light_type in self.SUPPORTED_TYPES:
-            self.intensity_dsb.editingFinished.connect(self.on_intensity_changed)
-            self.color_btn.color_changed.connect(self.set_color)
-
-            if light_type in self.EMIT_TYPES:
-                self.emit_diffuse_cb.toggled.connect(self.set_emit_diffuse)
-                self.emit_specular_cb.toggled.connect(self.set_emit_specular)
-
-    def update_values(self):
-        self.light_type_btn.setIcon(self.get_light_type_icon())
-        self.visiblity_cb.setChecked(self.is_visible())
-        self.transform_name_label.setText(self.get_transform_name())
-
-        light_type = self.get_light_type()
-        if light_type in self.SUPPORTED_TYPES:
-            self.intensity_dsb.setValue(self.get_intensity())
-            self.color_btn.set_color(self.get_color())
-            
-            if light_type in self.EMIT_TYPES:
-                self.emit_diffuse_cb.setChecked(self.emits_diffuse())
-                self.emit_specular_cb.setChecked(self.emits_specular())
-
-    def get_transform_name(self):
-        return cmds.listRelatives(self.shape_name, parent=True)[0]
-
-    def get_attribute_value(self, name, attribute):
-        return cmds.getAttr("{0}.{1}".format(name, attribute))
-
-    def set_attribute_value(self, name, attribute,*args):
-
-        # 如果设置颜色或者属性的值与当前值相同就不进行设置，避免script job产生的重复设置属性的bug
-        if attribute == "color":
-            if self.get_color() == self.color_btn.get_color():
-                return
-        elif args[0] == self.get_attribute_value(name, attribute):
+    def lights_changed(self, rows, attributes):
+        """ 批量修改后，每个属性列只发送一次dataChanged """
+        if not rows:
             return
-        
-        attr_name = "{0}.{1}".format(name, attribute)
-        cmds.setAttr(attr_name, *args)
-
-    def get_light_type(self):
-        return cmds.objectType(self.shape_name)
-
-    def get_light_type_icon(self):
-        light_type = self.get_light_type()
-
-        icon = QtGui.QIcon()
-        if light_type == "ambientLight":
-            icon = QtGui.QIcon(":ambientLight.svg")
-        elif light_type == "directionalLight":
-            icon = QtGui.QIcon(":directionalLight.svg")
-        elif light_type == "pointLight":
-            icon = QtGui.QIcon(":pointLight.svg")
-        elif light_type == "spotLight":
-            icon = QtGui.QIcon(":spotLight.svg")
+
+        first_row = min(rows)
+        last_row = max(rows)
+        for attribute in attributes:
+            column = self.ATTRIBUTE_COLUMNS[attribute]
+            self.dataChanged.emit(self.index(first_row, column), self.index(last_row, column))
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        if not index.isValid():
+            return flags
+
+        light_type = self.light_data_list[index.row()].light_type
+        column = index.column()
+        if column == self.VISIBILITY_COLUMN:
+            flags |= QtCore.Qt.ItemIsUserCheckable
+        elif column in (self.INTENSITY_COLUMN, self.COLOR_COLUMN) and light_type in LightData.SUPPORTED_TYPES:
+            flags |= QtCore.Qt.ItemIsEditable
+        elif column in (self.EMIT_DIFFUSE_COLUMN, self.EMIT_SPECULAR_COLUMN) and light_type in LightData.EMIT_TYPES:
+            flags |= QtCore.Qt.ItemIsUserCheckable
+
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        light_data = self.light_data_list[index.row()]
+        column = index.column()
+
+        if role == self.LIGHT_DATA_ROLE:
+            return light_data
+
+        if column == self.TYPE_COLUMN:
+            if role == QtCore.Qt.DecorationRole:
+                if light_data.light_type not in self._icons:
+                    self._icons[light_data.light_type] = get_light_type_icon(light_data.light_type)
+                return self._icons[light_data.light_type]
+            if role == QtCore.Qt.ToolTipRole:
+                return light_data.light_type
+
+        elif column == self.VISIBILITY_COLUMN:
+            if role == QtCore.Qt.CheckStateRole:
+                return self.to_check_state(light_data.visibility)
+
+        elif column == self.NAME_COLUMN:
+            if role == QtCore.Qt.DisplayRole:
+                return light_data.transform_name()
+            if role == QtCore.Qt.TextAlignmentRole:
+                return QtCore.Qt.AlignCenter
+
+        elif column == self.INTENSITY_COLUMN:
+            if light_data.intensity is None:
+                return None
+            if role == QtCore.Qt.DisplayRole:
+                return "{0:.3f}".format(light_data.intensity)
+            if role == QtCore.Qt.EditRole:
+                return light_data.intensity
+
+        elif column == self.COLOR_COLUMN:
+            if light_data.color is not None and role == QtCore.Qt.EditRole:
+                return light_data.qcolor()
+
+        elif column == self.EMIT_DIFFUSE_COLUMN:
+            if light_data.emit_diffuse is not None and role == QtCore.Qt.CheckStateRole:
+                return self.to_check_state(light_data.emit_diffuse)
+
+        elif column == self.EMIT_SPECULAR_COLUMN:
+            if light_data.emit_specular is not None and role == QtCore.Qt.CheckStateRole:
+                return self.to_check_state(light_data.emit_specular)
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        """ 修改数据时直接设置maya中的属性，与当前值相同时不设置，避免script job重复触发 """
+        if not index.isValid():
+            return False
+
+        light_data = self.light_data_list[index.row()]
+        column = index.column()
+
+        if column == self.VISIBILITY_COLUMN and role == QtCore.Qt.CheckStateRole:
+            attribute, value = "visibility", value == QtCore.Qt.Checked
+        elif column == self.INTENSITY_COLUMN and role == QtCore.Qt.EditRole:
+            attribute = "intensity"
+        elif column == self.COLOR_COLUMN and role == QtCore.Qt.EditRole:
+            attribute, value = "color", (value.redF(), value.greenF(), value.blueF())
+        elif column == self.EMIT_DIFFUSE_COLUMN and role == QtCore.Qt.CheckStateRole:
+            attribute, value = "emitDiffuse", value == QtCore.Qt.Checked
+        elif column == self.EMIT_SPECULAR_COLUMN and role == QtCore.Qt.CheckStateRole:
+            attribute, value = "emitSpecular", value == QtCore.Qt.Checked
         else:
-            icon = QtGui.QIcon(":Light.png")
+            return False
 
-        return icon
+        field = LightData.ATTRIBUTE_FIELDS[attribute]
+        if value != getattr(light_data, field):
+            if LightSnapshot.resolve_paths([light_data]): # 灯光已经被删除
+                return False
+            try:
+                set_light_attribute(light_data, attribute, value)
+            except RuntimeError: # 属性被锁定或者有连接
+                return False
+            setattr(light_data, field, value)
 
-    def is_visible(self):
-        transform_name = self.get_transform_name()
-        return self.get_attribute_value(transform_name, "visibility")
-    
-    def get_intensity(self):
-        return self.get_attribute_value(self.shape_name, "intensity")
+        self.dataChanged.emit(index, index)
+        return True
 
-    def get_color(self):
-        temp_color = self.get_attribute_value(self.shape_name, "color")[0]
-        return QtGui.QColor(temp_color[0] * 255, temp_color[1] * 255, temp_color[2] * 255)
+    def to_check_state(self, checked):
+        if checked:
+            return QtCore.Qt.Checked
+        return QtCore.Qt.Unchecked
 
-    def emits_diffuse(self):
-        return self.get_attribute_value(self.shape_name, "emitDiffuse")
 
-    def emits_specular(self):
-        return self.get_attribute_value(self.shape_name, "emitSpecular")
-    
-    def select_light(self):
-        cmds.select(self.get_transform_name())
+class LightIntensityDelegate(QtWidgets.QStyledItemDelegate):
+    """ 强度列的代理，只有在编辑时才创建QDoubleSpinBox """
 
-    def set_visibility(self, checked):
-        self.set_attribute_value(self.get_transform_name(), "visibility", checked)
-    
-    def on_intensity_changed(self):
-        self.set_attribute_value(self.shape_name, "intensity", self.intensity_dsb.value())
-    
-    def set_color(self, color):
-        self.set_attribute_value(self.shape_name, "color", color.redF(), color.greenF(), color.blueF())
-    
-    def set_emit_diffuse(self, checked):
-        self.set_attribute_value(self.shape_name, "emitDiffuse", checked)
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QDoubleSpinBox(parent)
+        editor.setRange(0.0, 100.0)
+        editor.setDecimals(3) # 设置数值到小数点后三位
+        editor.setSingleStep(0.1)
+        editor.setButtonSymbols(QtWidgets.QAbstractSpinBox.NoButtons) # 设置spinbox没有上下箭头
+        return editor
 
-    def set_emit_specular(self, checked):
-        self.set_attribute_value(self.shape_name, "emitSpecular", checked)
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(QtCore.Qt.EditRole))
 
-    def on_node_deleted(self):
-        """ 当节点删除时执行 """
-        self.node_deleted.emit(self.shape_name)
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value(), QtCore.Qt.EditRole)
 
-    def on_name_changed(self):
-        """ 当名字修改时执行 """
-        self.shape_name = cmds.ls(self.uuid)[0]
-        self.update_values()
-    
-    def create_script_jobs(self):
-        """ 为每个灯光都创建script jobs """
-        self.delete_script_jobs()
 
-        self.add_attribute_change_script_job(self.get_transform_name(), "visibility")
-        light_type = self.get_light_type()
-        if light_type in self.SUPPORTED_TYPES:
-            self.add_attribute_change_script_job(self.shape_name, "color")
-            self.add_attribute_change_script_job(self.shape_name, "intensity")
+class LightColorDelegate(QtWidgets.QStyledItemDelegate):
+    """ 颜色列的代理，直接绘制颜色块，点击时打开maya的颜色编辑器 """
 
-            if light_type in self.EMIT_TYPES:
-                self.add_attribute_change_script_job(self.shape_name, "emitDiffuse")
-                self.add_attribute_change_script_job(self.shape_name, "emitSpecular")
+    SWATCH_WIDTH = 50
+    SWATCH_HEIGHT = 14
 
-        self.script_jobs.append(cmds.scriptJob(nodeDeleted=(self.shape_name, partial(self.on_node_deleted))))
-        self.script_jobs.append(cmds.scriptJob(nodeNameChanged=(self.shape_name, partial(self.on_name_changed))))
-    
-    def add_attribute_change_script_job(self, name, attribute):
-        """ 添加某一节点的某一属性改变时的script_job时使用的方法 """
-        self.script_jobs.append(cmds.scriptJob(attributeChange=("{0}.{1}".format(name, attribute), partial(self.update_values))))
+    def paint(self, painter, option, index):
+        super(LightColorDelegate, self).paint(painter, option, index) # 绘制选中时的背景
+
+        color = index.data(QtCore.Qt.EditRole)
+        if color is None:
+            return
+
+        swatch_rect = QtCore.QRect(0, 0, self.SWATCH_WIDTH, self.SWATCH_HEIGHT)
+        swatch_rect.moveCenter(option.rect.center())
+
+        painter.save()
+        painter.fillRect(swatch_rect, color)
+        painter.setPen(QtCore.Qt.black)
+        painter.drawRect(swatch_rect.adjusted(0, 0, -1, -1))
+        painter.restore()
+
+    def createEditor(self, parent, option, index):
+        return None # 颜色通过editorEvent中打开的颜色编辑器修改
+
+    def editorEvent(self, event, model, option, index):
+        if not index.flags() & QtCore.Qt.ItemIsEditable:
+            return False
+
+        if event.type() == QtCore.QEvent.MouseButtonRelease and event.button() == QtCore.Qt.LeftButton:
+            color = get_color_from_maya_editor(index.data(QtCore.Qt.EditRole))
+            if color:
+                model.setData(index, color, QtCore.Qt.EditRole)
+            return True
+
+        return False
+
+
+class LightCheckBoxDelegate(QtWidgets.QStyledItemDelegate):
+    """ 复选框列的代理，在单元格中间绘制复选框，点击时切换状态 """
+
+    def paint(self, painter, option, index):
+        check_state = index.data(QtCore.Qt.CheckStateRole)
+        if check_state is None:
+            super(LightCheckBoxDelegate, self).paint(painter, option, index)
+            return
+
+        widget = option.widget
+        style = widget.style() if widget else QtWidgets.QApplication.style()
+
+        item_option = QtWidgets.QStyleOptionViewItem(option)
+        self.initStyleOption(item_option, index)
+        style.drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, item_option, painter, widget)
+
+        check_option = QtWidgets.QStyleOptionButton()
+        check_option.rect = self.check_box_rect(option, style)
+        check_option.state = QtWidgets.QStyle.State_Enabled
+        if check_state == QtCore.Qt.Checked:
+            check_option.state |= QtWidgets.QStyle.State_On
+        else:
+            check_option.state |= QtWidgets.QStyle.State_Off
+        style.drawPrimitive(QtWidgets.QStyle.PE_IndicatorCheckBox, check_option, painter, widget)
+
+    def check_box_rect(self, option, style):
+        check_option = QtWidgets.QStyleOptionButton()
+        rect = style.subElementRect(QtWidgets.QStyle.SE_CheckBoxIndicator, check_option, option.widget)
+        rect.moveCenter(option.rect.center())
+        return rect
+
+    def editorEvent(self, event, model, option, index):
+        if not index.flags() & QtCore.Qt.ItemIsUserCheckable:
+            return False
+
+        if event.type() == QtCore.QEvent.MouseButtonRelease and event.button() == QtCore.Qt.LeftButton:
+            if index.data(QtCore.Qt.CheckStateRole) == QtCore.Qt.Checked:
+                check_state = QtCore.Qt.Unchecked
+            else:
+                check_state = QtCore.Qt.Checked
+            return model.setData(index, check_state, QtCore.Qt.CheckStateRole)
+
+        return False
+
+
+class LightCallbackDispatcher(QtCore.QObject):
+    """ 所有灯光共用的事件分发器: 每个节点只注册一个属性改变回调，删除、改名和重新设置父级各只注册一个全局回调，
+        回调中通过节点的MObjectHandle找到对应的灯光，再通过信号通知面板 """
+
+    WATCHED_ATTRIBUTES = {
+        "visibility": "visibility",
+        "intensity": "intensity",
+        "color": "color",
+        "colorR": "color",
+        "colorG": "color",
+        "colorB": "color",
+        "emitDiffuse": "emitDiffuse",
+        "emitSpecular": "emitSpecular",
+    }
+
+    attribute_changed = QtCore.Signal(str, str) # uuid, 属性名
+    light_added = QtCore.Signal()
+    light_removed = QtCore.Signal(str) # uuid
+    light_renamed = QtCore.Signal(str) # uuid
+
+    def __init__(self, parent=None):
+        super(LightCallbackDispatcher, self).__init__(parent)
+
+        self._uuids_by_handle = {} # MObjectHandle.hashCode() -> [uuid, ...]，多个灯光shape可以在同一个transform下
+        self._callback_id_by_handle = {} # MObjectHandle.hashCode() -> 这个节点的属性改变回调
+        self._handles_by_uuid = {} # uuid -> 这个灯光shape和transform的MObjectHandle.hashCode()
+        self._global_callback_ids = []
+        self._suppressed = 0
+
+    @contextlib.contextmanager
+    def suppressed(self):
+        """ 在with块中忽略属性改变回调，用于面板自己批量设置属性时 """
+        self._suppressed += 1
+        try:
+            yield
+        finally:
+            self._suppressed -= 1
+
+    def start(self):
+        """ 注册全局的添加、删除和改名回调 """
+        if self._global_callback_ids:
+            return
+
+        # 只监听灯光类型的节点，导入大量其它节点时不会触发
+        self._global_callback_ids.append(om2.MDGMessage.addNodeAddedCallback(self._on_node_added, "light"))
+        self._global_callback_ids.append(om2.MDGMessage.addNodeRemovedCallback(self._on_node_removed, "light"))
+        self._global_callback_ids.append(om2.MNodeMessage.addNameChangedCallback(om2.MObject.kNullObj, self._on_name_changed))
+        # 重新设置父级后transform的长名字会改变，和改名一样通知面板重新读取
+        self._global_callback_ids.append(om2.MDagMessage.addParentAddedCallback(self._on_parent_added))
+
+    def stop(self):
+        """ 删除所有回调 """
+        self.clear_lights()
+
+        om2.MMessage.removeCallbacks(self._global_callback_ids)
+        self._global_callback_ids = []
+
+    def add_lights(self, light_data_list):
+        """ 为每个灯光的shape和transform注册属性改变回调，共用的transform只注册一次 """
+        shape_nodes = get_depend_nodes([light_data.shape_name for light_data in light_data_list])
+        transform_nodes = get_depend_nodes([light_data.transform_path for light_data in light_data_list])
+
+        for light_data, shape_node, transform_node in zip(light_data_list, shape_nodes, transform_nodes):
+            handles = []
+            for node in (shape_node, transform_node):
+                handle = om2.MObjectHandle(node).hashCode()
+                if handle not in self._callback_id_by_handle:
+                    self._callback_id_by_handle[handle] = om2.MNodeMessage.addAttributeChangedCallback(
+                        node, self._on_attribute_changed)
+                self._uuids_by_handle.setdefault(handle, []).append(light_data.uuid)
+                handles.append(handle)
+            self._handles_by_uuid[light_data.uuid] = handles
+
+    def remove_light(self, uuid):
+        """ 节点上没有其它灯光时才删除它的回调 """
+        for handle in self._handles_by_uuid.pop(uuid, []):
+            uuids = self._uuids_by_handle.get(handle, [])
+            if uuid in uuids:
+                uuids.remove(uuid)
+            if not uuids:
+                self._uuids_by_handle.pop(handle, None)
+                om2.MMessage.removeCallback(self._callback_id_by_handle.pop(handle))
+
+    def clear_lights(self):
+        om2.MMessage.removeCallbacks(list(self._callback_id_by_handle.values()))
+        self._callback_id_by_handle = {}
+        self._handles_by_uuid = {}
+        self._uuids_by_handle = {}
+
+    def callback_count(self):
+        return len(self._callback_id_by_handle) + len(self._global_callback_ids)
+
+    def find_uuids(self, node):
+        return list(self._uuids_by_handle.get(om2.MObjectHandle(node).hashCode(), []))
+
+    def _on_attribute_changed(self, message, plug, other_plug, client_data):
+        if self._suppressed or not message & om2.MNodeMessage.kAttributeSet:
+            return
+
+        attribute = self.WATCHED_ATTRIBUTES.get(plug.partialName(useLongNames=True))
+        if not attribute:
+            return
+
+        for uuid in self.find_uuids(plug.node()):
+            self.attribute_changed.emit(uuid, attribute)
+
+    def _on_node_added(self, node, client_data):
+        self.light_added.emit()
+
+    def _on_node_removed(self, node, client_data):
+        for uuid in self.find_uuids(node):
+            self.light_removed.emit(uuid)
+
+    def _on_name_changed(self, node, previous_name, client_data):
+        for uuid in self.find_uuids(node):
+            self.light_renamed.emit(uuid)
+
+    def _on_parent_added(self, child_path, parent_path, client_data):
+        for uuid in self.find_uuids(child_path.node()):
+            self.light_renamed.emit(uuid)
+
+
+class LightRefreshCoalescer(QtCore.QObject):
+    """ 合并属性改变事件: 记录改变了的灯光和属性，由QTimer在事件循环中统一刷新，
+        同一时间段内同一个灯光的多次改变只会刷新一次 """
+
+    refresh_requested = QtCore.Signal(object) # {uuid: 改变了的属性集合，None表示整个灯光都需要重新读取}
+
+    def __init__(self, interval=0, parent=None):
+        super(LightRefreshCoalescer, self).__init__(parent)
+
+        self._dirty_lights = {}
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+        self.set_interval(interval)
+
+    def set_interval(self, interval):
+        """ 设置刷新间隔(毫秒)，0表示每次事件循环刷新一次 """
+        self._timer.setInterval(interval)
+
+    def interval(self):
+        return self._timer.interval()
+
+    def mark_dirty(self, uuid, attribute=None):
+        """ 标记需要刷新的灯光，attribute为None时整个灯光重新读取 """
+        if attribute is None:
+            self._dirty_lights[uuid] = None
+        elif uuid not in self._dirty_lights:
+            self._dirty_lights[uuid] = set([attribute])
+        elif self._dirty_lights[uuid] is not None:
+            self._dirty_lights[uuid].add(attribute)
+
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def discard(self, uuid):
+        self._dirty_lights.pop(uuid, None)
+
+    def clear(self):
+        self._timer.stop()
+        self._dirty_lights = {}
+
+    def pending_count(self):
+        return len(self._dirty_lights)
+
+    def flush(self):
+        self._timer.stop()
+        if not self._dirty_lights:
+            return
+
+        dirty_lights = self._dirty_lights
+        self._dirty_lights = {}
+        self.refresh_requested.emit(dirty_lights)
+
+
+class LightBatchEditor(object):
+    """ 批量修改多个灯光: 一次遍历设置所有属性，放在同一个undo块中，
+        设置期间屏蔽回调，最后每一列只刷新一次 """
+
+    MIN_INTENSITY = 0.0 # 批量输入框允许负数(用于偏移)，写入的强度不能小于这个值
+
+    def __init__(self, light_model, callback_dispatcher=None):
+        self.light_model = light_model
+        self.callback_dispatcher = callback_dispatcher
+
+    def set_intensity(self, rows, value):
+        value = self.clamp_intensity(value)
+        return self.apply("setLightIntensity", rows, "intensity", lambda light_data: value)
+
+    def offset_intensity(self, rows, offset):
+        return self.apply("offsetLightIntensity", rows, "intensity",
+                          lambda light_data: self.clamp_intensity(light_data.intensity + offset))
+
+    def multiply_intensity(self, rows, factor):
+        return self.apply("multiplyLightIntensity", rows, "intensity",
+                          lambda light_data: self.clamp_intensity(light_data.intensity * factor))
+
+    def clamp_intensity(self, value):
+        return max(self.MIN_INTENSITY, value)
+
+    def set_color(self, rows, color):
+        rgb = (color.redF(), color.greenF(), color.blueF())
+        return self.apply("setLightColor", rows, "color", lambda light_data: rgb)
+
+    def set_visibility(self, rows, visible):
+        return self.apply("setLightVisibility", rows, "visibility", lambda light_data: visible)
+
+    def set_emit_diffuse(self, rows, enabled):
+        return self.apply("setLightEmitDiffuse", rows, "emitDiffuse", lambda light_data: enabled)
+
+    def set_emit_specular(self, rows, enabled):
+        return self.apply("setLightEmitSpecular", rows, "emitSpecular", lambda light_data: enabled)
+
+    def toggle_emit_diffuse(self, rows):
+        """ 只要有一个灯光没有开启就全部开启，否则全部关闭 """
+        return self.set_emit_diffuse(rows, not self.all_enabled(rows, "emit_diffuse"))
+
+    def toggle_emit_specular(self, rows):
+        return self.set_emit_specular(rows, not self.all_enabled(rows, "emit_specular"))
+
+    def all_enabled(self, rows, field):
+        values = [getattr(self.light_model.light_data(row), field) for row in rows]
+        return all(value for value in values if value is not None)
+
+    def apply(self, chunk_name, rows, attribute, get_value):
+        """ get_value根据灯光当前的数据返回新的值，值没有改变或灯光不支持这个属性时跳过 """
+        field = LightData.ATTRIBUTE_FIELDS[attribute]
+
+        # 缓存的路径在重新设置父级后会失效，设置前一次性通过uuid更新，已经删除的灯光跳过
+        light_data_list = [self.light_model.light_data(row) for row in rows]
+        missing_uuids = set(LightSnapshot.resolve_paths(light_data_list))
+        rows = [row for row, light_data in zip(rows, light_data_list) if light_data.uuid not in missing_uuids]
+
+        changed_rows = []
+        cmds.undoInfo(openChunk=True, chunkName=chunk_name)
+        try:
+            with self.suppress_callbacks():
+                for row in rows:
+                    light_data = self.light_model.light_data(row)
+                    current_value = getattr(light_data, field)
+                    if current_value is None:
+                        continue
+
+                    value = get_value(light_data)
+                    if value == current_value:
+                        continue
+
+                    try:
+                        set_light_attribute(light_data, attribute, value)
+                    except RuntimeError: # 属性被锁定或者有连接，跳过这个灯光，其它灯光继续设置
+                        continue
+
+                    setattr(light_data, field, value)
+                    changed_rows.append(row)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+        self.light_model.lights_changed(changed_rows, [attribute])
+        return len(changed_rows)
+
+    @contextlib.contextmanager
+    def suppress_callbacks(self):
+        if self.callback_dispatcher:
+            with self.callback_dispatcher.suppressed():
+                yield
+        else:
+            yield
 
-    def delete_script_jobs(self):
-        for job_number in self.script_jobs:
-            cmds.evalDeferred("if cmds.scriptJob(exists={0}):\tcmds.scriptJob(kill={0}, force=True)".format(job_number))
-        
-        self.script_jobs = []
-    
 
 class LightPanel(QtWidgets.QDialog):
 
     WINDOW_TITLE = "Light Panel"
 
+    REFRESH_INTERVAL = 0 # 属性改变后刷新面板的间隔(毫秒)，0表示每次事件循环最多刷新一次
+
     def __init__(self, parent=maya_main_window()):
         super(LightPanel, self).__init__(parent)
         
@@ -309,7 +827,6 @@ class LightPanel(QtWidgets.QDialog):
         self.setMinimumSize(500, 260)
         self.setWindowFlags(QtCore.Qt.WindowType.Window)
 
-        self.light_items = []
         self.script_jobs = []
 
         self.create_widgets()
@@ -318,47 +835,104 @@ class LightPanel(QtWidgets.QDialog):
 
     def create_widgets(self):
         """ 控件 """
+        self.light_model = LightTableModel(self)
+
+        self.light_view = QtWidgets.QTableView()
+        self.light_view.setModel(self.light_model)
+        self.light_view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.light_view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection) # 可以选择多个灯光批量修改
+        self.light_view.setEditTriggers(QtWidgets.QAbstractItemView.AllEditTriggers)
+        self.light_view.setShowGrid(False)
+        self.light_view.verticalHeader().hide()
+        self.light_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.light_view.verticalHeader().setDefaultSectionSize(26)
+
+        # 代理只在绘制和编辑可见的单元格时工作，不再为每个灯光创建控件
+        self.intensity_delegate = LightIntensityDelegate(self)
+        self.color_delegate = LightColorDelegate(self)
+        self.check_box_delegate = LightCheckBoxDelegate(self)
+        self.light_view.setItemDelegateForColumn(LightTableModel.VISIBILITY_COLUMN, self.check_box_delegate)
+        self.light_view.setItemDelegateForColumn(LightTableModel.INTENSITY_COLUMN, self.intensity_delegate)
+        self.light_view.setItemDelegateForColumn(LightTableModel.COLOR_COLUMN, self.color_delegate)
+        self.light_view.setItemDelegateForColumn(LightTableModel.EMIT_DIFFUSE_COLUMN, self.check_box_delegate)
+        self.light_view.setItemDelegateForColumn(LightTableModel.EMIT_SPECULAR_COLUMN, self.check_box_delegate)
+
+        self.light_view.setColumnWidth(LightTableModel.TYPE_COLUMN, 26)
+        self.light_view.setColumnWidth(LightTableModel.VISIBILITY_COLUMN, 26)
+        self.light_view.setColumnWidth(LightTableModel.NAME_COLUMN, 120)
+        self.light_view.setColumnWidth(LightTableModel.INTENSITY_COLUMN, 80)
+        self.light_view.setColumnWidth(LightTableModel.COLOR_COLUMN, 70)
+        self.light_view.setColumnWidth(LightTableModel.EMIT_DIFFUSE_COLUMN, 90)
+        self.light_view.setColumnWidth(LightTableModel.EMIT_SPECULAR_COLUMN, 80)
+        self.light_view.horizontalHeader().setStretchLastSection(True)
+
+        self.batch_intensity_dsb = QtWidgets.QDoubleSpinBox()
+        self.batch_intensity_dsb.setRange(-100.0, 100.0)
+        self.batch_intensity_dsb.setDecimals(3)
+        self.batch_intensity_dsb.setSingleStep(0.1)
+        self.batch_intensity_dsb.setValue(1.0)
+
+        self.batch_set_btn = QtWidgets.QPushButton("Set")
+        self.batch_offset_btn = QtWidgets.QPushButton("Offset")
+        self.batch_multiply_btn = QtWidgets.QPushButton("Multiply")
+        self.batch_color_btn = QtWidgets.QPushButton("Color...")
+        self.batch_diffuse_btn = QtWidgets.QPushButton("Diffuse")
+        self.batch_specular_btn = QtWidgets.QPushButton("Specular")
+
         self.refreshButton = QtWidgets.QPushButton("Refresh Lights")
 
+        self.callback_dispatcher = LightCallbackDispatcher(self)
+        self.refresh_coalescer = LightRefreshCoalescer(self.REFRESH_INTERVAL, self)
+        self.batch_editor = LightBatchEditor(self.light_model, self.callback_dispatcher)
+
+        # 添加或删除灯光后，在事件循环中只对比一次场景中的灯光
+        self.sync_timer = QtCore.QTimer(self)
+        self.sync_timer.setSingleShot(True)
+        self.sync_timer.setInterval(0)
+
     def create_layouts(self):
         """ 布局 """
-        header_layout = QtWidgets.QHBoxLayout()
-        header_layout.addSpacing(100)
-        header_layout.addWidget(QtWidgets.QLabel("Light"))
-        header_layout.addSpacing(50)
-        header_layout.addWidget(QtWidgets.QLabel("Intensity"))
-        header_layout.addSpacing(44)
-        header_layout.addWidget(QtWidgets.QLabel("Color"))
-        header_layout.addSpacing(24)
-        header_layout.addWidget(QtWidgets.QLabel("Emit Diffuse"))
-        header_layout.addSpacing(10)
-        header_layout.addWidget(QtWidgets.QLabel("Emit Spec"))
-        header_layout.addStretch()
+        batch_layout = QtWidgets.QHBoxLayout()
+        batch_layout.addWidget(QtWidgets.QLabel("Selected Intensity:"))
+        batch_layout.addWidget(self.batch_intensity_dsb)
+        batch_layout.addWidget(self.batch_set_btn)
+        batch_layout.addWidget(self.batch_offset_btn)
+        batch_layout.addWidget(self.batch_multiply_btn)
+        batch_layout.addSpacing(10)
+        batch_layout.addWidget(self.batch_color_btn)
+        batch_layout.addWidget(self.batch_diffuse_btn)
+        batch_layout.addWidget(self.batch_specular_btn)
+        batch_layout.addStretch()
 
         button_layout = QtWidgets.QHBoxLayout()
         button_layout.addStretch()
         button_layout.addWidget(self.refreshButton)
 
-        light_list_wdg = QtWidgets.QWidget()
-
-        self.light_layout = QtWidgets.QVBoxLayout(light_list_wdg) # light_list_wdg在light_layout下
-        self.light_layout.setContentsMargins(2, 2, 2, 2)
-        self.light_layout.addSpacing(3)
-        self.light_layout.setAlignment(QtCore.Qt.AlignTop)
-
-        light_list_scroll_area = QtWidgets.QScrollArea()
-        light_list_scroll_area.setWidgetResizable(True)
-        light_list_scroll_area.setWidget(light_list_wdg) # scroll_area下有light_list_wdg
-
         main_layout = QtWidgets.QVBoxLayout(self)
         main_layout.setContentsMargins(2, 2, 2, 2)
-        main_layout.addLayout(header_layout)
-        main_layout.addWidget(light_list_scroll_area) # 主布局下有个scroll_area
+        main_layout.addWidget(self.light_view)
+        main_layout.addLayout(batch_layout)
         main_layout.addLayout(button_layout)
 
     def create_connections(self):
         """ 信号与槽的连接 """
         self.refreshButton.clicked.connect(self.refresh_lights)
+        self.light_view.clicked.connect(self.on_light_view_clicked)
+
+        self.batch_set_btn.clicked.connect(self.on_batch_set_intensity)
+        self.batch_offset_btn.clicked.connect(self.on_batch_offset_intensity)
+        self.batch_multiply_btn.clicked.connect(self.on_batch_multiply_intensity)
+        self.batch_color_btn.clicked.connect(self.on_batch_set_color)
+        self.batch_diffuse_btn.clicked.connect(self.on_batch_toggle_emit_diffuse)
+        self.batch_specular_btn.clicked.connect(self.on_batch_toggle_emit_specular)
+
+        # 回调中只标记需要刷新的灯光，真正的刷新由refresh_coalescer在事件循环中合并进行
+        self.callback_dispatcher.attribute_changed.connect(self.refresh_coalescer.mark_dirty)
+        self.callback_dispatcher.light_renamed.connect(self.refresh_coalescer.mark_dirty)
+        self.callback_dispatcher.light_added.connect(self.sync_timer.start)
+        self.callback_dispatcher.light_removed.connect(self.on_node_deleted)
+        self.refresh_coalescer.refresh_requested.connect(self.refresh_dirty_lights)
+        self.sync_timer.timeout.connect(self.sync_lights)
         
     def get_lights_in_scene(self):
         """ 得到场景中所有灯光 """
@@ -368,30 +942,99 @@ class LightPanel(QtWidgets.QDialog):
         """ 刷新灯光面板 """
         self.clear_lights()
 
-        scene_lights = self.get_lights_in_scene()
-        for light in scene_lights:
-            light_item = LightItem(light)
-            light_item.node_deleted.connect(self.on_node_deleted) # 自定义信号node_deleted发送数据时传给on_node_deleted函数
-
-            self.light_layout.addWidget(light_item)
-            self.light_items.append(light_item)
-            
+        snapshot = LightSnapshot.read() # 一次性读取所有灯光的属性
+        self.light_model.set_snapshot(snapshot)
+        self.callback_dispatcher.add_lights(snapshot.light_data_list)
     
     def clear_lights(self):
         """ 清空灯光面板 """
-        for light in self.light_items:
-            light.delete_script_jobs()
+        self.sync_timer.stop()
+        self.callback_dispatcher.clear_lights()
+        self.refresh_coalescer.clear()
+        self.light_model.clear()
+
+    def sync_lights(self):
+        """ 按uuid对比场景和面板中的灯光，只插入新的灯光、删除已经不存在的灯光，
+            其它行和它们的回调保持不变 """
+        scene_uuids = cmds.ls(typ="light", uuid=True)
+        scene_uuid_set = set(scene_uuids)
+
+        removed_uuids = [light_data.uuid for light_data in self.light_model.light_data_list if light_data.uuid not in scene_uuid_set]
+        added_uuids = [uuid for uuid in scene_uuids if self.light_model.row_for_uuid(uuid) < 0]
+
+        if removed_uuids:
+            for uuid in removed_uuids:
+                self.callback_dispatcher.remove_light(uuid)
+                self.refresh_coalescer.discard(uuid)
+            self.light_model.remove_lights(removed_uuids)
+
+        if added_uuids:
+            snapshot = LightSnapshot.read(added_uuids)
+            self.light_model.insert_lights(snapshot.light_data_list)
+            self.callback_dispatcher.add_lights(snapshot.light_data_list)
+
+    def set_refresh_interval(self, interval):
+        """ 设置属性改变后刷新面板的间隔(毫秒)，例如拖动时间轴时可以设置为33(约30帧每秒) """
+        self.refresh_coalescer.set_interval(interval)
+
+    def refresh_dirty_lights(self, dirty_lights):
+        """ 合并后的刷新: 每个灯光只刷新一次，并且只重新读取改变了的属性 """
+        reread_uuids = []
+        changed_lights = []
+        for uuid, attributes in dirty_lights.items():
+            light_data = self.light_model.light_data_for_uuid(uuid)
+            if light_data is None:
+                continue
+            if attributes is None:
+                reread_uuids.append(uuid)
+            else:
+                changed_lights.append((light_data, attributes))
+
+        reread_uuids.extend(LightSnapshot.update_attributes(changed_lights))
+        invalid_uuids = set(reread_uuids)
+        for light_data, attributes in changed_lights:
+            if light_data.uuid not in invalid_uuids:
+                self.light_model.update_light(light_data, attributes)
+
+        if reread_uuids:
+            for light_data in LightSnapshot.read(reread_uuids):
+                self.light_model.update_light(light_data)
+
+    def selected_rows(self):
+        """ 得到选中的所有行 """
+        return sorted(index.row() for index in self.light_view.selectionModel().selectedRows())
+
+    def on_batch_set_intensity(self):
+        self.batch_editor.set_intensity(self.selected_rows(), self.batch_intensity_dsb.value())
+
+    def on_batch_offset_intensity(self):
+        self.batch_editor.offset_intensity(self.selected_rows(), self.batch_intensity_dsb.value())
+
+    def on_batch_multiply_intensity(self):
+        self.batch_editor.multiply_intensity(self.selected_rows(), self.batch_intensity_dsb.value())
+
+    def on_batch_set_color(self):
+        rows = [row for row in self.selected_rows() if self.light_model.light_data(row).color is not None]
+        if not rows:
+            return
+
+        color = get_color_from_maya_editor(self.light_model.light_data(rows[0]).qcolor())
+        if color:
+            self.batch_editor.set_color(rows, color)
+
+    def on_batch_toggle_emit_diffuse(self):
+        self.batch_editor.toggle_emit_diffuse(self.selected_rows())
+
+    def on_batch_toggle_emit_specular(self):
+        self.batch_editor.toggle_emit_specular(self.selected_rows())
+
+    def on_light_view_clicked(self, index):
+        """ 点击灯光图标时选择灯光 """
+        if index.column() == LightTableModel.TYPE_COLUMN:
+            cmds.select(self.light_model.light_data(index.row()).transform_path)
 
-        self.light_items = []
-        
-        while self.light_layout.count() > 0:
-            light_item = self.light_layout.takeAt(0)
-            if light_item.widget():
-                light_item.widget().deleteLater()
-    
     def create_script_jobs(self):
-        """ 创建script jobs """
-        self.script_jobs.append(cmds.scriptJob(event=["DagObjectCreated", partial(self.on_dag_object_created)])) # 当创建dag物体时执行on_dag_object_created函数
+        """ 创建script jobs，新建灯光由callback_dispatcher的节点添加回调处理 """
         self.script_jobs.append(cmds.scriptJob(event=["Undo", partial(self.on_undo)])) # 当ctrl+z时执行on_undo函数
 
     def delete_script_jobs(self):
@@ -401,30 +1044,25 @@ class LightPanel(QtWidgets.QDialog):
 
         self.script_jobs = []
 
-    def on_dag_object_created(self):
-        """ 当dag中出现新物体时执行 """
-        if len(cmds.ls(typ="light")) != len(self.light_items):
-            print("New light created...")
-            self.refresh_lights()
-
     def on_undo(self):
         """ ctrl+z时执行 """
-        if len(cmds.ls(typ="light")) != len(self.light_items):
-            print("Undo light created...")
-            self.refresh_lights()
+        self.sync_timer.start()
 
-    def on_node_deleted(self):
-        """ 节点删除时执行 """
-        self.refresh_lights()
+    def on_node_deleted(self, uuid):
+        """ 节点删除时执行，节点在回调中还没有真正删除，所以在事件循环中再对比 """
+        self.refresh_coalescer.discard(uuid)
+        self.sync_timer.start()
 
     def showEvent(self, event):
         """ 当打开窗口时执行 """
+        self.callback_dispatcher.start()
         self.refresh_lights()
         self.create_script_jobs()
     
     def closeEvent(self, event):
         """ 当关闭窗口时执行 """
         self.clear_lights()
+        self.callback_dispatcher.stop()
         self.delete_script_jobs()
 
 if __name__ == '__main__':
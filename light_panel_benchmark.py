@@ -0,0 +1,475 @@
+# coding:utf-8
+# 灯光面板性能测试: 使用fake_maya中的假cmds统计每个灯光的命令调用次数
+# 在maya的脚本编辑器中: import light_panel_benchmark; light_panel_benchmark.main()
+# 在maya外(需要PySide2): python light_panel_benchmark.py
+import time
+
+import fake_maya
+fake_maya.install_if_missing()
+
+import light_panel
+
+
+LIGHT_TYPES = ["ambientLight", "directionalLight", "pointLight", "spotLight", "areaLight"]
+
+
+def create_light_scene(light_count):
+    scene = fake_maya.FakeScene()
+    for i in range(light_count):
+        scene.create_light(LIGHT_TYPES[i % len(LIGHT_TYPES)], intensity=float(i % 10))
+    return scene
+
+
+def read_lights_one_by_one(cmds, lights):
+    """ 旧的每个灯光一个控件(LightItem.update_values)的读取方式: 每个灯光单独调用getAttr/listRelatives/objectType """
+    for light in lights:
+        light_type = cmds.objectType(light)
+        cmds.objectType(light) # get_light_type_icon
+        transform_name = cmds.listRelatives(light, parent=True)[0]
+        cmds.listRelatives(light, parent=True) # is_visible
+        cmds.getAttr("{0}.visibility".format(transform_name))
+        if light_type in light_panel.LightData.SUPPORTED_TYPES:
+            cmds.getAttr("{0}.intensity".format(light))
+            cmds.getAttr("{0}.color".format(light))
+            if light_type in light_panel.LightData.EMIT_TYPES:
+                cmds.getAttr("{0}.emitDiffuse".format(light))
+                cmds.getAttr("{0}.emitSpecular".format(light))
+
+
+def create_script_jobs_one_by_one(cmds, light):
+    """ 旧的每个灯光一个控件(LightItem.create_script_jobs)的监听方式: 每个属性、删除和改名各一个script job """
+    def on_change(*args):
+        pass
+
+    transform_name = cmds.listRelatives(light, parent=True, fullPath=True)[0]
+    attributes = ["{0}.visibility".format(transform_name)]
+    light_type = cmds.objectType(light)
+    if light_type in light_panel.LightData.SUPPORTED_TYPES:
+        attributes.extend("{0}.{1}".format(light, attribute) for attribute in ("color", "intensity"))
+        if light_type in light_panel.LightData.EMIT_TYPES:
+            attributes.extend("{0}.{1}".format(light, attribute) for attribute in ("emitDiffuse", "emitSpecular"))
+
+    script_jobs = [cmds.scriptJob(attributeChange=(attribute, on_change)) for attribute in attributes]
+    script_jobs.append(cmds.scriptJob(nodeDeleted=(light, on_change)))
+    script_jobs.append(cmds.scriptJob(nodeNameChanged=(light, on_change)))
+    return script_jobs
+
+
+def delete_script_jobs(cmds, script_jobs):
+    for job_number in script_jobs:
+        cmds.evalDeferred("if cmds.scriptJob(exists={0}):\tcmds.scriptJob(kill={0}, force=True)".format(job_number))
+
+
+def benchmark_snapshot(light_count=800):
+    scene = create_light_scene(light_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        lights = fake_cmds.ls(typ="light")
+
+        fake_cmds.reset_counts()
+        start = time.time()
+        read_lights_one_by_one(fake_cmds, lights)
+        per_light_time = time.time() - start
+        per_light_calls = fake_cmds.total_calls()
+
+        fake_cmds.reset_counts()
+        start = time.time()
+        snapshot = light_panel.LightSnapshot.read()
+        snapshot_time = time.time() - start
+        snapshot_calls = fake_cmds.total_calls()
+        assert len(snapshot) == light_count
+    finally:
+        restore()
+
+    print("{0} lights".format(light_count))
+    print("  one by one: {0:6d} cmds calls ({1:.2f} per light) {2:.4f}s".format(
+        per_light_calls, per_light_calls / float(light_count), per_light_time))
+    print("  snapshot:   {0:6d} cmds calls ({1:.4f} per light) {2:.4f}s, {3} plug reads".format(
+        snapshot_calls, snapshot_calls / float(light_count), snapshot_time, fake_om2.total_calls()))
+
+
+def benchmark_refresh_lights(light_count=800):
+    scene = create_light_scene(light_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        panel = light_panel.LightPanel()
+
+        fake_cmds.reset_counts()
+        start = time.time()
+        panel.refresh_lights()
+        refresh_time = time.time() - start
+
+        calls = dict(fake_cmds.call_counts)
+        panel.clear_lights()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("LightPanel.refresh_lights with {0} lights: {1:.4f}s".format(light_count, refresh_time))
+    for command in sorted(calls):
+        print("  {0:16s} {1:6d} ({2:.2f} per light)".format(command, calls[command], calls[command] / float(light_count)))
+
+
+def benchmark_listener_setup(light_count=500):
+    """ 比较每个灯光7个script job与共用的回调分发器的注册和删除时间 """
+    scene = create_light_scene(light_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        lights = fake_cmds.ls(typ="light")
+
+        start = time.time()
+        script_jobs = [create_script_jobs_one_by_one(fake_cmds, light) for light in lights]
+        script_job_setup_time = time.time() - start
+        script_job_count = len(fake_cmds.script_jobs)
+
+        start = time.time()
+        for light_script_jobs in script_jobs:
+            delete_script_jobs(fake_cmds, light_script_jobs)
+        script_job_teardown_time = time.time() - start
+
+        snapshot = light_panel.LightSnapshot.read()
+        dispatcher = light_panel.LightCallbackDispatcher()
+
+        start = time.time()
+        dispatcher.start()
+        dispatcher.add_lights(snapshot.light_data_list)
+        callback_setup_time = time.time() - start
+        callback_count = dispatcher.callback_count()
+
+        start = time.time()
+        dispatcher.stop()
+        callback_teardown_time = time.time() - start
+    finally:
+        restore()
+
+    print("Listener setup/teardown with {0} lights".format(light_count))
+    print("  script jobs: {0:6d} registered, setup {1:.4f}s, teardown {2:.4f}s".format(
+        script_job_count, script_job_setup_time, script_job_teardown_time))
+    print("  dispatcher:  {0:6d} registered, setup {1:.4f}s, teardown {2:.4f}s".format(
+        callback_count, callback_setup_time, callback_teardown_time))
+
+
+def benchmark_attribute_storm(light_count=1000, changes_per_light=5):
+    """ 模拟批量脚本修改大量灯光属性: 统计合并后的刷新次数 """
+    from PySide2 import QtWidgets
+
+    scene = create_light_scene(light_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        panel = light_panel.LightPanel()
+        panel.callback_dispatcher.start()
+        panel.refresh_lights()
+
+        refreshed_cells = []
+        panel.light_model.dataChanged.connect(lambda top_left, bottom_right: refreshed_cells.append(top_left))
+        lights = fake_cmds.ls(typ="light")
+
+        fake_om2.reset_counts()
+        start = time.time()
+        for i in range(changes_per_light):
+            for light in lights:
+                fake_cmds.setAttr("{0}.intensity".format(light), float(i))
+        QtWidgets.QApplication.processEvents() # 合并后的刷新在这次事件循环中执行
+        storm_time = time.time() - start
+
+        plug_reads = fake_om2.call_counts["MPlug.asFloat"] + fake_om2.call_counts["MPlug.asBool"]
+        panel.clear_lights()
+        panel.callback_dispatcher.stop()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("{0} attribute changes on {1} lights: {2:.4f}s".format(light_count * changes_per_light, light_count, storm_time))
+    print("  {0} cell refreshes, {1} plug reads".format(len(refreshed_cells), plug_reads))
+
+
+def benchmark_scene_import(light_count=200, imported_transform_count=10000, imported_light_count=5):
+    """ 模拟导入大量物体: 旧的DagObjectCreated每个物体调用一次cmds.ls，新的方式只对灯光节点回调并对比一次 """
+    from PySide2 import QtWidgets
+
+    scene = create_light_scene(light_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        start = time.time()
+        for i in range(imported_transform_count):
+            len(fake_cmds.ls(typ="light")) # 旧的on_dag_object_created
+        per_object_time = time.time() - start
+
+        panel = light_panel.LightPanel()
+        panel.callback_dispatcher.start()
+        panel.refresh_lights()
+        existing_rows = list(panel.light_model.light_data_list)
+
+        fake_cmds.reset_counts()
+        start = time.time()
+        for i in range(imported_transform_count):
+            fake_cmds.createNode("transform", "imported{0}".format(i))
+        for i in range(imported_light_count):
+            fake_om2.notify_node_added(scene.create_light("pointLight", "importedLight{0}".format(i)))
+        QtWidgets.QApplication.processEvents()
+        incremental_time = time.time() - start
+
+        ls_calls = fake_cmds.call_counts["ls"]
+        row_count = panel.light_model.rowCount()
+        kept_rows = all(a is b for a, b in zip(existing_rows, panel.light_model.light_data_list))
+        panel.clear_lights()
+        panel.callback_dispatcher.stop()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("Import {0} transforms + {1} lights into a {2} light scene".format(imported_transform_count, imported_light_count, light_count))
+    print("  DagObjectCreated + ls per object: {0} ls calls, {1:.4f}s".format(imported_transform_count, per_object_time))
+    print("  node added callback + uuid diff:  {0} ls calls, {1:.4f}s, {2} rows, existing rows kept: {3}".format(
+        ls_calls, incremental_time, row_count, kept_rows))
+
+
+def benchmark_batch_edit(light_count=1000):
+    """ 批量修改1000个灯光的吞吐量，每次操作只有一个undo块，并且不会触发面板刷新 """
+    from PySide2 import QtWidgets
+
+    scene = create_light_scene(light_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        panel = light_panel.LightPanel()
+        panel.callback_dispatcher.start()
+        panel.refresh_lights()
+        rows = list(range(panel.light_model.rowCount()))
+        editor = panel.batch_editor
+
+        operations = [
+            ("set intensity", lambda: editor.set_intensity(rows, 2.0)),
+            ("offset intensity", lambda: editor.offset_intensity(rows, 0.5)),
+            ("multiply intensity", lambda: editor.multiply_intensity(rows, 1.5)),
+            ("set color", lambda: editor.set_color(rows, light_panel.QtGui.QColor(255, 128, 0))),
+            ("toggle emit diffuse", lambda: editor.toggle_emit_diffuse(rows)),
+            ("toggle emit specular", lambda: editor.toggle_emit_specular(rows)),
+        ]
+
+        results = []
+        for name, operation in operations:
+            fake_cmds.reset_counts()
+            undo_chunk_count = fake_cmds.undo_chunk_count
+            start = time.time()
+            operation()
+            QtWidgets.QApplication.processEvents()
+            elapsed = time.time() - start
+            results.append((name, elapsed, fake_cmds.call_counts["setAttr"],
+                            fake_cmds.undo_chunk_count - undo_chunk_count, panel.refresh_coalescer.pending_count()))
+
+        panel.clear_lights()
+        panel.callback_dispatcher.stop()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("Batch edit {0} lights".format(light_count))
+    for name, elapsed, set_attr_calls, undo_chunks, pending in results:
+        print("  {0:20s} {1:.4f}s ({2:8.0f} lights/s), {3} setAttr, {4} undo chunk, {5} pending refreshes".format(
+            name, elapsed, set_attr_calls / elapsed if elapsed else 0.0, set_attr_calls, undo_chunks, pending))
+
+
+def check_metadata_cache():
+    """ 检查灯光类型和transform名字缓存在模型的LightData中: 绘制表格和属性改变时不再查询，
+        改名或重新设置父级后只重新读取这个灯光 """
+    from PySide2 import QtWidgets
+
+    scene = create_light_scene(0)
+    scene.create_light("pointLight", "keyLight")
+    scene.create_light("spotLight", "rimLight")
+    scene.create_light("areaLight", "fillLight")
+    scene.create_node("transform", "lightGroup")
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        panel = light_panel.LightPanel()
+        panel.callback_dispatcher.start()
+        panel.refresh_lights()
+        panel.show()
+        QtWidgets.QApplication.processEvents()
+        model = panel.light_model
+
+        # 类型图标、名字和颜色块都由模型和代理绘制，不调用cmds
+        fake_cmds.reset_counts()
+        panel.light_view.grab()
+        for i in range(5):
+            fake_cmds.setAttr("keyLightShape.intensity", float(i))
+            fake_cmds.setAttr("rimLightShape.color", 0.1 * i, 0.2, 0.3)
+            fake_cmds.setAttr("fillLight.visibility", i % 2 == 0)
+            QtWidgets.QApplication.processEvents()
+            panel.light_view.grab()
+        assert fake_cmds.total_calls() == fake_cmds.call_counts["setAttr"] == 15, fake_cmds.call_counts
+        assert model.light_data(0).intensity == 4.0 and model.light_data(2).visibility is True
+
+        # 改名和重新设置父级后只为这个灯光读取一次快照，类型保持不变
+        fake_cmds.reset_counts()
+        fake_cmds.rename("keyLightShape", "otherLightShape")
+        fake_cmds.parent("fillLight", "lightGroup")
+        QtWidgets.QApplication.processEvents()
+        assert fake_cmds.call_counts["ls"] == 2, fake_cmds.call_counts # 一次快照读取两个灯光
+        assert model.light_data(0).shape_name == "|keyLight|otherLightShape", model.light_data(0).shape_name
+        assert model.light_data(0).light_type == "pointLight"
+        assert model.index(2, model.NAME_COLUMN).data() == "fillLight"
+        assert model.light_data(2).transform_path == "|lightGroup|fillLight", model.light_data(2).transform_path
+
+        panel.clear_lights()
+        panel.callback_dispatcher.stop()
+        panel.close()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("Light metadata cache: cached in the model, re-read once after rename/reparent - ok")
+
+
+def check_edit_after_reparent():
+    """ 检查灯光或它的父级被重新设置父级、改名后，单个修改和批量修改都能设置到正确的节点，
+        某个灯光的属性被锁定时只跳过这个灯光，undo块正常关闭 """
+    from PySide2 import QtCore
+
+    scene = create_light_scene(0)
+    for name in ("keyLight", "fillLight", "rimLight", "bounceLight"):
+        scene.create_light("pointLight", name, intensity=1.0)
+    scene.create_node("transform", "lightGroup")
+    scene.create_node("transform", "rig")
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        panel = light_panel.LightPanel()
+        panel.callback_dispatcher.start()
+        panel.refresh_lights()
+        model = panel.light_model
+        rows = list(range(model.rowCount()))
+
+        # 不处理事件循环，模型中缓存的仍然是旧的长路径
+        fake_cmds.parent("keyLight", "lightGroup")
+        fake_cmds.parent("fillLight", "lightGroup")
+        fake_cmds.parent("lightGroup", "rig")
+        fake_cmds.rename("lightGroup", "keyGroup")
+        fake_cmds.setAttr("rimLightShape.intensity", lock=True)
+
+        changed = panel.batch_editor.set_intensity(rows, 5.0)
+        assert changed == 3, changed
+        assert fake_cmds._open_undo_chunks == 0
+        for name, intensity in (("keyLight", 5.0), ("fillLight", 5.0), ("rimLight", 1.0), ("bounceLight", 5.0)):
+            assert scene.find(name + "Shape").attributes["intensity"] == intensity, name
+            assert model.light_data_for_uuid(scene.find(name + "Shape").uuid).intensity == intensity, name
+        assert model.light_data(0).transform_path == "|rig|keyGroup|keyLight", model.light_data(0).transform_path
+
+        fake_cmds.parent("keyGroup", "bounceLight")
+        assert model.setData(model.index(0, model.VISIBILITY_COLUMN), QtCore.Qt.Unchecked, QtCore.Qt.CheckStateRole)
+        assert scene.find("keyLight").attributes["visibility"] is False
+        assert not model.setData(model.index(2, model.INTENSITY_COLUMN), 2.0)
+
+        panel.clear_lights()
+        panel.callback_dispatcher.stop()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("Light edits after reparent/rename/lock: resolved by uuid - ok")
+
+
+def check_batch_intensity_clamp():
+    """ 检查批量设置、偏移和相乘的强度不会写入负数，已经是0的灯光不会重复设置 """
+    scene = create_light_scene(0)
+    for name, intensity in (("keyLight", 1.0), ("fillLight", 3.0), ("rimLight", 0.5)):
+        scene.create_light("pointLight", name, intensity=intensity)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        panel = light_panel.LightPanel()
+        panel.refresh_lights()
+        model = panel.light_model
+        rows = list(range(model.rowCount()))
+
+        def intensities():
+            return [scene.find(name + "Shape").attributes["intensity"] for name in ("keyLight", "fillLight", "rimLight")]
+
+        assert panel.batch_editor.offset_intensity(rows, -2.0) == 3
+        assert intensities() == [0.0, 1.0, 0.0], intensities()
+        assert [model.light_data(row).intensity for row in rows] == [0.0, 1.0, 0.0]
+
+        assert panel.batch_editor.multiply_intensity(rows, -1.0) == 1
+        assert intensities() == [0.0, 0.0, 0.0], intensities()
+
+        fake_cmds.reset_counts()
+        assert panel.batch_editor.set_intensity(rows, -5.0) == 0
+        assert fake_cmds.call_counts["setAttr"] == 0
+
+        panel.clear_lights()
+        panel.deleteLater()
+    finally:
+        restore()
+
+    print("Batch intensity edits: clamped at {0} - ok".format(light_panel.LightBatchEditor.MIN_INTENSITY))
+
+
+def create_shared_transform_scene():
+    """ rig下有两个灯光shape，前后各有一个普通的灯光 """
+    scene = create_light_scene(0)
+    scene.create_light("pointLight", "keyLight", intensity=1.0)
+    scene.create_node("transform", "rig", visibility=False)
+    scene.create_node("spotLight", "rigSpotShape", parent="rig", intensity=2.0, color=(1.0, 0.0, 0.0),
+                      emitDiffuse=True, emitSpecular=True)
+    scene.create_node("pointLight", "rigPointShape", parent="rig", intensity=3.0, color=(0.0, 1.0, 0.0),
+                      emitDiffuse=True, emitSpecular=False)
+    scene.create_light("areaLight", "fillLight", intensity=4.0)
+    return scene
+
+
+def check_shared_transform():
+    """ 多个灯光shape在同一个transform下时，MSelectionList会合并重复的transform，每个灯光仍然读取到自己的属性 """
+    scene = create_shared_transform_scene()
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(light_panel, scene)
+    try:
+        snapshot = light_panel.LightSnapshot.read()
+        values = dict((light_data.shape_name, (light_data.transform_path, light_data.visibility, light_data.intensity))
+                      for light_data in snapshot)
+        assert values == {"|keyLight|keyLightShape": ("|keyLight", True, 1.0),
+                          "|rig|rigSpotShape": ("|rig", False, 2.0),
+                          "|rig|rigPointShape": ("|rig", False, 3.0),
+                          "|fillLight|fillLightShape": ("|fillLight", True, 4.0)}, values
+        assert snapshot.get(scene.find("rigPointShape").uuid).emit_specular is False
+
+        # 共用的transform只注册一个回调，改变它的属性时两个灯光都收到通知，删除一个灯光后另一个仍然能收到
+        dispatcher = light_panel.LightCallbackDispatcher()
+        changes = []
+        dispatcher.attribute_changed.connect(lambda uuid, attribute: changes.append((scene.find(uuid).name, attribute)))
+        dispatcher.add_lights(snapshot.light_data_list)
+        assert dispatcher.callback_count() == 7, dispatcher.callback_count()
+
+        fake_cmds.setAttr("rig.visibility", True)
+        fake_cmds.setAttr("rigPointShape.intensity", 5.0)
+        assert sorted(changes) == [("rigPointShape", "intensity"), ("rigPointShape", "visibility"),
+                                   ("rigSpotShape", "visibility")], changes
+
+        del changes[:]
+        dispatcher.remove_light(scene.find("rigSpotShape").uuid)
+        assert dispatcher.callback_count() == 6, dispatcher.callback_count()
+        fake_cmds.setAttr("rig.visibility", False)
+        assert changes == [("rigPointShape", "visibility")], changes
+
+        dispatcher.remove_light(scene.find("rigPointShape").uuid)
+        assert dispatcher.callback_count() == 4, dispatcher.callback_count()
+        dispatcher.stop()
+        assert not fake_om2.callbacks, fake_om2.callbacks
+    finally:
+        restore()
+
+    print("Lights sharing a transform: each light reads its own attributes and gets its transform's changes - ok")
+
+
+def main():
+    check_shared_transform()
+    check_metadata_cache()
+    check_edit_after_reparent()
+    check_batch_intensity_clamp()
+    for light_count in (100, 800):
+        benchmark_snapshot(light_count)
+    benchmark_refresh_lights(800)
+    benchmark_listener_setup(500)
+    benchmark_attribute_storm(1000)
+    benchmark_scene_import()
+    benchmark_batch_edit()
+
+
+if __name__ == "__main__":
+    main()
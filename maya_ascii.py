@@ -0,0 +1,357 @@
+# coding:utf-8
+# 不打开场景读取Maya ASCII(.ma)文件的信息
+# 文件头: requires、fileInfo、currentUnit和file -r引用，读到第一个createNode就停止，大文件也只需要几毫秒
+# 节点索引: 把文件映射到内存中，只匹配createNode行，类型、名字和父级保存在紧凑的数组中
+import bisect
+import codecs
+import collections
+import itertools
+import mmap
+import os
+import re
+from array import array
+
+try:
+    from itertools import accumulate
+except ImportError:
+    accumulate = None  # python2没有accumulate
+
+
+MAYA_ASCII_SIGNATURE = b"//Maya ASCII"
+
+HEADER_COMMANDS = ("requires", "currentUnit", "fileInfo", "file")  # 文件头中的命令，遇到其它命令(通常是createNode)说明文件头结束
+
+UNIT_FLAGS = {"-l": "linear", "-linear": "linear",
+              "-a": "angle", "-angle": "angle",
+              "-t": "time", "-time": "time"}
+
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+Requirement = collections.namedtuple("Requirement", "plugin version node_types data_types")
+
+Reference = collections.namedtuple("Reference", "path namespace reference_node file_type depth deferred")
+
+CHUNK_SIZE = 262144  # 每次扫描256K，几乎只有createNode的文件中每段也只需要几毫秒，不超过TaskRunner的时间片
+
+# createNode <type> [-s] [-ss] [-n "<name>"] [-p "<parent>"]; 以换行开头，脚本字符串中的createNode不会被匹配
+# maya保存时参数之间只有一个空格并且只使用短参数名，只匹配这种写法
+NODE_PATTERN = re.compile(br'\ncreateNode ([^ ;\r\n]+)(?: -s+)*(?: -n "([^"\r\n]*)")?(?: -p "([^"\r\n]*)")?')
+
+
+def split_statement(statement):
+    """ 按空格拆分一条MEL语句，引号中的字符串去掉引号并处理转义 """
+    tokens = []
+    i = 0
+    length = len(statement)
+    while i < length:
+        char = statement[i]
+        if char.isspace():
+            i += 1
+        elif char == '"':
+            chars = []
+            i += 1
+            while i < length and statement[i] != '"':
+                if statement[i] == "\\" and i + 1 < length:
+                    i += 1
+                    chars.append(ESCAPES.get(statement[i], statement[i]))
+                else:
+                    chars.append(statement[i])
+                i += 1
+            tokens.append("".join(chars))
+            i += 1
+        else:
+            end = i
+            while end < length and not statement[end].isspace():
+                end += 1
+            tokens.append(statement[i:end])
+            i = end
+    return tokens
+
+
+def find_statement_end(line, in_string=False):
+    """ 返回(分号的位置, 行尾是否还在字符串中)，引号中的分号不算，没有结束时位置为-1 """
+    i = 0
+    length = len(line)
+    while i < length:
+        char = line[i]
+        if in_string:
+            if char == "\\":
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ";":
+            return i, False
+        i += 1
+    return -1, in_string
+
+
+def flag_values(tokens, *flags):
+    """ 返回所有flags后面的值，例如requires中多个-nodeType """
+    return [tokens[i + 1] for i, token in enumerate(tokens[:-1]) if token in flags]
+
+
+def strip_copy_number(path):
+    """ 同一个文件被引用多次时路径后面有{1}这样的编号 """
+    return re.sub(r"\{\d+\}$", "", path)
+
+
+def codec_name(codeset):
+    """ //Codeset: 936是Windows代码页，新版本maya为UTF-8 """
+    name = "cp" + codeset if codeset.isdigit() else codeset
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return "utf-8"
+
+
+class MayaAsciiHeader(object):
+    """ .ma文件头中的信息 """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file_size = 0
+        self.header_size = 0  # 读取了多少字节
+        self.maya_version = ""  # 第一行//Maya ASCII 2018ff09 scene中的版本
+        self.comments = collections.OrderedDict()  # //Name:、//Last modified:、//Codeset:
+        self.requirements = []
+        self.units = {}
+        self.file_info = collections.OrderedDict()
+        self.references = []
+
+    @property
+    def codeset(self):
+        return self.comments.get("Codeset", "")
+
+    def required_maya_version(self):
+        for requirement in self.requirements:
+            if requirement.plugin == "maya":
+                return requirement.version
+        return self.maya_version
+
+    def plugins(self):
+        """ requires maya之外的插件 """
+        return [requirement for requirement in self.requirements if requirement.plugin != "maya"]
+
+    def parse_comment(self, text):
+        text = text[2:].strip()
+        if text.startswith("Maya ASCII"):
+            self.maya_version = text[len("Maya ASCII"):].replace("scene", "").strip()
+        elif ":" in text:
+            key, value = text.split(":", 1)
+            self.comments[key.strip()] = value.strip()
+
+    def parse_statement(self, statement):
+        tokens = split_statement(statement)
+        command, arguments = tokens[0], tokens[1:]
+        if command == "requires" and len(arguments) >= 2:
+            self.requirements.append(Requirement(arguments[-2], arguments[-1],
+                                                 flag_values(arguments, "-nodeType", "-nt"),
+                                                 flag_values(arguments, "-dataType", "-dt")))
+        elif command == "currentUnit":
+            for i, flag in enumerate(arguments[:-1]):
+                if flag in UNIT_FLAGS:
+                    self.units[UNIT_FLAGS[flag]] = arguments[i + 1]
+        elif command == "fileInfo" and len(arguments) >= 2:
+            self.file_info[arguments[0]] = arguments[1]
+        elif command == "file" and arguments:
+            self.parse_reference(arguments)
+
+    def parse_reference(self, arguments):
+        """ file -r是场景直接引用的文件，file -rdi 1和-r重复，-rdi 2以上是引用文件中嵌套的引用 """
+        if "-r" in arguments or "-reference" in arguments:
+            depth = 1
+        else:
+            depth_values = flag_values(arguments, "-rdi", "-referenceDepthInfo")
+            if not depth_values or not depth_values[0].isdigit() or int(depth_values[0]) < 2:
+                return
+            depth = int(depth_values[0])
+
+        def value(*flags):
+            values = flag_values(arguments, *flags)
+            return values[0] if values else ""
+
+        self.references.append(Reference(arguments[-1], value("-ns", "-namespace"), value("-rfn", "-referenceNode"),
+                                         value("-typ", "-type"), depth, value("-dr", "-deferReference") == "1"))
+
+
+def read_header(file_path):
+    """ 逐行读取文件头，遇到第一个不属于文件头的语句就停止，不是.ma文件时抛出ValueError """
+    header = MayaAsciiHeader(file_path)
+    header.file_size = os.path.getsize(file_path)
+
+    with open(file_path, "rb") as ma_file:
+        if ma_file.read(len(MAYA_ASCII_SIGNATURE)) != MAYA_ASCII_SIGNATURE:  # .mb等二进制文件可能没有换行，不能按行读取
+            raise ValueError("Not a Maya ASCII file: {0}".format(file_path))
+        ma_file.seek(0)
+
+        encoding = "utf-8"
+        statement = []
+        in_string = False
+        for line in ma_file:
+            text = line.decode(encoding, "replace")
+            if not statement:
+                stripped = text.lstrip()
+                if stripped.startswith("//"):
+                    header.parse_comment(stripped)
+                    if header.codeset:
+                        encoding = codec_name(header.codeset)
+                    header.header_size += len(line)
+                    continue
+                if not stripped:
+                    header.header_size += len(line)
+                    continue
+                if stripped.split(None, 1)[0].rstrip(";") not in HEADER_COMMANDS:
+                    break
+
+            header.header_size += len(line)
+            while text:
+                end, in_string = find_statement_end(text, in_string)
+                if end < 0:
+                    statement.append(text)
+                    break
+                statement.append(text[:end])
+                header.parse_statement("".join(statement))
+                statement = []
+                text = text[end + 1:].strip()
+    return header
+
+
+def is_light_type(node_type):
+    """ pointLight、aiAreaLight、RedshiftPhysicalLight等，不包括lightLinker """
+    return node_type.lower().endswith("light")
+
+
+def map_file(file_path):
+    """ 只读的内存映射，文件内容由系统按需读取，不占用python的内存 """
+    with open(file_path, "rb") as ma_file:
+        return mmap.mmap(ma_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def chunk_ranges(data, chunk_size=CHUNK_SIZE):
+    """ 把文件分成几段，这里不读取文件内容，扫描每一段时才移动到换行处 """
+    size = len(data)
+    return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+
+def line_boundary(data, position):
+    """ position之后的第一个换行，createNode的匹配以换行开头，所以每一行只属于一段 """
+    if position == 0:
+        return 0
+    boundary = data.find(b"\n", position)
+    return len(data) if boundary < 0 else boundary
+
+
+class NodeIndex(object):
+    """ .ma文件中所有createNode的紧凑表格，每个节点只保存类型编号和名字、父级在共用缓冲区中的位置 """
+
+    def __init__(self, encoding="utf-8"):
+        self.encoding = encoding
+        self.type_names = []
+        self.type_counts = array("I")
+        self._type_ids = {}
+        self.node_types = array("I")
+        self.names = bytearray()  # 所有名字连在一起，name_offsets[row]到name_offsets[row + 1]为一个名字
+        self.name_offsets = array("I", [0])
+        self.parents = bytearray()
+        self.parent_offsets = array("I", [0])
+        self._lower_names = None
+
+    def __len__(self):
+        return len(self.node_types)
+
+    def add_chunk(self, data, start, end):
+        """ 扫描data[start:end]中的createNode，data可以是mmap，每一段的结果整体添加到数组中，不逐个节点append """
+        start = line_boundary(data, start)
+        end = line_boundary(data, end)
+        matches = NODE_PATTERN.findall(data, start, end)
+        if matches:
+            node_types, names, parents = zip(*matches)
+            for node_type, count in collections.Counter(node_types).items():
+                if node_type not in self._type_ids:
+                    self._type_ids[node_type] = len(self.type_names)
+                    self.type_names.append(node_type.decode("ascii", "replace"))
+                    self.type_counts.append(0)
+                self.type_counts[self._type_ids[node_type]] += count
+            self.node_types.extend(map(self._type_ids.__getitem__, node_types))
+            self.add_strings(self.names, self.name_offsets, names)
+            self.add_strings(self.parents, self.parent_offsets, parents)
+            self._lower_names = None
+
+        if hasattr(data, "madvise") and hasattr(mmap, "MADV_DONTNEED"):  # 扫描过的页不再需要，不让常驻内存一直增长
+            page_start = start - start % mmap.PAGESIZE
+            data.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+
+    def add_strings(self, buffer, offsets, strings):
+        """ 把strings接到buffer后面，offsets中添加每个字符串结束的位置 """
+        lengths = itertools.chain([offsets[-1]], map(len, strings))
+        if accumulate:
+            offsets.extend(itertools.islice(accumulate(lengths), 1, None))
+        else:
+            total = next(lengths)
+            for length in lengths:
+                total += length
+                offsets.append(total)
+        buffer.extend(b"".join(strings))
+
+    def node_name(self, row):
+        return self.names[self.name_offsets[row]:self.name_offsets[row + 1]].decode(self.encoding, "replace")
+
+    def parent_name(self, row):
+        return self.parents[self.parent_offsets[row]:self.parent_offsets[row + 1]].decode(self.encoding, "replace")
+
+    def type_name(self, row):
+        return self.type_names[self.node_types[row]]
+
+    def histogram(self):
+        """ [(类型, 数量)]，数量多的在前 """
+        return sorted(zip(self.type_names, self.type_counts), key=lambda item: (-item[1], item[0].lower()))
+
+    def type_ids(self, type_names):
+        return set(type_id for type_id, type_name in enumerate(self.type_names) if type_name in type_names)
+
+    def find(self, text="", type_names=None):
+        """ 返回名字中包含text(不区分大小写)的行，type_names不为None时只返回这些类型 """
+        if text:
+            if self._lower_names is None:
+                self._lower_names = bytes(self.names).lower()
+            needle = text.lower().encode(self.encoding, "replace")
+            name_offsets = self.name_offsets
+            rows = array("I")
+            position = self._lower_names.find(needle)
+            while position >= 0:
+                row = bisect.bisect_right(name_offsets, position) - 1
+                if position + len(needle) <= name_offsets[row + 1]:
+                    rows.append(row)
+                    position = name_offsets[row + 1]  # 同一个名字只需要一次
+                else:
+                    position += 1
+                position = self._lower_names.find(needle, position)
+        else:
+            rows = array("I", range(len(self)))
+
+        if type_names is not None:
+            type_ids = self.type_ids(type_names)
+            node_types = self.node_types
+            rows = array("I", [row for row in rows if node_types[row] in type_ids])
+        return rows
+
+    def memory_size(self):
+        """ 索引占用的字节数 """
+        buffers = (self.type_counts, self.node_types, self.name_offsets, self.parent_offsets)
+        return sum(buffer.itemsize * len(buffer) for buffer in buffers) + len(self.names) + len(self.parents)
+
+
+def index_nodes(file_path, encoding="utf-8", chunk_size=CHUNK_SIZE):
+    """ 一次扫描整个文件，在界面中使用时应该把chunk_ranges交给TaskRunner分块执行。
+        有大量setAttr数据的文件中只有createNode行需要处理，比逐行读取快很多；
+        几乎只有createNode的文件中每个节点的开销占主要部分，并不比逐行读取再split快 """
+    node_index = NodeIndex(encoding)
+    data = map_file(file_path)
+    try:
+        for start, end in chunk_ranges(data, chunk_size):
+            node_index.add_chunk(data, start, end)
+    finally:
+        data.close()
+    return node_index
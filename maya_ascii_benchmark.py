@@ -0,0 +1,270 @@
+# coding:utf-8
+# .ma文件读取测试: 检查light_test.ma的解析结果，在很大的合成场景上对比只读文件头、建立节点索引和逐行读取整个文件的耗时
+# 在maya的脚本编辑器中: import maya_ascii_benchmark; maya_ascii_benchmark.main()
+# 在maya外(需要PySide2): python maya_ascii_benchmark.py
+import os
+import shutil
+import tempfile
+import time
+
+from PySide2 import QtCore
+from PySide2 import QtWidgets
+
+import fake_maya
+fake_maya.install_if_missing()
+
+import maya_ascii
+import open_import_dialog
+import task_runner
+
+
+LIGHT_TEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "light_test.ma")
+
+SYNTHETIC_HEADER = """//Maya ASCII 2022 scene
+//Name: synthetic.ma
+//Last modified: Mon, Oct 12, 2026 10:00:00 AM
+//Codeset: UTF-8
+file -rdi 1 -ns "char" -rfn "charRN" -op "v=0;" -typ "mayaAscii" "{ref_dir}/char.ma";
+file -rdi 2 -ns "prop" -rfn "char:propRN" -op "v=0;" -typ "mayaAscii" "{ref_dir}/prop.ma";
+file -r -ns "char" -dr 1 -rfn "charRN" -op "v=0;" -typ "mayaAscii" "{ref_dir}/char.ma";
+file -r -ns "char1" -dr 1 -rfn "charRN1" -op "v=0;" -typ "mayaAscii" "{ref_dir}/char.ma{{1}}";
+file -r -ns "set" -rfn "setRN" -op "v=0;"
+\t\t -typ "mayaAscii" "/no/such/dir/set.ma";
+requires maya "2022";
+requires -nodeType "RedshiftOptions" -nodeType "RedshiftPostEffects" "redshift4maya" "3.5.03";
+requires -nodeType "aiOptions" -dataType "aiData"
+\t\t "mtoa" "4.2.1";
+currentUnit -l centimeter -a degree -t ntsc;
+fileInfo "application" "maya";
+fileInfo "product" "Maya 2022";
+fileInfo "comment" "semicolon; \\"quoted\\" text\\n";
+"""
+
+SYNTHETIC_NODES = """createNode transform -n "pCube{0}";
+\trename -uid "86095D9B-41F5-9716-492C-DAB1A7ED0784";
+\tsetAttr ".t" -type "double3" 1.5 2.5 3.5 ;
+createNode mesh -n "pCubeShape{0}" -p "pCube{0}";
+\tsetAttr -k off ".v";
+\tsetAttr ".uvst[0].uvsn" -type "string" "map1";
+\tsetAttr -s {1} ".vt[0:{2}]" {3};
+createNode pointLight -n "pointLightShape{0}" -p "pCube{0}";
+\tsetAttr -k off ".v";
+"""
+
+
+def resident_memory():
+    """ 当前进程常驻内存的MB数，只在linux上可以读取 """
+    try:
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    return None
+
+
+def check_light_test():
+    header = maya_ascii.read_header(LIGHT_TEST_PATH)
+    assert header.maya_version == "2018ff09" and header.required_maya_version() == "2018ff09"
+    assert header.comments["Name"] == "light_test.ma" and header.codeset == "936"
+    assert header.plugins() == [
+        maya_ascii.Requirement("redshift4maya", "3.5.03", ["RedshiftOptions", "RedshiftPostEffects"], []),
+        maya_ascii.Requirement("mtoa", "3.1.1.1", [], [])], header.plugins()
+    assert header.units == {"linear": "centimeter", "angle": "degree", "time": "film"}, header.units
+    assert list(header.file_info) == ["application", "product", "version", "cutIdentifier", "osv"]
+    assert header.file_info["osv"].endswith("(Build 9200)\n")
+    assert header.references == []
+    with open(LIGHT_TEST_PATH, "rb") as ma_file:
+        assert ma_file.read()[header.header_size:].startswith(b"createNode transform -s -n \"persp\";")
+    print("light_test.ma: Maya {0}, plugins {1}, units {2} - ok".format(
+        header.maya_version, [requirement.plugin for requirement in header.plugins()], header.units))
+
+
+def check_light_test_nodes():
+    """ 脚本字符串中的createNode不算，分段扫描和一次扫描的结果相同 """
+    node_index = maya_ascii.index_nodes(LIGHT_TEST_PATH, "cp936")
+    assert len(node_index) == 35 and node_index.histogram()[:2] == [("transform", 11), ("camera", 4)], node_index.histogram()
+    light_types = [node_type for node_type in node_index.type_names if maya_ascii.is_light_type(node_type)]
+    assert sorted(light_types) == ["ambientLight", "areaLight", "directionalLight", "pointLight", "spotLight"], light_types
+    rows = node_index.find("SHAPE1", light_types)
+    assert [(node_index.node_name(row), node_index.parent_name(row)) for row in rows][:2] == [
+        ("directionalLightShape1", "directionalLight1"), ("ambientLightShape1", "ambientLight1")]
+    assert node_index.node_name(0) == "persp" and node_index.parent_name(0) == "" and node_index.type_name(1) == "camera"
+    assert len(node_index.find("light")) == 11  # 包括5个transform和lightLinker1
+
+    small_chunks = maya_ascii.index_nodes(LIGHT_TEST_PATH, "cp936", chunk_size=100)
+    assert small_chunks.node_types == node_index.node_types and small_chunks.names == node_index.names
+    assert small_chunks.parents == node_index.parents
+    print("light_test.ma: {0} nodes, lights {1} - ok".format(len(node_index), light_types))
+
+
+def write_synthetic_scene(file_path, ref_dir, size_mb, vertex_count):
+    """ 文件头之后重复写入createNode，直到文件达到size_mb，每个mesh有vertex_count个点 """
+    points = "\n\t\t".join(" ".join(["-0.5 0.25 0.125"] * 3) for i in range(vertex_count // 3 + 1))
+    with open(file_path, "wb") as ma_file:
+        ma_file.write(SYNTHETIC_HEADER.format(ref_dir=ref_dir).encode("utf-8"))
+        block = "".join(SYNTHETIC_NODES.format(i, vertex_count, vertex_count - 1, points) for i in range(5000)).encode("utf-8")
+        for i in range(size_mb * 1048576 // len(block) + 1):
+            ma_file.write(block)
+
+
+def check_synthetic_header(file_path, ref_dir):
+    """ 跨行的语句、引号中的分号和转义、-rdi嵌套引用 """
+    header = maya_ascii.read_header(file_path)
+    assert header.required_maya_version() == "2022"
+    assert header.plugins()[1] == maya_ascii.Requirement("mtoa", "4.2.1", ["aiOptions"], ["aiData"]), header.plugins()
+    assert header.file_info["comment"] == "semicolon; \"quoted\" text\n", header.file_info
+    assert header.units["time"] == "ntsc"
+    assert [(reference.namespace, reference.depth, reference.deferred) for reference in header.references] == [
+        ("prop", 2, False), ("char", 1, True), ("char1", 1, True), ("set", 1, False)], header.references
+    assert header.references[2].path == ref_dir + "/char.ma{1}" and header.references[3].path == "/no/such/dir/set.ma"
+    assert header.references[0].reference_node == "char:propRN" and header.references[0].file_type == "mayaAscii"
+
+    try:
+        maya_ascii.read_header(os.path.join(ref_dir, "binary.mb"))
+    except ValueError as e:
+        print("  binary file rejected: {0}".format(e))
+    else:
+        raise AssertionError("binary file should be rejected")
+    return header
+
+
+def check_dialog(file_path):
+    """ 选择文件后显示文件头，版本更新、找不到的插件和引用显示为警告 """
+    scene = fake_maya.FakeScene()
+    scene.loaded_plugins.add("mtoa")
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(open_import_dialog, scene)
+    try:
+        dialog = open_import_dialog.TestDialog()
+        dialog.filepath_le.setText(file_path)
+        warnings = list(dialog.header_warnings)
+        top_level_names = [dialog.header_tree.topLevelItem(i).text(0) for i in range(dialog.header_tree.topLevelItemCount())]
+
+        start = time.time()
+        while dialog.node_index_runner.is_running():
+            QtWidgets.QApplication.processEvents(QtCore.QEventLoop.WaitForMoreEvents)
+        index_time = time.time() - start
+        type_items = [dialog.type_tree.topLevelItem(i) for i in range(dialog.type_tree.topLevelItemCount())]
+        type_counts = [(item.text(0), int(item.text(1))) for item in type_items]
+        node_count = dialog.node_model.rowCount()
+        type_items[1].setSelected(True)  # Lights
+        light_count = dialog.node_model.rowCount()
+        dialog.node_search_le.setText("LightShape12")
+        dialog.node_search_timer.timeout.emit()
+        search_names = [dialog.node_model.index(row, 0).data() for row in range(dialog.node_model.rowCount())]
+        status = dialog.node_status_label.text()
+
+        dialog.filepath_le.setText(LIGHT_TEST_PATH)
+        light_test_warnings = list(dialog.header_warnings)
+        while dialog.node_index_runner.is_running():
+            QtWidgets.QApplication.processEvents(QtCore.QEventLoop.WaitForMoreEvents)
+        light_test_count = len(dialog.node_index)
+        dialog.close()
+        dialog.deleteLater()
+    finally:
+        restore()
+
+    assert top_level_names == ["Scene", "Plugins (2)", "References (4)", "File Info"], top_level_names
+    assert len(warnings) == 3 and "2022" in warnings[0] and "redshift4maya" in warnings[1] and "set.ma" in warnings[2], warnings
+    assert light_test_warnings == ["Plugin not found: redshift4maya 3.5.03"], light_test_warnings
+    assert [type_name for type_name, count in type_counts] == ["All", "Lights", "mesh", "pointLight", "transform"], type_counts
+    assert node_count == type_counts[0][1] and light_count == type_counts[1][1] == node_count // 3, type_counts
+    assert search_names[0] == "pointLightShape12" and all("LightShape12" in name for name in search_names), search_names[:5]
+    assert light_test_count == 35
+    print("TestDialog header preview - ok: {0}".format(warnings))
+    print("TestDialog node index: {0:.2f}s in the event loop, {1}".format(index_time, status))
+
+
+def index_chunk_times(file_path):
+    """ 界面中每一段是TaskRunner的一项，单独计时，排序后返回 """
+    node_index = maya_ascii.NodeIndex()
+    data = maya_ascii.map_file(file_path)
+    times = []
+    try:
+        for start, end in maya_ascii.chunk_ranges(data, maya_ascii.CHUNK_SIZE):
+            start_time = time.time()
+            node_index.add_chunk(data, start, end)
+            times.append(time.time() - start_time)
+    finally:
+        data.close()
+    times.sort()
+    return times
+
+
+def benchmark(size_mb=500, vertex_count=100):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(temp_dir, "synthetic.ma")
+        for name in ("char.ma", "prop.ma"):
+            shutil.copy(LIGHT_TEST_PATH, os.path.join(temp_dir, name))
+        with open(os.path.join(temp_dir, "binary.mb"), "wb") as mb_file:
+            mb_file.write(b"FOR8\x00\x00\x00\x00" + b"\x00" * 1048576)
+
+        start = time.time()
+        write_synthetic_scene(file_path, temp_dir.replace("\\", "/"), size_mb, vertex_count)
+        write_time = time.time() - start
+
+        header = check_synthetic_header(file_path, temp_dir.replace("\\", "/"))
+        if vertex_count:
+            check_dialog(file_path)
+
+        times = []
+        for i in range(20):
+            start = time.time()
+            maya_ascii.read_header(file_path)
+            times.append(time.time() - start)
+        times.sort()
+
+        memory_before = resident_memory()
+        start = time.time()
+        node_index = maya_ascii.index_nodes(file_path)
+        index_time = time.time() - start
+        memory_after = resident_memory()
+        chunk_times = index_chunk_times(file_path)
+
+        start = time.time()
+        line_count = 0
+        with open(file_path, "rb") as ma_file:
+            for line in ma_file:
+                line_count += 1
+        scan_time = time.time() - start
+
+        start = time.time()
+        nodes = []  # 每一行一个字符串，每个节点一个tuple
+        with open(file_path, "rb") as ma_file:
+            for line in ma_file:
+                if line.startswith(b"createNode"):
+                    nodes.append(tuple(line.split()[1:]))
+        split_time = time.time() - start
+        assert len(nodes) == len(node_index)
+        del nodes
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print("Synthetic scene: {0:.0f} MB, {1} lines, {2} vertices per mesh (written in {3:.1f}s)".format(
+        header.file_size / 1048576.0, line_count, vertex_count, write_time))
+    print("  read_header:     median {0:.3f} ms, max {1:.3f} ms, {2} bytes read".format(
+        times[len(times) // 2] * 1000, times[-1] * 1000, header.header_size))
+    print("  read every line: {0:.3f}s".format(scan_time))
+    print("  split createNode lines: {0:.3f}s".format(split_time))
+    print("  index_nodes:     {0:.3f}s ({1:.0f} MB/s, {2:.2f}x the split time), {3} nodes, {4} types, index {5:.1f} MB".format(
+        index_time, header.file_size / 1048576.0 / index_time, index_time / split_time, len(node_index),
+        len(node_index.type_names), node_index.memory_size() / 1048576.0))
+    print("  add_chunk:       {0} chunks of {1:.0f} KB, median {2:.1f} ms, max {3:.1f} ms (TaskRunner slice {4:.0f} ms)".format(
+        len(chunk_times), maya_ascii.CHUNK_SIZE / 1024.0, chunk_times[len(chunk_times) // 2] * 1000,
+        chunk_times[-1] * 1000, task_runner.TaskRunner.TIME_SLICE * 1000))
+    if memory_before is not None:
+        print("  resident memory: {0:.1f} MB before index_nodes, {1:.1f} MB after".format(memory_before, memory_after))
+
+
+def main():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    check_light_test()
+    check_light_test_nodes()
+    benchmark(2048, 1000)
+    benchmark(200, 0)  # 几乎只有createNode，每个节点的开销占主要部分
+
+
+if __name__ == "__main__":
+    main()
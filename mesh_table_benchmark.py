@@ -0,0 +1,297 @@
+# coding:utf-8
+# 表格示例性能测试: 对比旧的每个mesh一行QTableWidgetItem和按列保存、分块读取的MeshTableModel
+# 在maya的脚本编辑器中: import mesh_table_benchmark; mesh_table_benchmark.main()
+# 在maya外(需要PySide2): python mesh_table_benchmark.py
+import time
+
+from PySide2 import QtWidgets
+
+import fake_maya
+fake_maya.install_if_missing()
+
+import custom_cell_widgets
+
+
+def create_mesh_scene(mesh_count):
+    scene = fake_maya.FakeScene()
+    for i in range(mesh_count):
+        transform_name = "pCube{0}".format(i + 1)
+        scene.create_node("transform", transform_name, translate=(float(i), float(i % 7), -float(i % 3)))
+        scene.create_node("mesh", "{0}Shape".format(transform_name), parent=transform_name)
+    return scene
+
+
+def refresh_table_widget(cmds, table_wdg):
+    """ 旧的TableExampleDialog.refresh_table: 每个mesh调用listRelatives和两次getAttr，每个单元格一个QTableWidgetItem """
+    table_wdg.setRowCount(0)
+    for i, mesh in enumerate(cmds.ls(typ="mesh")):
+        transform_name = cmds.listRelatives(mesh, parent=True)[0]
+        translation = cmds.getAttr("{0}.translate".format(transform_name))[0]
+        visible = cmds.getAttr("{0}.visibility".format(transform_name))
+
+        table_wdg.insertRow(i)
+        item = QtWidgets.QTableWidgetItem()
+        item.setCheckState(custom_cell_widgets.QtCore.Qt.Checked if visible else custom_cell_widgets.QtCore.Qt.Unchecked)
+        table_wdg.setItem(i, 0, item)
+        table_wdg.setItem(i, 1, QtWidgets.QTableWidgetItem(transform_name))
+        for column, value in enumerate(translation):
+            table_wdg.setItem(i, column + 2, QtWidgets.QTableWidgetItem(custom_cell_widgets.float_to_string(value)))
+
+
+def benchmark_refresh(mesh_count=20000):
+    scene = create_mesh_scene(mesh_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(custom_cell_widgets, scene)
+    try:
+        table_wdg = QtWidgets.QTableWidget()
+        table_wdg.setColumnCount(5)
+        fake_cmds.reset_counts()
+        start = time.time()
+        refresh_table_widget(fake_cmds, table_wdg)
+        widget_time = time.time() - start
+        widget_calls = fake_cmds.total_calls()
+        table_wdg.deleteLater()
+
+        model = custom_cell_widgets.MeshTableModel()
+        fake_cmds.reset_counts()
+        start = time.time()
+        model.refresh()
+        first_page_time = time.time() - start
+        first_page_rows = model.rowCount()
+        while model.is_loading():
+            QtWidgets.QApplication.processEvents()
+        full_time = time.time() - start
+        model_calls = fake_cmds.total_calls()
+
+        assert model.rowCount() == mesh_count, model.rowCount()
+        row = mesh_count - 1
+        assert model.translate(row) == (float(row), float(row % 7), -float(row % 3)), model.translate(row)
+        assert model.node_name(row) == "pCube{0}".format(mesh_count)
+    finally:
+        restore()
+
+    print("{0} meshes".format(mesh_count))
+    print("  QTableWidget:   {0:.4f}s, {1:6d} cmds calls".format(widget_time, widget_calls))
+    print("  MeshTableModel: first page ({0} rows) {1:.4f}s, all rows {2:.4f}s, {3:6d} cmds calls, {4} plug reads".format(
+        first_page_rows, first_page_time, full_time, model_calls, fake_om2.total_calls()))
+
+
+def edit_cells_one_by_one(cmds, model, values):
+    """ 旧的on_cell_changed: 每个单元格单独setAttr和getAttr，并且每个单元格刷新一次 """
+    for (row, column), value in values.items():
+        attr_name = "{0}.{1}".format(model.paths[row], model.TRANSLATE_ATTRIBUTES[column - model.TRANSLATE_X_COLUMN])
+        cmds.setAttr(attr_name, value)
+        cmds.getAttr(attr_name)
+        index = model.index(row, column)
+        model.dataChanged.emit(index, index)
+
+
+def benchmark_batch_edit(mesh_count=1000):
+    """ 粘贴mesh_count行 x 3列的位移，再把第一行填充到所有行 """
+    scene = create_mesh_scene(mesh_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(custom_cell_widgets, scene)
+    try:
+        model = custom_cell_widgets.MeshTableModel()
+        model.refresh()
+        while model.is_loading():
+            QtWidgets.QApplication.processEvents()
+        editor = custom_cell_widgets.MeshBatchEditor(model)
+
+        refreshed_cells = []
+        model.dataChanged.connect(lambda top_left, bottom_right: refreshed_cells.append(top_left))
+
+        values = {}
+        for row in range(mesh_count):
+            for column in range(3):
+                values[(row, model.TRANSLATE_X_COLUMN + column)] = float(row + column)
+        fake_cmds.reset_counts()
+        start = time.time()
+        edit_cells_one_by_one(fake_cmds, model, values)
+        per_cell_time = time.time() - start
+        per_cell_calls = fake_cmds.total_calls()
+        per_cell_refreshes = len(refreshed_cells)
+
+        text = "\n".join("\t".join(repr(float(row * 2 + column)) for column in range(3)) for row in range(mesh_count))
+        fake_cmds.reset_counts()
+        del refreshed_cells[:]
+        start = time.time()
+        changed_count, failed_count = editor.paste(0, model.TRANSLATE_X_COLUMN, text)
+        paste_time = time.time() - start
+        paste_calls = dict(fake_cmds.call_counts)
+        paste_refreshes = len(refreshed_cells)
+        assert changed_count == mesh_count and not failed_count, (changed_count, failed_count)
+        assert scene.find("pCube10").attributes["translate"] == (18.0, 19.0, 20.0)
+        assert model.translate(9) == (18.0, 19.0, 20.0)
+
+        indexes = [model.index(row, column) for row in range(mesh_count) for column in range(5)]
+        fake_cmds.reset_counts()
+        del refreshed_cells[:]
+        start = time.time()
+        changed_count, failed_count = editor.fill_down(indexes)
+        fill_time = time.time() - start
+        fill_calls = dict(fake_cmds.call_counts)
+        fill_refreshes = len(refreshed_cells)
+        assert model.translate(mesh_count - 1) == (0.0, 1.0, 2.0)
+
+        try:
+            editor.paste(0, model.TRANSLATE_X_COLUMN, "1.0\tabc")
+        except ValueError as e:
+            print("  invalid paste rejected: {0}".format(e))
+        assert model.translate(0) == (0.0, 1.0, 2.0)
+    finally:
+        restore()
+
+    print("Edit {0} rows x 3 columns".format(mesh_count))
+    print("  one by one: {0:.4f}s, {1:6d} cmds calls, {2:6d} refreshes".format(per_cell_time, per_cell_calls, per_cell_refreshes))
+    print("  paste:      {0:.4f}s, {1} setAttr, {2} undo chunk, {3} refresh".format(
+        paste_time, paste_calls.get("setAttr"), paste_calls.get("undoInfo", 0) // 2, paste_refreshes))
+    print("  fill down:  {0:.4f}s, {1} setAttr, {2} undo chunk, {3} refresh".format(
+        fill_time, fill_calls.get("setAttr"), fill_calls.get("undoInfo", 0) // 2, fill_refreshes))
+
+
+def load_table(mesh_count):
+    """ 打开表格: 读取所有行并注册回调 """
+    model = custom_cell_widgets.MeshTableModel()
+    scene_sync = custom_cell_widgets.MeshSceneSync(model)
+    scene_sync.start()
+    model.refresh()
+    while model.is_loading():
+        QtWidgets.QApplication.processEvents()
+    assert model.rowCount() == mesh_count
+    return model, scene_sync
+
+
+def drag_selection(cmds, transforms, frames):
+    """ 模拟在视图中拖动选中的物体: 每帧设置所有物体的位移，然后等到下一帧处理事件，
+        返回(设置属性的总时间, 处理事件的总时间) """
+    set_time = 0.0
+    event_time = 0.0
+    for frame in range(frames):
+        frame_start = time.time()
+        for transform in transforms:
+            cmds.setAttr("{0}.translate".format(transform), float(frame), 0.0, 0.0)
+        set_time += time.time() - frame_start
+
+        remaining = custom_cell_widgets.MeshSceneSync.FRAME_INTERVAL / 1000.0 - (time.time() - frame_start)
+        if remaining > 0:
+            time.sleep(remaining)
+        start = time.time()
+        QtWidgets.QApplication.processEvents()
+        event_time += time.time() - start
+    return set_time, event_time
+
+
+def benchmark_viewport_drag(mesh_count=20000, selected_count=500, frames=60):
+    scene = create_mesh_scene(mesh_count)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(custom_cell_widgets, scene)
+    try:
+        transforms = ["pCube{0}".format(i * (mesh_count // selected_count) + 1) for i in range(selected_count)]
+        closed_set_time = drag_selection(fake_cmds, transforms, frames)[0]
+
+        model, scene_sync = load_table(mesh_count)
+        redraws = []
+        model.dataChanged.connect(lambda top_left, bottom_right: redraws.append(top_left))
+        fake_om2.reset_counts()
+        open_set_time, event_time = drag_selection(fake_cmds, transforms, frames)
+        plug_reads = fake_om2.call_counts["MPlug.asDouble"] + fake_om2.call_counts["MPlug.asBool"]
+
+        assert model.translate(model.rowCount() - mesh_count // selected_count) == (float(frames - 1), 0.0, 0.0)
+        callback_count = scene_sync.callback_count()
+        scene_sync.stop()
+    finally:
+        restore()
+
+    print("Drag {0} of {1} meshes for {2} frames".format(selected_count, mesh_count, frames))
+    print("  setAttr per frame: table closed {0:.2f} ms, table open {1:.2f} ms ({2} callbacks registered)".format(
+        closed_set_time / frames * 1000, open_set_time / frames * 1000, callback_count))
+    print("  table update per frame: {0:.2f} ms, {1} redraws, {2} plug reads ({3:.0f} per frame)".format(
+        event_time / frames * 1000, len(redraws), plug_reads, plug_reads / float(frames)))
+
+
+def check_scene_sync():
+    """ 改名、重新设置父级、删除和新建都只更新对应的行 """
+    scene = create_mesh_scene(10)
+    scene.create_node("transform", "group1")
+    scene.create_node("transform", "locator1")
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(custom_cell_widgets, scene)
+    try:
+        model, scene_sync = load_table(10)
+        editor = custom_cell_widgets.MeshBatchEditor(model, scene_sync)
+
+        fake_cmds.setAttr("pCube3.visibility", False)
+        fake_cmds.setAttr("pCube3.translate", 1.0, 2.0, 3.0)
+        fake_cmds.rename("pCube4", "box")
+        fake_cmds.parent("pCube5", "group1")
+        fake_cmds.delete("pCube6")
+        fake_cmds.createNode("transform", "sphere1")
+        fake_cmds.createNode("mesh", "sphereShape1", parent="sphere1")
+        scene_sync.flush()
+        while model.is_loading():
+            QtWidgets.QApplication.processEvents()
+
+        assert model.translate(2) == (1.0, 2.0, 3.0) and not model.cell_value(2, model.VISIBILITY_COLUMN)
+        assert model.paths[3] == "|box" and model.paths[4] == "|group1|pCube5", model.paths
+        assert "|pCube6" not in model.paths and model.paths[-1] == "|sphere1", model.paths
+        assert model.rowCount() == 10 and scene_sync.callback_count() == 10 + 4
+
+        # 和表格中的物体无关的改名和重新设置父级不会重新读取任何行的路径
+        fake_om2.reset_counts()
+        fake_cmds.rename("locator1", "locator2")
+        fake_cmds.parent("locator2", "group1")
+        scene_sync.flush()
+        assert not fake_om2.call_counts["MFnDagNode.fullPathName"], fake_om2.call_counts
+        # 父级改名只更新它下面的行
+        fake_cmds.rename("group1", "rig")
+        scene_sync.flush()
+        assert model.paths[4] == "|rig|pCube5", model.paths
+        assert fake_om2.call_counts["MFnDagNode.fullPathName"] == 1, fake_om2.call_counts
+
+        fake_om2.reset_counts()
+        editor.fill_down([model.index(row, model.TRANSLATE_X_COLUMN) for row in range(model.rowCount())])
+        assert not scene_sync._timer.isActive(), "batch edits should not trigger a re-read"
+        fake_cmds.setAttr("sphere1.rotate", 0.0, 90.0, 0.0)
+        assert not scene_sync._timer.isActive(), "unwatched attributes should be ignored"
+        scene_sync.stop()
+        assert not fake_om2.callbacks
+    finally:
+        restore()
+    print("MeshSceneSync: rename, reparent, delete, create and batch edits, only affected rows updated - ok")
+
+
+def check_locked_channel():
+    """ 一个通道被锁定时同一行的其它通道仍然被设置，表格显示重新读取的值 """
+    scene = create_mesh_scene(3)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(custom_cell_widgets, scene)
+    try:
+        model, scene_sync = load_table(3)
+        editor = custom_cell_widgets.MeshBatchEditor(model, scene_sync)
+        fake_cmds.setAttr("pCube2.ty", lock=True)
+
+        refreshed_cells = []
+        model.dataChanged.connect(lambda top_left, bottom_right: refreshed_cells.append(top_left))
+        fake_cmds.reset_counts()
+        changed_count, failed_count = editor.paste(0, model.TRANSLATE_X_COLUMN, "5\t1\t7\n5\t5\t5\n2\t2\t-2")
+        assert (changed_count, failed_count) == (2, 1), (changed_count, failed_count)
+        assert fake_cmds.call_counts["setAttr"] == 6, fake_cmds.call_counts  # 只设置改变了的通道，包括失败的一次
+        assert scene.find("pCube1").attributes["translate"] == (5.0, 1.0, 7.0)
+        assert scene.find("pCube2").attributes["translate"] == (5.0, 1.0, 5.0)
+        assert model.translate(1) == (5.0, 1.0, 5.0), model.translate(1)
+        assert model.translate(2) == (2.0, 2.0, -2.0), model.translate(2)
+        assert len(refreshed_cells) == 1, refreshed_cells
+        scene_sync.stop()
+    finally:
+        restore()
+    print("MeshBatchEditor: locked channel skipped, other channels set and read back - ok")
+
+
+def main():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    for mesh_count in (2000, 20000):
+        benchmark_refresh(mesh_count)
+    benchmark_batch_edit(1000)
+    check_locked_channel()
+    check_scene_sync()
+    benchmark_viewport_drag()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
 # coding:utf-8
+import os
+import re
+import time
+from array import array
+
 from PySide2 import QtCore
 from PySide2 import QtWidgets
 from PySide2 import QtGui
@@ -7,17 +12,75 @@ import maya.OpenMayaUI as omui
 import maya.OpenMaya as om
 import maya.cmds as cmds
 
+import maya_ascii
+from task_runner import TaskRunner
+
 
 def maya_main_window():
     main_window_ptr = omui.MQtUtil.mainWindow()
     return wrapInstance(long(main_window_ptr), QtWidgets.QWidget)
 
 
+class NodeIndexModel(QtCore.QAbstractTableModel):
+    """ 显示NodeIndex中搜索到的行，只保存行号，名字在显示时才解码 """
+
+    NAME_COLUMN = 0
+    TYPE_COLUMN = 1
+    PARENT_COLUMN = 2
+
+    HEADER_LABELS = ["Name", "Type", "Parent"]
+
+    def __init__(self, parent=None):
+        super(NodeIndexModel, self).__init__(parent)
+
+        self.node_index = maya_ascii.NodeIndex()
+        self.rows = array("I")
+
+    def set_rows(self, node_index, rows):
+        self.beginResetModel()
+        self.node_index = node_index
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADER_LABELS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADER_LABELS[section]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+
+        row = self.rows[index.row()]
+        column = index.column()
+        if column == self.NAME_COLUMN:
+            return self.node_index.node_name(row)
+        if column == self.TYPE_COLUMN:
+            return self.node_index.type_name(row)
+        return self.node_index.parent_name(row)
+
+
 class TestDialog(QtWidgets.QDialog):
     FILE_FILTERS = "Maya(*.ma *.mb);;Maya ASCII (*.ma);;Maya Binary (*.mb);;All Files (*.*)"  # 全部的过滤项
 
     selected_filter = "Maya (*.ma *.mb)"  # 记录选择的过滤项，每次更改过滤项的同时会更改这个全局变量的值
 
+    PLUGIN_EXTENSIONS = (".mll", ".so", ".bundle", ".py")  # 在MAYA_PLUG_IN_PATH中查找没有加载的插件
+
+    WARNING_COLOR = QtGui.QColor("#ff7070")
+
+    SEARCH_DELAY = 200  # 输入停止200毫秒后再搜索节点
+
     def __init__(self, parent=maya_main_window()):
         super(TestDialog, self).__init__(parent)
 
@@ -25,6 +88,11 @@ class TestDialog(QtWidgets.QDialog):
         self.setMinimumSize(300, 80)
         self.setWindowFlags(self.windowFlags() ^ QtCore.Qt.WindowContextHelpButtonHint)
 
+        self.header_warnings = []
+        self.node_index = None
+        self.node_index_key = None  # (路径, 修改时间, 大小)，没有改变时不重新建立索引
+        self.mapped_file = None
+
         self.create_widgets()
         self.create_layouts()
         self.create_connections()
@@ -42,6 +110,31 @@ class TestDialog(QtWidgets.QDialog):
 
         self.force_cb = QtWidgets.QCheckBox("Force")
 
+        self.header_tree = QtWidgets.QTreeWidget()  # 加载之前显示.ma文件头中的版本、插件和引用
+        self.header_tree.setHeaderLabels(["Name", "Value"])
+        self.header_tree.setColumnWidth(0, 160)
+        self.header_status_label = QtWidgets.QLabel()
+
+        self.type_tree = QtWidgets.QTreeWidget()  # 每种类型的节点数量，选中的类型用来过滤节点列表
+        self.type_tree.setHeaderLabels(["Type", "Count"])
+        self.type_tree.setRootIsDecorated(False)
+        self.type_tree.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.type_tree.setColumnWidth(0, 150)
+        self.node_search_le = QtWidgets.QLineEdit()
+        self.node_search_le.setPlaceholderText("Search nodes")
+        self.node_model = NodeIndexModel(self)
+        self.node_view = QtWidgets.QTableView()
+        self.node_view.setModel(self.node_model)
+        self.node_view.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.node_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)  # 几百万行时不需要计算每一行的高度
+        self.node_view.verticalHeader().hide()
+        self.node_status_label = QtWidgets.QLabel()
+
+        self.node_index_runner = TaskRunner(self)  # 分块扫描，每一块都比时间片短，大文件建立索引时界面也能响应
+        self.node_search_timer = QtCore.QTimer(self)
+        self.node_search_timer.setSingleShot(True)
+        self.node_search_timer.setInterval(self.SEARCH_DELAY)
+
         self.apply_btn = QtWidgets.QPushButton("Apply")
         self.close_btn = QtWidgets.QPushButton("Close")
 
@@ -65,15 +158,51 @@ class TestDialog(QtWidgets.QDialog):
         button_layout.addWidget(self.apply_btn)
         button_layout.addWidget(self.close_btn)
 
+        header_wdg = QtWidgets.QWidget()
+        header_layout = QtWidgets.QVBoxLayout(header_wdg)
+        header_layout.setContentsMargins(0, 0, 0, 0)
+        header_layout.addWidget(self.header_tree)
+        header_layout.addWidget(self.header_status_label)
+
+        node_list_wdg = QtWidgets.QWidget()
+        node_list_layout = QtWidgets.QVBoxLayout(node_list_wdg)
+        node_list_layout.setContentsMargins(0, 0, 0, 0)
+        node_list_layout.addWidget(self.node_search_le)
+        node_list_layout.addWidget(self.node_view)
+
+        node_splitter = QtWidgets.QSplitter()
+        node_splitter.addWidget(self.type_tree)
+        node_splitter.addWidget(node_list_wdg)
+        node_splitter.setStretchFactor(1, 1)
+
+        nodes_wdg = QtWidgets.QWidget()
+        nodes_layout = QtWidgets.QVBoxLayout(nodes_wdg)
+        nodes_layout.setContentsMargins(0, 0, 0, 0)
+        nodes_layout.addWidget(node_splitter)
+        nodes_layout.addWidget(self.node_status_label)
+
+        info_tab_wdg = QtWidgets.QTabWidget()
+        info_tab_wdg.addTab(header_wdg, "Header")
+        info_tab_wdg.addTab(nodes_wdg, "Nodes")
+
         main_layout = QtWidgets.QVBoxLayout(self)
         main_layout.addLayout(forme_layout)
+        main_layout.addWidget(info_tab_wdg)
         main_layout.addLayout(button_layout)
 
     def create_connections(self):
         self.select_file_path_btn.clicked.connect(self.show_file_select_dialog)
+        self.filepath_le.textChanged.connect(self.update_header_info)
 
         self.open_rb.toggled.connect(self.update_force_visibility)
 
+        self.type_tree.itemSelectionChanged.connect(self.update_node_list)
+        self.node_search_le.textChanged.connect(self.node_search_timer.start)
+        self.node_search_timer.timeout.connect(self.update_node_list)
+        self.node_index_runner.progress_changed.connect(self.update_node_index_progress)
+        self.node_index_runner.failed.connect(self.on_node_index_failed)
+        self.node_index_runner.finished.connect(self.on_node_index_finished)
+
         self.apply_btn.clicked.connect(self.load_file)
         self.close_btn.clicked.connect(self.close)
 
@@ -86,6 +215,188 @@ class TestDialog(QtWidgets.QDialog):
     def update_force_visibility(self, checked):
         self.force_cb.setVisible(checked)
 
+    def update_header_info(self, file_path):
+        """ 只读取文件头，文件有几个G也只需要几毫秒，所以路径每次改变都重新读取 """
+        self.header_tree.clear()
+        self.header_warnings = []
+        self.header_status_label.setText("")
+        if not os.path.isfile(file_path):
+            self.reset_node_index()
+            return
+        if not file_path.lower().endswith(".ma"):
+            self.reset_node_index()
+            self.header_status_label.setText("Header preview is only available for Maya ASCII files")
+            return
+
+        start = time.time()
+        try:
+            header = maya_ascii.read_header(file_path)
+        except (IOError, OSError, ValueError) as e:
+            self.reset_node_index()
+            self.header_status_label.setText(str(e))
+            return
+        read_time = time.time() - start
+
+        scene_item = self.add_header_item(self.header_tree, "Scene", "")
+        maya_version = header.required_maya_version()
+        current_version = cmds.about(version=True)
+        if self.is_newer_version(maya_version, current_version):
+            self.add_header_warning(scene_item, "Maya version", maya_version,
+                                    "Saved with Maya {0}, this is Maya {1}".format(maya_version, current_version))
+        else:
+            self.add_header_item(scene_item, "Maya version", maya_version)
+        if "product" in header.file_info:
+            self.add_header_item(scene_item, "Saved with", header.file_info["product"])
+        units = [header.units[unit] for unit in ("linear", "angle", "time") if unit in header.units]
+        self.add_header_item(scene_item, "Units", ", ".join(units))
+        if "Last modified" in header.comments:
+            self.add_header_item(scene_item, "Last modified", header.comments["Last modified"])
+        self.add_header_item(scene_item, "Size", "{0:.1f} MB".format(header.file_size / 1048576.0))
+
+        plugins = header.plugins()
+        plugins_item = self.add_header_item(self.header_tree, "Plugins ({0})".format(len(plugins)), "")
+        for requirement in plugins:
+            status = self.plugin_status(requirement.plugin)
+            value = "{0} ({1})".format(requirement.version, status)
+            if status == "not found":
+                item = self.add_header_warning(plugins_item, requirement.plugin, value,
+                                               "Plugin not found: {0} {1}".format(requirement.plugin, requirement.version))
+            else:
+                item = self.add_header_item(plugins_item, requirement.plugin, value)
+            if requirement.node_types:
+                item.setToolTip(0, "Node types: {0}".format(", ".join(requirement.node_types)))
+
+        references_item = self.add_header_item(self.header_tree, "References ({0})".format(len(header.references)), "")
+        for reference in header.references:
+            name = reference.namespace or reference.reference_node
+            if reference.depth > 1:
+                name = "{0} (nested)".format(name)
+            if os.path.isfile(os.path.expandvars(maya_ascii.strip_copy_number(reference.path))):
+                self.add_header_item(references_item, name, reference.path)
+            else:
+                self.add_header_warning(references_item, name, reference.path,
+                                        "Reference not found: {0}".format(reference.path))
+
+        file_info_item = self.add_header_item(self.header_tree, "File Info", "")
+        for key, value in header.file_info.items():
+            self.add_header_item(file_info_item, key, value.strip())
+
+        self.header_tree.expandAll()
+        file_info_item.setExpanded(False)
+
+        status = "Header read in {0:.1f} ms ({1} bytes)".format(read_time * 1000, header.header_size)
+        if self.header_warnings:
+            status = "{0} warning(s). {1}".format(len(self.header_warnings), status)
+        self.header_status_label.setText(status)
+
+        self.start_node_index(file_path, maya_ascii.codec_name(header.codeset))
+
+    def add_header_item(self, parent, name, value):
+        return QtWidgets.QTreeWidgetItem(parent, [name, value])
+
+    def add_header_warning(self, parent, name, value, warning):
+        item = self.add_header_item(parent, name, value)
+        item.setForeground(0, self.WARNING_COLOR)
+        item.setForeground(1, self.WARNING_COLOR)
+        item.setToolTip(1, warning)
+        self.header_warnings.append(warning)
+        return item
+
+    def plugin_status(self, plugin):
+        if cmds.pluginInfo(plugin, query=True, loaded=True):
+            return "loaded"
+        for plugin_dir in os.environ.get("MAYA_PLUG_IN_PATH", "").split(os.pathsep):
+            for extension in self.PLUGIN_EXTENSIONS:
+                if plugin_dir and os.path.isfile(os.path.join(plugin_dir, plugin + extension)):
+                    return "not loaded"
+        return "not found"
+
+    def is_newer_version(self, file_version, current_version):
+        """ 比较开头的年份，例如文件的2018ff09和当前的2018 """
+        file_match = re.match(r"\d+", file_version or "")
+        current_match = re.match(r"\d+", str(current_version))
+        return bool(file_match and current_match) and int(file_match.group()) > int(current_match.group())
+
+    def start_node_index(self, file_path, encoding):
+        """ 在后台分块扫描所有createNode，文件没有改变时保留已经建立的索引 """
+        node_index_key = (file_path, os.path.getmtime(file_path), os.path.getsize(file_path))
+        if node_index_key == self.node_index_key:
+            return
+
+        self.reset_node_index()
+        try:
+            self.mapped_file = maya_ascii.map_file(file_path)
+        except (IOError, OSError, ValueError) as e:
+            self.node_status_label.setText(str(e))
+            return
+        self.node_index_key = node_index_key
+        self.node_index = maya_ascii.NodeIndex(encoding)
+        self.node_index_runner.start(maya_ascii.chunk_ranges(self.mapped_file), self.index_chunk)
+
+    def index_chunk(self, chunk_range):
+        self.node_index.add_chunk(self.mapped_file, chunk_range[0], chunk_range[1])
+
+    def reset_node_index(self):
+        self.node_index_runner.cancel()
+        self.close_mapped_file()
+        self.node_index = None
+        self.node_index_key = None
+        self.type_tree.clear()
+        self.node_model.set_rows(maya_ascii.NodeIndex(), array("I"))
+        self.node_status_label.setText("")
+
+    def close_mapped_file(self):
+        if self.mapped_file is not None:
+            self.mapped_file.close()
+            self.mapped_file = None
+
+    def update_node_index_progress(self, completed_count, total_count):
+        if total_count and self.node_index_runner.is_running():
+            self.node_status_label.setText("Indexing nodes: {0}% ({1} nodes)".format(
+                completed_count * 100 // total_count, len(self.node_index)))
+
+    def on_node_index_failed(self, error):
+        self.node_status_label.setText("Indexing failed: {0}".format(error.strip().splitlines()[-1]))
+        self.node_index_key = None
+
+    def on_node_index_finished(self, cancelled):
+        self.close_mapped_file()
+        if cancelled:
+            return
+
+        self.type_tree.clear()
+        all_item = QtWidgets.QTreeWidgetItem(self.type_tree, ["All", str(len(self.node_index))])
+        all_item.setData(0, QtCore.Qt.UserRole, None)
+        histogram = self.node_index.histogram()
+        light_types = [node_type for node_type, count in histogram if maya_ascii.is_light_type(node_type)]
+        light_count = sum(count for node_type, count in histogram if node_type in light_types)
+        lights_item = QtWidgets.QTreeWidgetItem(self.type_tree, ["Lights", str(light_count)])
+        lights_item.setData(0, QtCore.Qt.UserRole, light_types)
+        for node_type, count in histogram:
+            item = QtWidgets.QTreeWidgetItem(self.type_tree, [node_type, str(count)])
+            item.setData(0, QtCore.Qt.UserRole, [node_type])
+        self.update_node_list()
+
+    def update_node_list(self):
+        if self.node_index is None or self.node_index_runner.is_running():
+            return
+
+        type_names = set()
+        for item in self.type_tree.selectedItems():
+            item_types = item.data(0, QtCore.Qt.UserRole)
+            if item_types is None:  # 选中了All
+                type_names = None
+                break
+            type_names.update(item_types)
+        if type_names is not None and not type_names:
+            type_names = None
+
+        rows = self.node_index.find(self.node_search_le.text(), type_names)
+        self.node_model.set_rows(self.node_index, rows)
+        self.node_status_label.setText("{0} of {1} nodes, {2} types, indexed in {3:.2f}s ({4:.1f} MB)".format(
+            len(rows), len(self.node_index), len(self.node_index.type_names),
+            self.node_index_runner.progress_model.elapsed(), self.node_index.memory_size() / 1048576.0))
+
     def load_file(self):
         file_path = self.filepath_le.text()
         if not file_path:
@@ -95,9 +406,17 @@ class TestDialog(QtWidgets.QDialog):
         if not file_info.exists():  # 判断文件是否存在
             om.MGlobal.displayError("File does not exist: {}".format(file_path))
             return
+
+        self.update_header_info(file_path)  # 文件可能在选择之后被修改了
+        if self.header_warnings:
+            message = "This file may not load correctly:\n\n{0}\n\nContinue?".format("\n".join(self.header_warnings))
+            result = QtWidgets.QMessageBox.question(self, "Warning", message)
+            if result != QtWidgets.QMessageBox.StandardButton.Yes:
+                return
+
         if self.open_rb.isChecked():
             self.open_file(file_path)
-        if self.import_rb.isChecked():
+        elif self.import_rb.isChecked():
             self.import_file(file_path)
         else:
             self.reference_file(file_path)
@@ -118,6 +437,11 @@ class TestDialog(QtWidgets.QDialog):
     def reference_file(self, file_path):
         cmds.file(file_path, r=True, ignoreVersion=True)
 
+    def closeEvent(self, e):
+        super(TestDialog, self).closeEvent(e)
+        self.node_index_runner.cancel()
+        self.close_mapped_file()
+
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,195 @@
+# coding:utf-8
+# 文件名模糊查找性能测试: 20万个路径中逐个字符输入时每次查找的耗时，目标是每次输入16毫秒以内，
+# TreeViewDialog和FileExplorerDialog中输入停止后才查找一次
+# 在maya的脚本编辑器中: import path_search_benchmark; path_search_benchmark.main()
+# 在maya外(需要PySide2): python path_search_benchmark.py
+import collections
+import math
+import random
+import re
+import shutil
+import tempfile
+import time
+
+from PySide2 import QtWidgets
+
+import fake_maya
+fake_maya.install_if_missing()
+
+import directory_index
+import traversing_directories
+import tree_view_dialog
+
+
+WORDS = ["light", "panel", "mesh", "camera", "render", "layer", "shader", "rig", "anim", "export", "import",
+         "tool", "util", "scene", "node", "curve", "joint", "skin", "cluster", "blend", "shape", "deform",
+         "file", "path", "texture", "cache", "cloth", "hair", "dialog", "window", "widget", "model", "view",
+         "tree", "table", "list", "outliner", "progress", "batch", "publish", "asset", "shot", "check"]
+
+QUERIES = ["lightpanel", "anim_export", "skinCluster", "rendr_layr", "outl", "xyz"]  # rendr_layr: 有错字也要找到
+
+
+def create_paths(path_count=200000, seed=1):
+    """ 不同风格的文件名: light_panel.py, lightPanel2.py, LightPanelUI.py """
+    rng = random.Random(seed)
+    paths = []
+    unique_paths = set()
+    index = 0
+    while len(paths) < path_count:
+        index += 1
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+        style = rng.randint(0, 2)
+        if style == 0:
+            name = "_".join(words)
+        elif style == 1:
+            name = words[0] + "".join(word.capitalize() for word in words[1:])
+        else:
+            name = "".join(word.capitalize() for word in words)
+        if rng.random() < 0.5:
+            name += str(rng.randint(0, 99))
+        path = "/projects/show{0}/{1}/scripts/{2}.py".format(index % 7, rng.choice(WORDS), name)
+        if path not in unique_paths:
+            unique_paths.add(path)
+            paths.append(path)
+    return paths
+
+
+def create_scan_matcher(query):
+    """ 不使用索引时的对比: 所有文件名按子序列匹配 """
+    return re.compile(".*?".join(re.escape(char) for char in query), re.IGNORECASE).search
+
+
+def time_typing(search, query):
+    """ 模拟逐个字符输入，返回每次输入的耗时和最后一次的结果 """
+    timings = []
+    results = []
+    for length in range(1, len(query) + 1):
+        start = time.time()
+        results = search(query[:length])
+        timings.append(time.time() - start)
+    return timings, results
+
+
+def check_levels(search_index):
+    """ 位图统计的每一级和逐个id计数的结果一样 """
+    for query in QUERIES:
+        query = query.lower()
+        if len(query) < 3:
+            continue
+        counts = collections.Counter()
+        for gram in search_index.query_grams(query):
+            counts.update(search_index.grams.get(gram, ()))
+        need = max(1, int(math.ceil((len(query) - 2) * search_index.MATCH_RATIO)))
+        levels = search_index.count_levels(query, search_index.MAX_RESULTS)
+        total = 0
+        for level, path_ids in zip(sorted(set(counts.values()), reverse=True), levels):
+            assert level >= need and path_ids == sorted(path_id for path_id, count in counts.items() if count == level)
+            total += len(path_ids)
+        assert total >= search_index.MAX_RESULTS or total == sum(count >= need for count in counts.values())
+    print("FuzzyPathIndex: bitmap levels match per-id counts - ok")
+
+
+def benchmark_index(paths):
+    search_index = directory_index.FuzzyPathIndex()
+    start = time.time()
+    for batch_start in range(0, len(paths), 1000):  # 和后台线程发送的批次一样
+        search_index.add_paths(paths[batch_start:batch_start + 1000])
+    print("Built fuzzy index over {0} paths in {1:.2f}s, {2} grams, {3} bitmaps ({4:.1f} MB), {5} ids in lists".format(
+        len(search_index), time.time() - start, len(search_index.grams), len(search_index.gram_bitmaps),
+        sum(len(bitmap[0]) for bitmap in search_index.gram_bitmaps.values()) / 1048576.0, sum(map(len, search_index.grams.values()))))
+
+    check_levels(search_index)
+
+    names = [path.rsplit("/", 1)[-1] for path in paths]
+
+    def scan(query):
+        matcher = create_scan_matcher(query)
+        return [name for name in names if matcher(name)][:search_index.MAX_RESULTS]
+
+    print("Per keystroke time (max / mean)")
+    for query in QUERIES:
+        index_timings, results = time_typing(search_index.search, query)
+        scan_timings = time_typing(scan, query)[0]
+        print("  {0:14s} index {1:6.1f} / {2:5.1f} ms   scan {3:6.1f} / {4:5.1f} ms   top: {5}".format(
+            repr(query), max(index_timings) * 1000, sum(index_timings) / len(index_timings) * 1000,
+            max(scan_timings) * 1000, sum(scan_timings) / len(scan_timings) * 1000,
+            ", ".join(path.rsplit("/", 1)[-1] for path in results[:3])))
+
+    added = ["/projects/new/scripts/new_tool{0}.py".format(index) for index in range(1000)]
+    start = time.time()
+    search_index.add_paths(added)
+    add_time = time.time() - start
+    start = time.time()
+    search_index.remove_paths(added)
+    print("Incremental update of 1000 paths: add {0:.1f} ms, remove {1:.1f} ms".format(
+        add_time * 1000, (time.time() - start) * 1000))
+    assert not [path for path in search_index.search("new_tool") if path.startswith("/projects/new/")]
+    return search_index
+
+
+def time_dialog_search(dialog, search_index, row_count):
+    """ 连续输入时每次按键的耗时，和输入停止后查找并显示结果的耗时 """
+    dialog.crawler.cancel()  # 不使用脚本目录，直接使用测试的索引
+    dialog.search_index = search_index
+    dialog.show()
+    for query in QUERIES:
+        def type_text(text):
+            dialog.search_le.setText(text)
+            QtWidgets.QApplication.processEvents()
+        keystroke_timings = time_typing(type_text, query)[0]
+        assert dialog.search_timer.isActive()
+
+        start = time.time()
+        dialog.search_timer.timeout.emit()  # 不等待SEARCH_DELAY
+        QtWidgets.QApplication.processEvents()
+        search_time = time.time() - start
+        print("  {0:14s} {1:6.1f} / {2:5.1f} ms, search {3:5.1f} ms, {4} rows".format(
+            repr(query), max(keystroke_timings) * 1000, sum(keystroke_timings) / len(keystroke_timings) * 1000,
+            search_time * 1000, row_count()))
+        dialog.search_le.clear()
+
+    # 后台线程读取到的每批路径不单独搜索
+    dialog.search_le.setText(QUERIES[0])
+    dialog.search_timer.timeout.emit()
+    search_count = [0]
+    dialog.search_timer.timeout.connect(lambda: search_count.__setitem__(0, search_count[0] + 1))
+    for batch_index in range(20):
+        dialog.add_search_paths(dialog.crawler.generation, "/projects",
+                                ["/projects/new/scripts/light_panel_{0}_{1}.py".format(batch_index, index)
+                                 for index in range(10)])
+    assert dialog.search_timer.isActive() and search_count[0] == 0
+    dialog.search_timer.timeout.emit()
+    assert search_count[0] == 1
+    dialog.search_le.clear()
+
+
+def benchmark_tree_view(search_index):
+    dialog = tree_view_dialog.TreeViewDialog(parent=None)
+    try:
+        print("TreeViewDialog keystroke (max / mean), search + results shown after typing stops")
+        time_dialog_search(dialog, search_index, lambda: len(dialog.search_model.paths))
+    finally:
+        dialog.close()
+        dialog.deleteLater()
+
+
+def benchmark_file_explorer(search_index):
+    dialog = traversing_directories.FileExplorerDialog(parent=None, root_path=tempfile.mkdtemp())
+    try:
+        print("FileExplorerDialog keystroke (max / mean), search + results shown after typing stops")
+        time_dialog_search(dialog, search_index, dialog.results_wdg.topLevelItemCount)
+    finally:
+        dialog.close()
+        dialog.deleteLater()
+        shutil.rmtree(dialog.root_path)
+
+
+def main(path_count=200000):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    search_index = benchmark_index(create_paths(path_count))
+    benchmark_tree_view(search_index)
+    benchmark_file_explorer(search_index)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 # coding:utf-8
+import os
 import time
 from PySide2 import QtCore
 from PySide2 import QtWidgets
@@ -7,6 +8,8 @@ from shiboken2 import wrapInstance
 import maya.OpenMayaUI as omui
 import maya.cmds as cmds
 
+from task_runner import TaskRunner
+
 
 
 def maya_main_window():
@@ -17,6 +20,10 @@ def maya_main_window():
 class ProgressTestDialog(QtWidgets.QDialog):
     WINDOW_TITLE = "Progress Test"
 
+    REPORT_NAME = "progress_report"  # 保存在maya的临时目录中，.json为汇总，.csv为每一条记录
+
+    NUMBER_OF_OPERATIONS = 2000
+
     def __init__(self, parent=maya_main_window()):
         super(ProgressTestDialog, self).__init__(parent)
 
@@ -35,11 +42,14 @@ class ProgressTestDialog(QtWidgets.QDialog):
         self.create_connections()
 
     def create_widgets(self):
+        self.task_runner = TaskRunner(self)  # 分块执行，不再每一步都sleep和processEvents
+
         self.progress_bar_label = QtWidgets.QLabel("Operation Progress")
         self.progress_bar = QtWidgets.QProgressBar()
 
         self.progress_bar_button = QtWidgets.QPushButton("Do It!")
         self.cancel_button = QtWidgets.QPushButton("Cancel")
+        self.save_report_cb = QtWidgets.QCheckBox("Timing report")
 
         self.update_visibility()
 
@@ -49,6 +59,7 @@ class ProgressTestDialog(QtWidgets.QDialog):
         progress_layout.addWidget(self.progress_bar)
 
         button_layout = QtWidgets.QHBoxLayout()
+        button_layout.addWidget(self.save_report_cb)
         button_layout.addStretch()
         button_layout.addWidget(self.progress_bar_button)
         button_layout.addWidget(self.cancel_button)
@@ -63,6 +74,9 @@ class ProgressTestDialog(QtWidgets.QDialog):
         self.progress_bar_button.clicked.connect(self.run_progress_test)
         self.cancel_button.clicked.connect(self.cancel_progress_test)
 
+        self.task_runner.progress_changed.connect(self.update_progress)
+        self.task_runner.finished.connect(self.on_progress_finished)
+
     def update_visibility(self):
         self.progress_bar_label.setVisible(self.test_in_progress)
         self.progress_bar.setVisible(self.test_in_progress)
@@ -74,30 +88,53 @@ class ProgressTestDialog(QtWidgets.QDialog):
         if self.test_in_progress:
             return
 
-        number_of_operation = 10
-
-        self.progress_bar.setRange(0, number_of_operation)
+        self.progress_bar.setRange(0, self.NUMBER_OF_OPERATIONS)
         self.progress_bar.setValue(0)
         self.progress_bar_label.setText("Operation Progress")
 
         self.test_in_progress = True
         self.update_visibility()
 
-        for i in range(1, number_of_operation + 1):
-            if not self.test_in_progress:
-                break
+        # 函数马上返回，任务在之后的事件循环中分块执行
+        self.task_runner.start(range(1, self.NUMBER_OF_OPERATIONS + 1), self.process_operation)
 
-            self.progress_bar_label.setText("Processing operation: {0} (of {1})".format(i, number_of_operation))
-            self.progress_bar.setValue(i)
-            time.sleep(0.5)
+    def process_operation(self, i):
+        """ 模拟一次操作，例如导出一个缓存，分成两个阶段记录耗时 """
+        progress_model = self.task_runner.progress_model
+        with progress_model.phase("export", i):
+            time.sleep(0.0015)
+            if i % 250 == 0:  # 模拟少数很慢的操作，可以在报告中找到
+                time.sleep(0.05)
+        with progress_model.phase("write", i):
+            time.sleep(0.0005)
 
-            QtCore.QCoreApplication.processEvents()
+    def update_progress(self, completed_count, total_count):
+        self.progress_bar_label.setText("Processing operation: {0}".format(self.task_runner.progress_model.format_status()))
+        self.progress_bar.setValue(completed_count)
 
+    def cancel_progress_test(self):
+        self.task_runner.cancel()
+
+    def on_progress_finished(self, cancelled):
         self.test_in_progress = False
         self.update_visibility()
 
-    def cancel_progress_test(self):
-        self.test_in_progress = False
+        if self.save_report_cb.isChecked():
+            self.save_timing_report(self.task_runner.progress_model)
+
+    def save_timing_report(self, progress_model):
+        report_dir = cmds.internalVar(userTmpDir=True)
+        if not os.path.isdir(report_dir):
+            os.makedirs(report_dir)
+
+        for extension in (".json", ".csv"):
+            report_path = os.path.join(report_dir, self.REPORT_NAME + extension)
+            progress_model.write_report(report_path)
+            print("Timing report saved: {0}".format(report_path))
+
+    def closeEvent(self, e):
+        super(ProgressTestDialog, self).closeEvent(e)
+        self.task_runner.cancel()
 
 
 if __name__ == '__main__':
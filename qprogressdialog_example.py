@@ -1,4 +1,5 @@
 # coding:utf-8
+import os
 import time
 from PySide2 import QtCore
 from PySide2 import QtWidgets
@@ -7,6 +8,8 @@ from shiboken2 import wrapInstance
 import maya.OpenMayaUI as omui
 import maya.cmds as cmds
 
+from task_runner import TaskRunner, ThreadPoolTaskRunner
+
 
 
 def maya_main_window():
@@ -17,6 +20,10 @@ def maya_main_window():
 class ProgressTestDialog(QtWidgets.QDialog):
     WINDOW_TITLE = "Progress Test"
 
+    REPORT_NAME = "progress_report"  # 保存在maya的临时目录中，.json为汇总，.csv为每一条记录
+
+    NUMBER_OF_OPERATIONS = 2000  # 循环的数量
+
     def __init__(self, parent=maya_main_window()):
         super(ProgressTestDialog, self).__init__(parent)
 
@@ -28,15 +35,32 @@ class ProgressTestDialog(QtWidgets.QDialog):
 
         self.setMinimumSize(300, 120)
 
+        self.progress_dialog = None
+        self.active_runner = None
+        self.texture_paths = []
+
         self.create_widgets()
         self.create_layout()
         self.create_connections()
 
     def create_widgets(self):
+        self.task_runner = TaskRunner(self)  # 分块执行，不再每一步都sleep和processEvents
+        self.thread_pool_runner = ThreadPoolTaskRunner(parent=self)  # 不访问场景的操作在多个线程中执行
+
+        self.worker_threads_cb = QtWidgets.QCheckBox("Worker threads")
+        self.worker_count_sb = QtWidgets.QSpinBox()
+        self.worker_count_sb.setRange(1, 32)
+        self.worker_count_sb.setValue(QtCore.QThread.idealThreadCount())
+        self.worker_count_sb.setEnabled(False)
+        self.save_report_cb = QtWidgets.QCheckBox("Timing report")
+
         self.progress_bar_button = QtWidgets.QPushButton("Do It!")
 
     def create_layout(self):
         button_layout = QtWidgets.QHBoxLayout()
+        button_layout.addWidget(self.worker_threads_cb)
+        button_layout.addWidget(self.worker_count_sb)
+        button_layout.addWidget(self.save_report_cb)
         button_layout.addStretch()
         button_layout.addWidget(self.progress_bar_button)
 
@@ -48,27 +72,95 @@ class ProgressTestDialog(QtWidgets.QDialog):
     def create_connections(self):
         self.progress_bar_button.clicked.connect(self.run_progress_test)
 
-    def run_progress_test(self):
-        number_of_operations = 10  # 循环的数量
-
-        progress_dialog = QtWidgets.QProgressDialog("Waiting to process...", "Cancel", 0, number_of_operations, self)
-        progress_dialog.setWindowTitle("Progress...")
-        progress_dialog.setValue(0)
-        progress_dialog.setWindowModality(QtCore.Qt.WindowModal)  # 设置为进度条窗口出现时，代码依然能够执行，但是不能使用除对话框之外的操作
-        progress_dialog.show()
-
-        QtCore.QCoreApplication.processEvents()  # 在执行代码之前显示对话框
+        self.worker_threads_cb.toggled.connect(self.worker_count_sb.setEnabled)
 
-        for i in range(1, number_of_operations + 1):
-            if progress_dialog.wasCanceled():  # 当按了cancel按钮后中止代码
-                break
-            progress_dialog.setLabelText("Processing operation: {0} (fo {1})".format(i, number_of_operations))
-            progress_dialog.setValue(i)
-            time.sleep(0.5)
+        for runner in (self.task_runner, self.thread_pool_runner):
+            runner.progress_changed.connect(self.update_progress)
+            runner.failed.connect(self.on_progress_failed)
+            runner.finished.connect(self.on_progress_finished)
 
-            QtCore.QCoreApplication.processEvents()  # 显示对话框的内容
-
-        progress_dialog.close()
+    def run_progress_test(self):
+        if self.active_runner:
+            return
+
+        self.progress_dialog = QtWidgets.QProgressDialog("Waiting to process...", "Cancel", 0, self.NUMBER_OF_OPERATIONS, self)
+        self.progress_dialog.setWindowTitle("Progress...")
+        self.progress_dialog.setAutoReset(False)  # 完成后由on_progress_finished关闭
+        self.progress_dialog.setValue(0)
+        # 不使用模态窗口: 模态的QProgressDialog.setValue会调用processEvents，在进度信号的槽中嵌套处理事件，
+        # 改为执行期间禁用这个对话框中的控件(禁用整个对话框时进度窗口的Cancel按钮也会被禁用)
+        self.progress_dialog.setWindowModality(QtCore.Qt.NonModal)
+        self.progress_dialog.show()
+        self.set_controls_enabled(False)
+
+        # 函数马上返回，任务在之后的事件循环中分块执行或者在线程池中执行，对话框在这期间正常刷新
+        operations = range(1, self.NUMBER_OF_OPERATIONS + 1)
+        self.texture_paths = []
+        if self.worker_threads_cb.isChecked():
+            self.active_runner = self.thread_pool_runner
+            self.thread_pool_runner.set_max_workers(self.worker_count_sb.value())
+            self.thread_pool_runner.start(operations, self.copy_texture, self.apply_texture)
+        else:
+            self.active_runner = self.task_runner
+            self.task_runner.start(operations, self.process_operation)
+        self.progress_dialog.canceled.connect(self.active_runner.cancel)  # 当按了cancel按钮后中止代码
+
+    def set_controls_enabled(self, enabled):
+        self.worker_threads_cb.setEnabled(enabled)
+        self.worker_count_sb.setEnabled(enabled and self.worker_threads_cb.isChecked())
+        self.save_report_cb.setEnabled(enabled)
+        self.progress_bar_button.setEnabled(enabled)
+
+    def process_operation(self, i):
+        """ 模拟一次操作，例如导出一个缓存，分成两个阶段记录耗时 """
+        progress_model = self.task_runner.progress_model
+        with progress_model.phase("export", i):
+            time.sleep(0.0015)
+            if i % 250 == 0:  # 模拟少数很慢的操作，可以在报告中找到
+                time.sleep(0.05)
+        with progress_model.phase("write", i):
+            time.sleep(0.0005)
+
+    def copy_texture(self, i):
+        """ 在工作线程中执行，不能访问maya场景和界面 """
+        time.sleep(0.002)  # 模拟复制一个贴图文件
+        return "sourceimages/texture_{0:04d}.png".format(i)
+
+    def apply_texture(self, i, texture_path):
+        """ 结果排队回到主线程后执行，可以访问场景，例如设置file节点的路径 """
+        self.texture_paths.append(texture_path)
+
+    def update_progress(self, completed_count, total_count):
+        self.progress_dialog.setLabelText("Processing operation: {0}".format(self.active_runner.progress_model.format_status()))
+        self.progress_dialog.setValue(completed_count)
+
+    def on_progress_failed(self, error):
+        print(error)
+
+    def on_progress_finished(self, cancelled):
+        if self.save_report_cb.isChecked():
+            self.save_timing_report(self.active_runner.progress_model)
+        self.active_runner = None
+        self.set_controls_enabled(True)
+        self.progress_dialog.close()
+        self.progress_dialog.deleteLater()
+        self.progress_dialog = None
+
+    def save_timing_report(self, progress_model):
+        report_dir = cmds.internalVar(userTmpDir=True)
+        if not os.path.isdir(report_dir):
+            os.makedirs(report_dir)
+
+        for extension in (".json", ".csv"):
+            report_path = os.path.join(report_dir, self.REPORT_NAME + extension)
+            progress_model.write_report(report_path)
+            print("Timing report saved: {0}".format(report_path))
+
+    def closeEvent(self, e):
+        super(ProgressTestDialog, self).closeEvent(e)
+        self.task_runner.cancel()
+        self.thread_pool_runner.cancel()
+        self.thread_pool_runner.wait()  # 工作线程执行完当前的操作后退出
 
 
 
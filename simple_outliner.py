@@ -5,8 +5,10 @@ from PySide2 import QtWidgets
 from PySide2 import QtGui
 from shiboken2 import wrapInstance
 from functools import partial
+import re
 import maya.OpenMayaUI as omui
 import maya.OpenMaya as om
+import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
 
@@ -16,9 +18,628 @@ def maya_main_window():
     return wrapInstance(long(main_window_ptr), QtWidgets.QWidget)
 
 
+class OutlinerNode(object):
+    """ 大纲中的一个节点，children为None表示子节点还没有创建 """
+    __slots__ = ("path", "uuid", "node_type", "filter_type", "is_shape", "child_type", "child_paths",
+                 "children", "parent", "row", "expanded")
+
+    def __init__(self, path="", uuid="", node_type="", is_shape=False, child_paths=None, parent=None):
+        self.path = path
+        self.uuid = uuid
+        self.node_type = node_type
+        self.filter_type = node_type  # 类型过滤用的类型，灯光统一为light，只有一个shape的transform使用shape的类型
+        self.is_shape = is_shape
+        self.child_type = ""  # 只有一个子节点时子节点的类型，用于显示图标
+        self.child_paths = child_paths or []  # 还没有创建的子节点路径，展开时才创建
+        self.children = None
+        self.parent = parent
+        self.row = 0
+        self.expanded = False
+
+    def name(self):
+        return self.path.rsplit("|", 1)[-1]
+
+    def child_count(self):
+        if self.children is None:
+            return len(self.child_paths)
+        return len(self.children)
+
+
+class OutlinerModel(QtCore.QAbstractItemModel):
+    """ 以完整路径和uuid为索引的大纲模型，子节点在展开时才查询 """
+
+    SHAPE_ROLE = QtCore.Qt.UserRole
+    PATH_ROLE = QtCore.Qt.UserRole + 1  # 节点的完整路径，短名字可能重复
+    NODE_TYPE_ROLE = QtCore.Qt.UserRole + 2
+    UUID_ROLE = QtCore.Qt.UserRole + 3
+
+    SHAPE_FILTER_TYPES = ("mesh", "camera", "light")
+
+    def __init__(self, parent=None):
+        super(OutlinerModel, self).__init__(parent)
+
+        self.transform_icon = QtGui.QIcon(":transform.svg")
+        self.camera_icon = QtGui.QIcon(":Camera.png")
+        self.mesh_icon = QtGui.QIcon(":mesh.svg")
+
+        self.root_node = OutlinerNode()
+        self.root_node.children = []
+        self._node_by_path = {}
+        self._node_by_uuid = {}
+
+        self._dag_paths = None  # 搜索用的场景中所有DAG节点的路径，场景变化后失效
+        self._dag_children = None  # 父节点路径 -> 子节点路径，由_dag_paths建立
+
+    def refresh(self):
+        """ 只创建顶层的节点 """
+        self.beginResetModel()
+        self._node_by_path = {}
+        self._node_by_uuid = {}
+        self.invalidate_dag_paths()
+        self.root_node.children = self.create_nodes(cmds.ls(assemblies=True, long=True), self.root_node)
+        self.endResetModel()
+
+    def create_nodes(self, paths, parent_node, node_info=None, dag_children=None):
+        """ 为同一层的节点创建OutlinerNode，每层只批量查询一次类型和uuid，每个节点查询一次子节点。
+            node_info为query_nodes已经查询好的信息，dag_children为缓存的子节点路径，有时不再单独查询 """
+        if not paths:
+            return []
+
+        node_types, filter_types, uuids, shape_paths = node_info or self.query_nodes(paths)
+
+        nodes = []
+        single_children = {}
+        for path in paths:
+            if path not in node_types:  # 节点在查询之前已经被删除
+                continue
+            if dag_children is not None:
+                child_paths = dag_children.get(path, [])
+            else:
+                child_paths = cmds.listRelatives(path, children=True, fullPath=True) or []
+            node = OutlinerNode(path, uuids.get(path, ""), node_types.get(path, ""), path in shape_paths,
+                                child_paths, parent_node)
+            node.filter_type = filter_types[path]
+            node.row = len(nodes)
+            if len(child_paths) == 1:
+                single_children[child_paths[0]] = node
+            nodes.append(node)
+
+            self._node_by_path[path] = node
+            if node.uuid:
+                self._node_by_uuid[node.uuid] = node
+
+        if single_children:
+            if node_info and all(child_path in node_types for child_path in single_children):
+                child_types, child_filter_types = node_types, filter_types
+            else:
+                child_types, child_filter_types = self.query_node_types(list(single_children))
+            for child_path, node in single_children.items():
+                if child_path in child_types:
+                    node.child_type = child_types[child_path]
+                    self.update_filter_type(node, child_filter_types[child_path])
+
+        return nodes
+
+    def query_nodes(self, paths):
+        """ 批量查询创建节点需要的类型、过滤类型、uuid和shape路径 """
+        node_types, filter_types = self.query_node_types(paths)
+        uuids = dict(zip(cmds.ls(paths, long=True), cmds.ls(paths, uuid=True)))
+        shape_paths = set(cmds.ls(paths, long=True, shapes=True))
+        return node_types, filter_types, uuids, shape_paths
+
+    def query_node_types(self, paths):
+        """ 批量查询节点类型，返回节点类型和过滤用的类型，所有灯光的过滤类型都是light """
+        paths_and_types = cmds.ls(paths, long=True, showType=True)
+        node_types = dict(zip(paths_and_types[0::2], paths_and_types[1::2]))
+
+        filter_types = dict(node_types)
+        for light_path in cmds.ls(paths, long=True, lights=True):
+            filter_types[light_path] = "light"
+
+        return node_types, filter_types
+
+    def update_filter_type(self, node, child_filter_type):
+        """ 只有一个mesh、相机或灯光子节点的transform按子节点的类型过滤 """
+        if node.node_type == "transform":
+            node.filter_type = child_filter_type if child_filter_type in self.SHAPE_FILTER_TYPES else "transform"
+
+    def dag_paths(self):
+        """ 场景中所有DAG节点的路径，只在第一次搜索或场景变化后查询一次 """
+        if self._dag_paths is None:
+            self._dag_paths = cmds.ls(dagObjects=True, long=True) or []
+        return self._dag_paths
+
+    def dag_children(self):
+        if self._dag_children is None:
+            dag_children = {}
+            for path in self.dag_paths():
+                dag_children.setdefault(path.rsplit("|", 1)[0], []).append(path)
+            self._dag_children = dag_children
+        return self._dag_children
+
+    def invalidate_dag_paths(self):
+        self._dag_paths = None
+        self._dag_children = None
+
+    def load_matching_paths(self, name_matcher, limit, candidate_paths=None):
+        """ 在整个场景或candidate_paths中按名字搜索，创建符合条件的节点和它们的父节点，返回符合条件的路径 """
+        if candidate_paths is None:
+            candidate_paths = self.dag_paths()
+
+        matched_paths = []
+        for path in candidate_paths:
+            if name_matcher(path.rsplit("|", 1)[-1]):
+                matched_paths.append(path)
+                if len(matched_paths) >= limit:
+                    break
+
+        self.load_paths(matched_paths)
+        return matched_paths
+
+    def load_paths(self, paths):
+        """ 创建路径对应的节点: 从上往下展开所有的父节点，所有要创建的节点只批量查询一次，
+            子节点路径来自缓存的DAG路径，不再为每个节点调用listRelatives """
+        ancestor_paths = set()
+        for path in paths:
+            ancestor_path = path.rsplit("|", 1)[0]
+            while ancestor_path and ancestor_path not in ancestor_paths:
+                ancestor_paths.add(ancestor_path)
+                ancestor_path = ancestor_path.rsplit("|", 1)[0]
+        if not ancestor_paths:
+            return
+
+        dag_children = self.dag_children()
+        query_paths = set()
+        for ancestor_path in ancestor_paths:
+            node = self._node_by_path.get(ancestor_path)
+            if node is not None and node.children is not None:  # 已经展开过
+                continue
+            for child_path in dag_children.get(ancestor_path, []):
+                query_paths.add(child_path)
+                grandchild_paths = dag_children.get(child_path, [])
+                if len(grandchild_paths) == 1:  # 只有一个子节点时需要它的类型显示图标
+                    query_paths.add(grandchild_paths[0])
+        node_info = self.query_nodes(list(query_paths)) if query_paths else None
+
+        for ancestor_path in sorted(ancestor_paths, key=lambda path: path.count("|")):
+            node = self._node_by_path.get(ancestor_path)
+            if node is None or node.children is not None:
+                continue
+            node.child_paths = []
+            children = self.create_nodes(dag_children.get(ancestor_path, []), node, node_info, dag_children)
+            if not children:
+                node.children = []
+                continue
+
+            self.beginInsertRows(self.index_for_node(node), 0, len(children) - 1)
+            node.children = children
+            self.endInsertRows()
+
+    def node_from_index(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.root_node
+
+    def node_for_path(self, path):
+        return self._node_by_path.get(path)
+
+    def node_for_uuid(self, uuid):
+        return self._node_by_uuid.get(uuid)
+
+    def index_for_node(self, node):
+        if node is None or node is self.root_node:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def index_for_path(self, path):
+        """ 节点还没有创建时返回无效的index """
+        return self.index_for_node(self._node_by_path.get(path))
+
+    def index_for_uuid(self, uuid):
+        return self.index_for_node(self._node_by_uuid.get(uuid))
+
+    def loaded_nodes(self):
+        """ 所有已经创建的节点 """
+        return self._node_by_path.values()
+
+    def set_expanded(self, index, expanded):
+        """ 展开后图标显示为transform，收起后显示子节点的类型 """
+        node = self.node_from_index(index)
+        if node is self.root_node or node.expanded == expanded:
+            return
+        node.expanded = expanded
+        self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    def patch_nodes(self, uuids):
+        """ 只更新有变化的节点，不重置模型，展开和滚动状态保持不变 """
+        self.invalidate_dag_paths()
+        uuids = list(uuids)
+        current_paths = cmds.ls(uuids, long=True) or []
+        paths_by_uuid = dict(zip(cmds.ls(current_paths, uuid=True), current_paths)) if current_paths else {}
+
+        added_paths = []
+        for uuid in uuids:
+            node = self._node_by_uuid.get(uuid)
+            path = paths_by_uuid.get(uuid)
+            if node is None:
+                if path:
+                    added_paths.append(path)
+            elif path is None:  # 节点被删除
+                self.remove_node(node)
+            elif path != node.path:
+                if path.rsplit("|", 1)[0] == node.path.rsplit("|", 1)[0]:  # 父节点没变就是重命名
+                    self.rename_node(node, path)
+                else:  # 改变了父节点，从原来的位置删除再添加到新的父节点下
+                    self.remove_node(node)
+                    added_paths.append(path)
+
+        # 先添加父节点，新建的父节点会把子节点记录在child_paths里
+        paths_by_parent = {}
+        for path in added_paths:
+            paths_by_parent.setdefault(path.rsplit("|", 1)[0], []).append(path)
+        for parent_path in sorted(paths_by_parent, key=lambda path: path.count("|")):
+            self.add_paths(parent_path, paths_by_parent[parent_path])
+
+    def add_paths(self, parent_path, paths):
+        """ 父节点还没有展开时只更新子节点列表，展开时再创建 """
+        if parent_path:
+            parent_node = self._node_by_path.get(parent_path)
+            if parent_node is None:  # 父节点还没有创建，不需要处理
+                return
+        else:
+            parent_node = self.root_node
+
+        if parent_node.children is None:
+            if parent_node.child_paths:
+                parent_node.child_paths = cmds.listRelatives(parent_path, children=True, fullPath=True) or []
+                self.update_child_type(parent_node)
+                return
+            parent_node.children = []  # 原来没有子节点，直接作为已经展开过的节点添加
+
+        paths = [path for path in paths if path not in self._node_by_path]
+        nodes = self.create_nodes(paths, parent_node)
+        if not nodes:
+            return
+
+        first = len(parent_node.children)
+        for row, node in enumerate(nodes, first):
+            node.row = row
+
+        self.beginInsertRows(self.index_for_node(parent_node), first, first + len(nodes) - 1)
+        parent_node.children.extend(nodes)
+        self.endInsertRows()
+
+        self.update_child_type(parent_node)
+
+    def remove_node(self, node):
+        """ 删除节点和已经创建的所有子节点 """
+        parent_node = node.parent
+        row = node.row
+
+        self.beginRemoveRows(self.index_for_node(parent_node), row, row)
+        del parent_node.children[row]
+        for sibling in parent_node.children[row:]:
+            sibling.row -= 1
+        self.endRemoveRows()
+
+        for removed_node in self.iter_subtree(node):
+            self._node_by_path.pop(removed_node.path, None)
+            self._node_by_uuid.pop(removed_node.uuid, None)
+
+        self.update_child_type(parent_node)
+
+    def rename_node(self, node, path):
+        """ 重命名后所有子节点的完整路径都要更新 """
+        old_prefix = node.path
+        for renamed_node in self.iter_subtree(node):
+            self._node_by_path.pop(renamed_node.path, None)
+            renamed_node.path = path + renamed_node.path[len(old_prefix):]
+            renamed_node.child_paths = [path + child_path[len(old_prefix):] for child_path in renamed_node.child_paths]
+            self._node_by_path[renamed_node.path] = renamed_node
+
+        index = self.index_for_node(node)
+        self.dataChanged.emit(index, index)
+
+    def update_child_type(self, node):
+        """ 子节点数量变化后更新父节点的图标 """
+        if node is self.root_node:
+            return
+
+        if node.child_count() == 1:
+            if node.children:
+                child = node.children[0]
+                node.child_type = child.node_type
+                self.update_filter_type(node, child.filter_type if child.is_shape else child.node_type)
+            else:
+                child_types, child_filter_types = self.query_node_types(node.child_paths)
+                for child_path, child_type in child_types.items():
+                    node.child_type = child_type
+                    self.update_filter_type(node, child_filter_types[child_path])
+        else:
+            self.update_filter_type(node, "")
+
+        index = self.index_for_node(node)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    def iter_subtree(self, node):
+        yield node
+        for child in node.children or []:
+            for descendant in self.iter_subtree(child):
+                yield descendant
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        # 树状控件布局时每一行都会调用，不通过node_from_index以减少函数调用
+        children = parent.internalPointer().children if parent.isValid() else self.root_node.children
+        if column != 0 or not children or row < 0 or row >= len(children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.index_for_node(index.internalPointer().parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return len(self.node_from_index(parent).children or [])
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        """ 子节点还没有创建，也要显示展开的箭头 """
+        return self.node_from_index(parent).child_count() > 0
+
+    def canFetchMore(self, parent):
+        node = self.node_from_index(parent)
+        return node.children is None and bool(node.child_paths)
+
+    def fetchMore(self, parent):
+        """ 第一次展开时创建子节点 """
+        node = self.node_from_index(parent)
+        if node.children is not None:
+            return
+
+        # 重新查询子节点，没展开时子节点可能已经被重命名或删除
+        child_paths = cmds.listRelatives(node.path, children=True, fullPath=True) or []
+        node.child_paths = []
+        children = self.create_nodes(child_paths, node)
+        if not children:
+            node.children = []
+            return
+
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        node.children = children
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            return node.name()
+        elif role == QtCore.Qt.DecorationRole:
+            return self.icon(node)
+        elif role == self.SHAPE_ROLE:
+            return node.is_shape
+        elif role == self.PATH_ROLE:
+            return node.path
+        elif role == self.NODE_TYPE_ROLE:
+            return node.node_type
+        elif role == self.UUID_ROLE:
+            return node.uuid
+        return None
+
+    def icon(self, node):
+        if node.expanded:  # 如果节点被展开
+            object_type = "transform"
+        else:
+            child_count = node.child_count()
+            if child_count == 0:
+                object_type = node.node_type
+            elif child_count == 1:
+                object_type = node.child_type
+            else:
+                object_type = "transform"
+
+        if object_type == "transform":
+            return self.transform_icon
+        elif object_type == "camera":
+            return self.camera_icon
+        elif object_type == "mesh":
+            return self.mesh_icon
+        return None
+
+
+class OutlinerFilterProxyModel(QtCore.QSortFilterProxyModel):
+    """ 按shape显示、节点类型和名字过滤大纲，过滤条件变化时只遍历一次已经创建的节点 """
+
+    FILTER_TYPES = ("mesh", "camera", "light", "transform")
+
+    def __init__(self, parent=None):
+        super(OutlinerFilterProxyModel, self).__init__(parent)
+
+        self.shapes_visible = True
+        self.visible_types = set(self.FILTER_TYPES)
+        self.name_matcher = None
+        self.search_text = None  # 普通搜索的小写文字，正则搜索时为None
+        self.visible_nodes = None  # 符合条件的节点和它们的父节点，None表示没有过滤
+        self.matched_nodes = None  # 上一次过滤时自身符合条件的节点，继续输入时只需要在这里面查找
+
+    def setSourceModel(self, source_model):
+        super(OutlinerFilterProxyModel, self).setSourceModel(source_model)
+        # 创建了新的节点后不能只在上一次的结果里查找
+        source_model.rowsInserted.connect(self.clear_matched_nodes)
+        source_model.modelReset.connect(self.clear_matched_nodes)
+
+    def clear_matched_nodes(self, *args):
+        self.matched_nodes = None
+
+    def is_filtering(self):
+        return not self.shapes_visible or len(self.visible_types) < len(self.FILTER_TYPES) or self.name_matcher is not None
+
+    def set_shapes_visible(self, visible):
+        self.shapes_visible = visible
+        self.update_filter()
+
+    def set_type_visible(self, filter_type, visible):
+        if visible:
+            self.visible_types.add(filter_type)
+        else:
+            self.visible_types.discard(filter_type)
+        self.update_filter()
+
+    @staticmethod
+    def create_name_matcher(text, use_regex=False):
+        """ 不区分大小写，没有文字时返回None，正则表达式不合法时抛出re.error """
+        if not text:
+            return None
+        if use_regex:
+            return re.compile(text, re.IGNORECASE).search
+
+        text = text.lower()
+        return lambda name: text in name.lower()
+
+    def set_search_text(self, text, use_regex=False):
+        """ 正则表达式不合法时返回False并且不改变过滤条件 """
+        try:
+            self.name_matcher = self.create_name_matcher(text, use_regex)
+        except re.error:
+            return False
+
+        search_text = text.lower() if text and not use_regex else None
+        # 普通搜索在上一次的文字基础上继续输入时，结果一定在上一次的结果里
+        narrow = search_text is not None and self.search_text is not None and self.search_text in search_text
+        self.search_text = search_text
+
+        self.update_filter(narrow)
+        return True
+
+    def update_filter(self, narrow=False):
+        """ 先算出所有可见的节点，filterAcceptsRow只需要查找集合 """
+        self.visible_nodes = None
+        if self.is_filtering():
+            if narrow and self.matched_nodes is not None:
+                candidates = self.matched_nodes
+            else:
+                candidates = self.sourceModel().loaded_nodes()
+            node_accepted = self.node_accepted
+            self.matched_nodes = [node for node in candidates if node_accepted(node)]
+
+            visible_nodes = set()
+            for node in self.matched_nodes:
+                while node is not None and node not in visible_nodes:  # 父节点也要显示
+                    visible_nodes.add(node)
+                    node = node.parent
+            self.visible_nodes = visible_nodes
+        else:
+            self.matched_nodes = None
+
+        self.invalidate()
+
+    def node_accepted(self, node):
+        if node.is_shape and not self.shapes_visible:
+            return False
+        if node.filter_type in self.FILTER_TYPES and node.filter_type not in self.visible_types:
+            # 没有展开过的组里可能有符合类型的节点，搜索时已经创建了符合条件的节点不需要这样处理
+            return (node.filter_type == "transform" and node.children is None and bool(node.child_paths)
+                    and self.name_matcher is None)
+        if self.name_matcher is not None and not self.name_matcher(node.name()):
+            return False
+        return True
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        """ 默认的实现会为每一行过滤一遍子节点，大场景下布局很慢，直接用可见节点的集合判断 """
+        node = self.sourceModel().node_from_index(self.mapToSource(parent))
+        if node.children is None:
+            return bool(node.child_paths)
+        if self.visible_nodes is None:
+            return bool(node.children)
+
+        for child in node.children:
+            if child in self.visible_nodes or self.node_accepted(child):
+                return True
+        return False
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.visible_nodes is None:
+            return True
+
+        node = self.sourceModel().node_from_index(source_parent).children[source_row]
+        # 过滤条件设置后才创建的节点直接判断
+        return node in self.visible_nodes or self.node_accepted(node)
+
+
+class DagChangeTracker(QtCore.QObject):
+    """ 监听DAG节点的添加、删除、重命名和改变父节点，同一次事件循环内的变化合并成一次更新 """
+
+    nodes_changed = QtCore.Signal(object)  # 有变化的节点uuid集合
+
+    def __init__(self, parent=None):
+        super(DagChangeTracker, self).__init__(parent)
+
+        self.callback_ids = []
+        self.changed_uuids = set()
+
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(0)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def start(self):
+        if self.callback_ids:
+            return
+
+        self.callback_ids = [
+            om2.MDGMessage.addNodeAddedCallback(self.on_node_changed, "dagNode"),
+            om2.MDGMessage.addNodeRemovedCallback(self.on_node_changed, "dagNode"),
+            om2.MNodeMessage.addNameChangedCallback(om2.MObject.kNullObj, self.on_name_changed),
+            om2.MDagMessage.addParentAddedCallback(self.on_parent_added),
+        ]
+
+    def stop(self):
+        if self.callback_ids:
+            om2.MMessage.removeCallbacks(self.callback_ids)
+            self.callback_ids = []
+
+        self.clear()
+
+    def clear(self):
+        """ 丢弃还没有处理的变化 """
+        self.flush_timer.stop()
+        self.changed_uuids = set()
+
+    def on_node_changed(self, node, client_data):
+        self.mark_changed(node)
+
+    def on_name_changed(self, node, previous_name, client_data):
+        if node.hasFn(om2.MFn.kDagNode):  # 所有节点的重命名都会触发，只需要DAG节点
+            self.mark_changed(node)
+
+    def on_parent_added(self, child_path, parent_path, client_data):
+        self.mark_changed(child_path.node())
+
+    def mark_changed(self, node):
+        """ 回调里不查询场景，只记录uuid，等到事件循环空闲时再一起处理 """
+        self.changed_uuids.add(om2.MFnDependencyNode(node).uuid().asString())
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        self.flush_timer.stop()
+
+        changed_uuids = self.changed_uuids
+        self.changed_uuids = set()
+        if changed_uuids:
+            self.nodes_changed.emit(changed_uuids)
+
+
 class SimpleOutliner(QtWidgets.QDialog):
     WINDOW_TITLE = "Simple Outliner"
 
+    SEARCH_DELAY = 150  # 输入停止后多少毫秒开始搜索
+    SEARCH_LOAD_LIMIT = 2000  # 搜索时最多创建多少个符合条件的节点
+
     def __init__(self, parent=maya_main_window()):
         super(SimpleOutliner, self).__init__(parent)
 
@@ -30,11 +651,10 @@ class SimpleOutliner(QtWidgets.QDialog):
 
         self.setMinimumWidth(300)
 
-        self.transform_icon = QtGui.QIcon(":transform.svg")
-        self.camera_icon = QtGui.QIcon(":Camera.png")
-        self.mesh_icon = QtGui.QIcon(":mesh.svg")
-
         self.script_job_number = -1
+        self.selected_paths = set()  # 当前maya中选择的节点，用来计算选择的变化
+        self.last_search = None  # (小写的搜索文字, 符合条件的路径)，继续输入时只需要在这些路径里查找
+        self.updating_selection = False
 
         self.create_actions()
         self.create_widgets()
@@ -56,22 +676,50 @@ class SimpleOutliner(QtWidgets.QDialog):
         self.display_shape_action.setChecked(True)
         self.display_shape_action.setShortcut(QtGui.QKeySequence("Ctrl+Shift+H"))
 
+        self.type_actions = {}
+        for filter_type in OutlinerFilterProxyModel.FILTER_TYPES:
+            action = QtWidgets.QAction(filter_type.capitalize(), self)
+            action.setCheckable(True)
+            action.setChecked(True)
+            self.type_actions[filter_type] = action
+
     def create_widgets(self):
         self.menu_bar = QtWidgets.QMenuBar()
         display_menu = self.menu_bar.addMenu("Display")
         display_menu.addAction(self.display_shape_action)
+        display_menu.addSeparator()
+        for filter_type in OutlinerFilterProxyModel.FILTER_TYPES:
+            display_menu.addAction(self.type_actions[filter_type])
         help_menu = self.menu_bar.addMenu("Help")
         help_menu.addAction(self.about_action)
 
-        self.tree_widget = QtWidgets.QTreeWidget()
-        self.tree_widget.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
-        self.tree_widget.setHeaderHidden(True) # 隐藏树状控件的顶层
-        # header = self.tree_widget.headerItem()
-        # header.setText(0, "Column 0 Text")
+        self.outliner_model = OutlinerModel(self)
+        self.dag_change_tracker = DagChangeTracker(self)
+        self.filter_model = OutlinerFilterProxyModel(self)
+        self.filter_model.setSourceModel(self.outliner_model)
+
+        self.search_le = QtWidgets.QLineEdit()
+        self.search_le.setPlaceholderText("Search")
+        self.search_le.setClearButtonEnabled(True)
+        self.regex_cb = QtWidgets.QCheckBox("Regex")
+
+        self.search_timer = QtCore.QTimer(self)  # 连续输入时只搜索一次
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY)
+
+        self.tree_view = QtWidgets.QTreeView()
+        self.tree_view.setModel(self.filter_model)
+        self.tree_view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.tree_view.setHeaderHidden(True) # 隐藏树状控件的顶层
+        self.tree_view.setUniformRowHeights(True)  # 行高相同，大场景下滚动更快
 
         self.refresh_btn = QtWidgets.QPushButton("Refresh")
 
     def create_layout(self):
+        search_layout = QtWidgets.QHBoxLayout()
+        search_layout.addWidget(self.search_le)
+        search_layout.addWidget(self.regex_cb)
+
         button_layout = QtWidgets.QHBoxLayout()
         button_layout.addStretch()
         button_layout.addWidget(self.refresh_btn)
@@ -80,89 +728,147 @@ class SimpleOutliner(QtWidgets.QDialog):
         main_layout.setContentsMargins(2, 2, 2, 2) # 设置左上右下的边距
         main_layout.setSpacing(2)
         main_layout.setMenuBar(self.menu_bar)
-        main_layout.addWidget(self.tree_widget)
+        main_layout.addLayout(search_layout)
+        main_layout.addWidget(self.tree_view)
         main_layout.addLayout(button_layout)
 
     def create_connections(self):
         self.about_action.triggered.connect(self.about)
         self.display_shape_action.toggled.connect(self.set_shape_nodes_visible)
+        for filter_type, action in self.type_actions.items():
+            action.toggled.connect(partial(self.set_type_visible, filter_type))
+
+        self.search_le.textChanged.connect(self.on_search_changed)
+        self.regex_cb.toggled.connect(self.on_search_changed)
+        self.search_timer.timeout.connect(self.apply_search)
 
-        self.tree_widget.itemCollapsed.connect(self.update_icon) # 树状结构收缩时
-        self.tree_widget.itemExpanded.connect(self.update_icon) # 树状结构展开时
-        self.tree_widget.itemSelectionChanged.connect(self.select_items)
+        self.tree_view.collapsed.connect(partial(self.set_expanded, expanded=False)) # 树状结构收缩时
+        self.tree_view.expanded.connect(partial(self.set_expanded, expanded=True)) # 树状结构展开时
+        self.tree_view.selectionModel().selectionChanged.connect(self.select_items)
+        self.outliner_model.rowsInserted.connect(self.on_rows_inserted)
+        self.dag_change_tracker.nodes_changed.connect(self.on_nodes_changed)
 
         self.refresh_btn.clicked.connect(self.refresh_tree_widget)
 
     def refresh_tree_widget(self):
-        self.shape_nodes = cmds.ls(shapes=True)
-
-        self.tree_widget.clear()
+        """ 重新创建整个大纲，场景的变化平时由dag_change_tracker增量更新 """
+        self.dag_change_tracker.clear()
 
-        top_level_object_names = cmds.ls(assemblies=True)
-        for name in top_level_object_names:
-            item = self.create_item(name)
-            self.tree_widget.addTopLevelItem(item)
+        self.last_search = None
+        self.outliner_model.refresh()
+        self.filter_model.update_filter()
 
+        self.selected_paths = set()
         self.update_selection()
 
-    def create_item(self, name):
-        item = QtWidgets.QTreeWidgetItem([name])
-        self.add_children(item)
-        self.update_icon(item)
-
-        is_shape = name in self.shape_nodes
-        item.setData(0, QtCore.Qt.UserRole, is_shape)
-
-        return item
-
-    def add_children(self, item):
-        children = cmds.listRelatives(item.text(0), children=True)
-        if children:
-            for child in children:
-                child_item = self.create_item(child)
-                item.addChild(child_item)
-
-    def update_icon(self, item):
-        object_type = ""
-
-        if item.isExpanded():  # 如果item被展开
-            object_type = "transform"
-        else:
-            child_count = item.childCount()
-            if child_count == 0:
-                object_type = cmds.objectType(item.text(0))
-            elif child_count == 1:
-                child_item = item.child(0)
-                object_type = cmds.objectType(child_item.text(0))
+    def on_nodes_changed(self, uuids):
+        self.last_search = None  # 场景变化后上一次的搜索结果不再可靠
+        self.preserve_selection(self.outliner_model.patch_nodes, uuids)
+
+    def view_index(self, source_index):
+        """ 模型的index转换为树状控件里的index """
+        return self.filter_model.mapFromSource(source_index)
+
+    def set_expanded(self, index, expanded):
+        self.outliner_model.set_expanded(self.filter_model.mapToSource(index), expanded)
+
+    def preserve_selection(self, function, *args):
+        """ 过滤掉的行会被取消选择，不需要同步到maya，重新显示的行要恢复选择状态 """
+        self.updating_selection = True
+        try:
+            result = function(*args)
+        finally:
+            self.updating_selection = False
+
+        self.apply_selection(self.create_item_selection(self.selected_paths), QtCore.QItemSelectionModel.Select)
+        return result
+
+    def set_type_visible(self, filter_type, visible):
+        self.preserve_selection(self.filter_model.set_type_visible, filter_type, visible)
+
+    def on_search_changed(self, *args):
+        self.search_timer.start()
+
+    def apply_search(self):
+        """ 在整个场景中搜索，展开符合条件的节点的父节点 """
+        self.search_timer.stop()
+
+        text = self.search_le.text()
+        use_regex = self.regex_cb.isChecked()
+        try:
+            name_matcher = OutlinerFilterProxyModel.create_name_matcher(text, use_regex)
+        except re.error:  # 正则表达式还没有输入完
+            return
+
+        # 先处理还没有更新的场景变化，缓存的DAG路径才是最新的
+        self.dag_change_tracker.flush()
+
+        matched_paths = []
+        if name_matcher is not None:  # 先创建符合条件的节点再过滤，只需要过滤一次
+            search_text = None if use_regex else text.lower()
+            candidate_paths = None
+            if search_text and self.last_search and self.last_search[0] in search_text:
+                candidate_paths = self.last_search[1]
+            matched_paths = self.outliner_model.load_matching_paths(name_matcher, self.SEARCH_LOAD_LIMIT, candidate_paths)
+
+            # 没有达到上限时结果才是完整的
+            if search_text and len(matched_paths) < self.SEARCH_LOAD_LIMIT:
+                self.last_search = (search_text, matched_paths)
             else:
-                object_type = "transform"
-        if object_type == "transform":
-            item.setIcon(0, self.transform_icon)
-        elif object_type == "camera":
-            item.setIcon(0, self.camera_icon)
-        elif object_type == "mesh":
-            item.setIcon(0, self.mesh_icon)
-
-    def select_items(self):
-        items = self.tree_widget.selectedItems()
-        names = []
-        for item in items:
-            names.append(item.text(0))
-
-        cmds.select(names, replace=True)
+                self.last_search = None
+        self.preserve_selection(self.filter_model.set_search_text, text, use_regex)
+
+        parent_nodes = set()
+        for path in matched_paths:
+            node = self.outliner_model.node_for_path(path)
+            while node is not None and node.parent is not None and node.parent not in parent_nodes:
+                parent_nodes.add(node.parent)
+                node = node.parent
+        self.tree_view.scheduleDelayedItemsLayout()  # 所有节点展开后只重新布局一次
+        for node in sorted(parent_nodes, key=lambda node: node.path.count("|")):
+            self.tree_view.expand(self.view_index(self.outliner_model.index_for_node(node)))
+
+    def on_rows_inserted(self, parent, first, last):
+        """ 展开时新创建的节点也要恢复选择状态 """
+        selection = QtCore.QItemSelection()
+        for row in range(first, last + 1):
+            index = self.outliner_model.index(row, 0, parent)
+            if index.internalPointer().path in self.selected_paths:
+                selection.select(index, index)
+
+        if not selection.isEmpty():
+            self.apply_selection(selection, QtCore.QItemSelectionModel.Select)
+
+    def select_items(self, selected, deselected):
+        """ 只把这次选择和取消选择的行同步到maya，还没有创建或者被过滤掉的节点在maya中的选择状态不变 """
+        if self.updating_selection:
+            return
+
+        added_paths = [path for path in self.selection_paths(selected) if path not in self.selected_paths]
+        removed_paths = [path for path in self.selection_paths(deselected) if path in self.selected_paths]
+
+        # 先记录下来，maya的SelectionChanged事件回来时就不会有变化需要同步
+        self.selected_paths.difference_update(removed_paths)
+        self.selected_paths.update(added_paths)
+        if removed_paths:
+            cmds.select(removed_paths, deselect=True)
+        if added_paths:
+            cmds.select(added_paths, add=True)
+
+    @staticmethod
+    def selection_paths(selection):
+        """ QItemSelection中的节点路径，按显示的顺序 """
+        paths = []
+        for index in selection.indexes():
+            if index.column() == 0:
+                paths.append(index.data(OutlinerModel.PATH_ROLE))
+        return paths
 
     def about(self):
         QtWidgets.QMessageBox.about(self, "About Simple Outliner", "Add About Text Here")
 
     def set_shape_nodes_visible(self, visible):
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.tree_widget)
-        while iterator.value():
-            item = iterator.value()
-            is_shape = item.data(0, QtCore.Qt.UserRole)
-            if is_shape:
-                item.setHidden(not visible)
-
-            iterator += 1
+        self.preserve_selection(self.filter_model.set_shapes_visible, visible)
 
     def show_context_menu(self, point):
         """ 右键显示菜单的内容 """
@@ -174,15 +880,50 @@ class SimpleOutliner(QtWidgets.QDialog):
         context_menu.exec_(self.mapToGlobal(point))  # 右键显示菜单
 
     def update_selection(self):
-        selection = cmds.ls(selection=True)
-
-        iterator = QtWidgets.QTreeWidgetItemIterator(self.tree_widget)
-        while iterator.value():
-            item = iterator.value()
-            is_selected = item.text(0) in selection
-            item.setSelected(is_selected)
-
-            iterator += 1
+        """ 只同步选择有变化的节点，用一个QItemSelection一次性选择或取消选择 """
+        selection = set(cmds.ls(selection=True, long=True))
+
+        added_paths = selection - self.selected_paths
+        removed_paths = self.selected_paths - selection
+        self.selected_paths = selection  # 还没有创建的节点在展开时恢复选择状态
+
+        if removed_paths:
+            self.apply_selection(self.create_item_selection(removed_paths), QtCore.QItemSelectionModel.Deselect)
+        if added_paths:
+            self.apply_selection(self.create_item_selection(added_paths), QtCore.QItemSelectionModel.Select)
+
+    def create_item_selection(self, paths):
+        """ 同一个父节点下相邻的行合并成一个范围 """
+        rows_by_parent = {}
+        for path in paths:
+            node = self.outliner_model.node_for_path(path)
+            if node:
+                rows_by_parent.setdefault(node.parent, []).append(node.row)
+
+        selection = QtCore.QItemSelection()
+        for parent_node, rows in rows_by_parent.items():
+            parent = self.outliner_model.index_for_node(parent_node)
+            rows.sort()
+            first = last = rows[0]
+            for row in rows[1:] + [None]:
+                if row == last + 1:
+                    last = row
+                    continue
+                selection.append(QtCore.QItemSelectionRange(self.outliner_model.index(first, 0, parent),
+                                                            self.outliner_model.index(last, 0, parent)))
+                if row is not None:
+                    first = last = row
+        return selection
+
+    def apply_selection(self, selection, command):
+        """ 从maya同步过来的选择不需要再次选择maya中的物体，selection是模型的index """
+        if selection.isEmpty():
+            return
+        self.updating_selection = True
+        try:
+            self.tree_view.selectionModel().select(self.filter_model.mapSelectionFromSource(selection), command)
+        finally:
+            self.updating_selection = False
 
     def set_script_job_enabled(self, enabled):
         if enabled and self.script_job_number < 0:
@@ -194,15 +935,18 @@ class SimpleOutliner(QtWidgets.QDialog):
     def showEvent(self, e):
         super(SimpleOutliner, self).showEvent(e)
         self.set_script_job_enabled(True)
+        self.dag_change_tracker.start()
 
     def closeEvent(self, e):
         if isinstance(self, SimpleOutliner):
             super(SimpleOutliner, self).closeEvent(e)
             self.set_script_job_enabled(False)
+            self.dag_change_tracker.stop()
 
 if __name__ == '__main__':
     try:
         ui.set_script_job_enabled(False)
+        ui.dag_change_tracker.stop()
         ui.close()
         ui.deleteLater()
     except:
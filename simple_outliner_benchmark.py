@@ -0,0 +1,298 @@
+# coding:utf-8
+# 大纲性能测试: 场景变化后整体重建和增量更新的耗时对比
+# 在maya的脚本编辑器中: import simple_outliner_benchmark; simple_outliner_benchmark.main()
+# 在maya外(需要PySide2): python simple_outliner_benchmark.py
+import time
+
+from PySide2 import QtCore
+from PySide2 import QtWidgets
+
+import fake_maya
+fake_maya.install_if_missing()
+
+import simple_outliner
+
+
+def create_outliner_scene(group_count, children_per_group):
+    scene = fake_maya.FakeScene()
+    for group_index in range(group_count):
+        group_name = "group{0}".format(group_index)
+        scene.create_node("transform", group_name)
+        for child_index in range(children_per_group):
+            geo_name = "geo{0}_{1}".format(group_index, child_index)
+            scene.create_node("transform", geo_name, parent=group_name)
+            scene.create_node("mesh", "{0}Shape".format(geo_name), parent=geo_name)
+    return scene
+
+
+def expanded_paths(outliner):
+    model = outliner.outliner_model
+    paths = []
+    for node in model.loaded_nodes():
+        if outliner.tree_view.isExpanded(outliner.view_index(model.index_for_node(node))):
+            paths.append(node.path)
+    return paths
+
+
+def restore_expanded_paths(outliner, paths):
+    """ 重建后按深度依次展开，子节点在父节点展开后才会创建 """
+    model = outliner.outliner_model
+    for path in sorted(paths, key=lambda path: path.count("|")):
+        index = model.index_for_path(path)
+        if index.isValid():
+            if model.canFetchMore(index):
+                model.fetchMore(index)
+            outliner.tree_view.expand(outliner.view_index(index))
+
+
+def change_scene(cmds, group_count, change_count, round_index):
+    """ 在展开的组里添加、重命名、改变父节点和删除节点 """
+    for i in range(change_count):
+        group_name = "group{0}".format(i % group_count)
+        cmds.createNode("transform", name="added{0}_{1}".format(round_index, i), parent=group_name)
+        cmds.rename("geo{0}_{1}".format(i % group_count, i), "geo{0}_{1}_r{2}".format(i % group_count, i, round_index))
+        cmds.parent("geo{0}_{1}".format((i + 1) % group_count, change_count + i), group_name)
+        cmds.delete("geo{0}_{1}".format(i % group_count, 2 * change_count + i))
+
+
+def benchmark_rebuild_vs_patch(group_count=20, children_per_group=500, change_count=10):
+    node_count = group_count * children_per_group * 2 + group_count
+    results = {}
+    for mode in ("rebuild", "patch"):
+        scene = create_outliner_scene(group_count, children_per_group)
+        fake_cmds, fake_om2, restore = fake_maya.patch_module(simple_outliner, scene)
+        outliner = simple_outliner.SimpleOutliner()
+        try:
+            outliner.show()
+            model = outliner.outliner_model
+            for row in range(model.rowCount()):
+                outliner.tree_view.expand(outliner.view_index(model.index(row, 0)))
+            outliner.tree_view.verticalScrollBar().setValue(outliner.tree_view.verticalScrollBar().maximum() // 2)
+            scroll_value = outliner.tree_view.verticalScrollBar().value()
+
+            change_scene(fake_cmds, group_count, change_count, 0)
+            fake_cmds.reset_counts()
+            start = time.time()
+            if mode == "rebuild":
+                expanded = expanded_paths(outliner)
+                outliner.refresh_tree_widget()
+                restore_expanded_paths(outliner, expanded)
+            else:
+                outliner.dag_change_tracker.flush()
+            elapsed = time.time() - start
+
+            results[mode] = (elapsed, fake_cmds.total_calls(), model.rowCount(model.index(0, 0)),
+                             outliner.tree_view.verticalScrollBar().value() == scroll_value)
+        finally:
+            outliner.close()
+            outliner.deleteLater()
+            restore()
+
+    print("Outliner update after {0} adds/renames/reparents/deletes in a {1} node scene".format(change_count, node_count))
+    for mode in ("rebuild", "patch"):
+        elapsed, calls, rows, scroll_kept = results[mode]
+        print("  {0:8s} {1:.4f}s, {2:6d} cmds calls, {3} rows in group0, scroll kept: {4}".format(
+            mode, elapsed, calls, rows, scroll_kept))
+    assert results["rebuild"][2] == results["patch"][2], results
+
+
+def check_patch_keeps_expansion():
+    scene = create_outliner_scene(3, 4)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(simple_outliner, scene)
+    outliner = simple_outliner.SimpleOutliner()
+    try:
+        outliner.show()
+        model = outliner.outliner_model
+        view = outliner.tree_view
+        view.expand(outliner.view_index(model.index_for_path("|group0")))
+        view.expand(outliner.view_index(model.index_for_path("|group0|geo0_0")))
+
+        fake_cmds.createNode("transform", name="added", parent="group0")
+        fake_cmds.rename("group0", "renamedGroup")
+        fake_cmds.delete("geo0_1")
+        fake_cmds.parent("geo1_0", "renamedGroup")
+        fake_cmds.reset_counts()
+        outliner.dag_change_tracker.flush()
+
+        group_index = model.index_for_path("|renamedGroup")
+        assert group_index.data() == "renamedGroup"
+        assert view.isExpanded(outliner.view_index(group_index))
+        assert view.isExpanded(outliner.view_index(model.index_for_path("|renamedGroup|geo0_0")))
+        children = [model.index(row, 0, group_index).data() for row in range(model.rowCount(group_index))]
+        assert sorted(children) == ["added", "geo0_0", "geo0_2", "geo0_3", "geo1_0"], children
+        assert not model.index_for_path("|group0").isValid()
+        assert fake_cmds.call_counts["listRelatives"] == 2, fake_cmds.call_counts
+    finally:
+        outliner.close()
+        outliner.deleteLater()
+        restore()
+
+    print("Outliner patch: renamed, added, removed and reparented rows, expansion kept - ok")
+
+
+def check_search_cache():
+    """ 检查搜索只在第一次和场景变化后查询一次场景，连续输入只搜索一次 """
+    scene = create_outliner_scene(3, 4)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(simple_outliner, scene)
+    outliner = simple_outliner.SimpleOutliner()
+    try:
+        outliner.show()
+        model = outliner.outliner_model
+
+        searches = []
+        original_apply_search = outliner.apply_search
+        outliner.apply_search = lambda: searches.append(original_apply_search())
+        outliner.search_timer.timeout.disconnect()
+        outliner.search_timer.timeout.connect(outliner.apply_search)
+        for length in range(1, len("geo1_2") + 1):
+            outliner.search_le.setText("geo1_2"[:length])
+            QtWidgets.QApplication.processEvents()
+        deadline = time.time() + 2.0
+        while not searches and time.time() < deadline:
+            QtWidgets.QApplication.processEvents()
+        assert len(searches) == 1, searches
+        assert model.node_for_path("|group1|geo1_2|geo1_2Shape") is not None
+
+        fake_cmds.reset_counts()
+        for text in ("geo", "geo2", "mesh", "geo0"):
+            outliner.search_le.setText(text)
+            original_apply_search()
+        assert fake_cmds.call_counts["ls"] <= 4 * 5 and "listRelatives" not in fake_cmds.call_counts, fake_cmds.call_counts
+
+        # 场景变化后缓存的路径失效，新的名字可以搜到
+        fake_cmds.rename("geo2_3", "renamedGeo")
+        outliner.search_le.setText("renamed")
+        original_apply_search()
+        assert model.node_for_path("|group2|renamedGeo") is not None
+        assert outliner.filter_model.matched_nodes == [model.node_for_path("|group2|renamedGeo")]
+    finally:
+        outliner.close()
+        outliner.deleteLater()
+        restore()
+
+    print("Outliner search: scene listed once per change, typing debounced - ok")
+
+
+def check_selection_delta():
+    """ 在大纲中点击时只同步变化的行，maya中选择的、还没有创建或者被过滤掉的节点保持选择 """
+    scene = create_outliner_scene(3, 4)
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(simple_outliner, scene)
+    outliner = simple_outliner.SimpleOutliner()
+    try:
+        outliner.show()
+        model = outliner.outliner_model
+        selection_model = outliner.tree_view.selectionModel()
+        outliner.tree_view.expand(outliner.view_index(model.index_for_path("|group0")))
+        outliner.tree_view.expand(outliner.view_index(model.index_for_path("|group0|geo0_0")))
+        outliner.set_shape_nodes_visible(False)
+
+        unloaded = "|group2|geo2_1"  # group2没有展开
+        filtered = "|group0|geo0_0|geo0_0Shape"  # shape被过滤掉
+        fake_cmds.select([unloaded, filtered, "|group0"])
+        outliner.update_selection()
+        assert model.node_for_path(unloaded) is None
+
+        def click(path, command):
+            selection_model.select(outliner.view_index(model.index_for_path(path)),
+                                   command | QtCore.QItemSelectionModel.Rows)
+
+        click("|group1", QtCore.QItemSelectionModel.Select)  # ctrl+点击
+        assert fake_cmds.ls(selection=True, long=True) == [unloaded, filtered, "|group0", "|group1"]
+        click("|group0|geo0_1", QtCore.QItemSelectionModel.ClearAndSelect)  # 点击
+        assert fake_cmds.ls(selection=True, long=True) == [unloaded, filtered, "|group0|geo0_1"]
+        click("|group0|geo0_1", QtCore.QItemSelectionModel.Deselect)
+        assert fake_cmds.ls(selection=True, long=True) == [unloaded, filtered]
+        assert outliner.selected_paths == set([unloaded, filtered])
+
+        outliner.set_shape_nodes_visible(True)  # 重新显示时恢复选择状态
+        assert outliner.tree_view.selectionModel().isSelected(outliner.view_index(model.index_for_path(filtered)))
+    finally:
+        outliner.close()
+        outliner.deleteLater()
+        restore()
+
+    print("Outliner selection: clicks sync only the changed rows, unloaded and filtered nodes stay selected - ok")
+
+
+def visible_row_count(outliner, parent=None):
+    """ 过滤后剩下的已经创建的行数 """
+    proxy = outliner.filter_model
+    parent = parent or QtCore.QModelIndex()
+    count = 0
+    for row in range(proxy.rowCount(parent)):
+        count += 1 + visible_row_count(outliner, proxy.index(row, 0, parent))
+    return count
+
+
+def benchmark_filter(group_count=100, children_per_group=500, expand_all=False):
+    scene = create_outliner_scene(group_count, children_per_group)
+    for group_index in range(group_count):
+        group_name = "group{0}".format(group_index)
+        scene.create_light("pointLight", "light{0}".format(group_index), parent=group_name)
+        scene.create_node("transform", "camera{0}".format(group_index), parent=group_name)
+        scene.create_node("camera", "camera{0}Shape".format(group_index), parent="camera{0}".format(group_index))
+    node_count = len(scene.nodes)
+
+    fake_cmds, fake_om2, restore = fake_maya.patch_module(simple_outliner, scene)
+    outliner = simple_outliner.SimpleOutliner()
+    try:
+        outliner.show()
+        model = outliner.outliner_model
+        if expand_all:  # 所有的组都展开并且创建所有节点，测试最坏的情况
+            for row in range(model.rowCount()):
+                outliner.tree_view.expand(outliner.view_index(model.index(row, 0)))
+            for node in list(model.loaded_nodes()):
+                index = model.index_for_node(node)
+                if model.canFetchMore(index):
+                    model.fetchMore(index)
+        QtWidgets.QApplication.processEvents()
+        loaded_count = len(model.loaded_nodes())
+
+        def search(text, use_regex=False):
+            outliner.regex_cb.setChecked(use_regex)
+            outliner.search_le.setText(text)
+            outliner.apply_search()
+
+        steps = [
+            ("hide shapes", lambda: outliner.display_shape_action.setChecked(False)),
+            ("show shapes", lambda: outliner.display_shape_action.setChecked(True)),
+            ("lights only", lambda: [outliner.type_actions[filter_type].setChecked(filter_type == "light")
+                                     for filter_type in simple_outliner.OutlinerFilterProxyModel.FILTER_TYPES]),
+            ("all types", lambda: [action.setChecked(True) for action in outliner.type_actions.values()]),
+        ]
+        for length in range(1, len("geo42_17") + 1):
+            steps.append(("type '{0}'".format("geo42_17"[:length]), partial_search(search, "geo42_17"[:length])))
+        steps.append(("regex '^camera1\\d$'", partial_search(search, "^camera1\\d$", True)))
+        steps.append(("clear search", partial_search(search, "")))
+
+        print("Outliner filter with {0} nodes ({1} created{2})".format(
+            node_count, loaded_count, ", all groups expanded" if expand_all else ""))
+        for name, step in steps:
+            fake_cmds.reset_counts()
+            start = time.time()
+            step()
+            QtWidgets.QApplication.processEvents()  # 包括树状控件重新布局的时间
+            elapsed = time.time() - start
+            print("  {0:22s} {1:.4f}s, {2:6d} visible rows, {3} cmds calls".format(
+                name, elapsed, visible_row_count(outliner), fake_cmds.total_calls()))
+    finally:
+        outliner.close()
+        outliner.deleteLater()
+        restore()
+
+
+def partial_search(search, text, use_regex=False):
+    return lambda: search(text, use_regex)
+
+
+def main():
+    check_patch_keeps_expansion()
+    check_search_cache()
+    check_selection_delta()
+    benchmark_rebuild_vs_patch()
+    benchmark_filter()
+    benchmark_filter(expand_all=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+# coding:utf-8
+# 进度条示例共用的任务执行器: 在主线程中分块执行大量的小任务，不使用time.sleep和processEvents
+# 每块最多执行TIME_SLICE秒后回到事件循环，由QTimer(0)继续执行下一块，界面在两块之间正常刷新和响应取消
+# 不访问场景的任务(计算文件hash，复制贴图，读取缓存)可以使用ThreadPoolTaskRunner在多个线程中执行
+# 每个执行器都有一个ProgressModel，记录每个item和每个阶段的耗时，计算速度和剩余时间，完成后可以保存报告
+import collections
+import contextlib
+import csv
+import datetime
+import json
+import sys
+import threading
+import time
+import traceback
+
+from PySide2 import QtCore
+
+
+def format_duration(seconds):
+    """ 秒数显示为0:01:23 """
+    return str(datetime.timedelta(seconds=int(round(seconds))))
+
+
+class ProgressModel(object):
+    """ 记录每个item的耗时和各个阶段(phase)的耗时，用最近THROUGHPUT_WINDOW秒内完成的数量计算速度和剩余时间。
+        record_phase和phase可以在工作线程中调用 """
+
+    THROUGHPUT_WINDOW = 5.0  # 秒，只用最近这段时间计算速度，前面快后面慢时剩余时间也准确
+    TOTAL_PHASE = "total"  # 报告中整个item的耗时使用的阶段名
+    SLOWEST_ITEM_COUNT = 20
+
+    def __init__(self):
+        self.total_count = 0
+        self.completed_count = 0
+        self.start_time = None
+        self.end_time = None
+        self.records = []  # (阶段名, item, 耗时, 完成的时间)，整个item的阶段名为TOTAL_PHASE
+
+        self._completion_times = collections.deque()  # 最近完成的时间，用于计算速度
+        self._lock = threading.Lock()
+
+    def start(self, total_count):
+        self.total_count = total_count
+        self.completed_count = 0
+        self.start_time = time.time()
+        self.end_time = None
+        self.records = []
+        self._completion_times.clear()
+
+    def finish(self):
+        self.end_time = time.time()
+
+    def record_item(self, item, duration):
+        """ 一个item全部完成 """
+        now = time.time()
+        with self._lock:
+            self.records.append((self.TOTAL_PHASE, item, duration, now))
+            self.completed_count += 1
+            self._completion_times.append(now)
+
+    def record_phase(self, name, duration, item=None):
+        with self._lock:
+            self.records.append((name, item, duration, time.time()))
+
+    @contextlib.contextmanager
+    def phase(self, name, item=None):
+        """ 在function中记录一个阶段的耗时: with progress_model.phase("copy", item): ... """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.time() - start, item)
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def throughput(self):
+        """ 最近THROUGHPUT_WINDOW秒内每秒完成的数量 """
+        now = self.end_time or time.time()
+        with self._lock:
+            while self._completion_times and self._completion_times[0] < now - self.THROUGHPUT_WINDOW:
+                self._completion_times.popleft()
+            recent_count = len(self._completion_times)
+        window = min(self.THROUGHPUT_WINDOW, now - self.start_time) if self.start_time else 0.0
+        if not recent_count or window <= 0:
+            return 0.0
+        return recent_count / window
+
+    def eta(self):
+        """ 剩余的秒数，不知道总数或者还没有完成任何item时为None """
+        throughput = self.throughput()
+        if not self.total_count or not throughput:
+            return None
+        return max(self.total_count - self.completed_count, 0) / throughput
+
+    def format_status(self):
+        """ 例如: 120 (of 2000)  35.2/s  ETA 0:00:53 """
+        text = "{0} (of {1})".format(self.completed_count, self.total_count or "?")
+        throughput = self.throughput()
+        if throughput:
+            text += "  {0:.1f}/s".format(throughput)
+        eta = self.eta()
+        if eta is not None and self.end_time is None:
+            text += "  ETA {0}".format(format_duration(eta))
+        return text
+
+    def phase_summary(self):
+        """ 每个阶段的数量、总耗时、平均和最长耗时，按总耗时从大到小排序 """
+        phases = collections.OrderedDict()
+        for name, item, duration, finished_at in self.records:
+            summary = phases.setdefault(name, {"phase": name, "count": 0, "total": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["total"] += duration
+            summary["max"] = max(summary["max"], duration)
+        for summary in phases.values():
+            summary["mean"] = summary["total"] / summary["count"]
+        return sorted(phases.values(), key=lambda summary: summary["total"], reverse=True)
+
+    def slowest_items(self, count=None):
+        item_records = [record for record in self.records if record[0] == self.TOTAL_PHASE]
+        item_records.sort(key=lambda record: record[2], reverse=True)
+        return [{"item": str(item), "duration": duration} for name, item, duration, finished_at in
+                item_records[:count or self.SLOWEST_ITEM_COUNT]]
+
+    def report(self):
+        return {
+            "total_count": self.total_count,
+            "completed_count": self.completed_count,
+            "elapsed": self.elapsed(),
+            "throughput": self.completed_count / self.elapsed() if self.elapsed() else 0.0,
+            "phases": self.phase_summary(),
+            "slowest_items": self.slowest_items(),
+        }
+
+    def write_report(self, path):
+        """ .csv保存每一条记录，其他后缀保存为包含汇总和每一条记录的json """
+        records = [(name, str(item) if item is not None else "", duration, finished_at - self.start_time)
+                   for name, item, duration, finished_at in self.records]
+        if path.lower().endswith(".csv"):
+            if sys.version_info[0] < 3:
+                report_file = open(path, "wb")
+            else:
+                report_file = open(path, "w", newline="")  # 否则windows上每行之间会多一个空行
+            with report_file:
+                writer = csv.writer(report_file)
+                writer.writerow(["phase", "item", "duration", "finished_at"])
+                writer.writerows(records)
+            return
+
+        report = self.report()
+        report["records"] = [{"phase": name, "item": item, "duration": duration, "finished_at": finished_at}
+                             for name, item, duration, finished_at in records]
+        with open(path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+class TaskRunner(QtCore.QObject):
+    """ 对每个item调用一次function，items可以是列表或者生成器，
+        进度信号最多每PROGRESS_INTERVAL秒发送一次，不会每个item都刷新界面 """
+
+    TIME_SLICE = 0.02  # 秒，每块最多占用主线程的时间
+    PROGRESS_INTERVAL = 0.1  # 秒，进度信号的最小间隔
+
+    started = QtCore.Signal(int)  # 总数，没有长度的生成器为0
+    progress_changed = QtCore.Signal(int, int)  # 已经完成的数量, 总数
+    failed = QtCore.Signal(str)  # 出错时的traceback，发送后停止执行
+    finished = QtCore.Signal(bool)  # 是否被取消或者出错
+
+    def __init__(self, parent=None):
+        super(TaskRunner, self).__init__(parent)
+
+        self.function = None
+        self.iterator = None
+        self.total_count = 0
+        self.completed_count = 0
+        self.progress_emit_count = 0
+        self.progress_model = ProgressModel()
+
+        self._last_progress_time = 0.0
+        self._in_slice = False
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(0)  # 处理完界面事件后马上执行下一块
+        self._timer.timeout.connect(self.run_slice)
+
+    def start(self, items, function):
+        """ 正在执行时返回False """
+        if self.is_running():
+            return False
+
+        self.function = function
+        self.iterator = iter(items)
+        try:
+            self.total_count = len(items)
+        except TypeError:
+            self.total_count = 0
+        self.completed_count = 0
+        self.progress_emit_count = 0
+        self.progress_model.start(self.total_count)
+
+        self.started.emit(self.total_count)
+        self.emit_progress()
+        self._timer.start()
+        return True
+
+    def cancel(self):
+        """ 当前的item执行完后停止，剩下的不会再执行 """
+        if self.is_running():
+            self.finish(True)
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def run_slice(self):
+        # 进度信号的槽中可能会处理事件(例如模态QProgressDialog.setValue会调用processEvents)，
+        # 这时定时器会再次触发，当前这一块还没有结束，不能嵌套执行
+        if self._in_slice:
+            return
+
+        self._in_slice = True
+        try:
+            self.run_items()
+        finally:
+            self._in_slice = False
+
+    def run_items(self):
+        end_time = time.time() + self.TIME_SLICE
+        try:
+            while True:
+                try:
+                    item = next(self.iterator)
+                except StopIteration:
+                    self.finish(False)
+                    return
+
+                item_start = time.time()
+                self.function(item)
+                self.progress_model.record_item(item, time.time() - item_start)
+                self.completed_count += 1
+                if not self.is_running():  # function中调用了cancel
+                    return
+                if time.time() >= end_time:
+                    break
+        except Exception:
+            self.failed.emit(traceback.format_exc())
+            self.finish(True)
+            return
+
+        if time.time() - self._last_progress_time >= self.PROGRESS_INTERVAL:
+            self.emit_progress()
+
+    def emit_progress(self):
+        self._last_progress_time = time.time()
+        self.progress_emit_count += 1
+        self.progress_changed.emit(self.completed_count, self.total_count)
+
+    def finish(self, cancelled):
+        self._timer.stop()
+        self.progress_model.finish()
+        self.emit_progress()  # 最后的进度总是发送
+        self.function = None
+        self.iterator = None
+        self.finished.emit(cancelled)
+
+
+class _WorkQueue(object):
+    """ 所有工作线程共用的item迭代器，取item时加锁 """
+
+    DONE = object()
+
+    def __init__(self, items, function):
+        self.function = function
+        self.cancelled = threading.Event()
+        self._iterator = iter(items)
+        self._lock = threading.Lock()
+
+    def next_item(self):
+        with self._lock:
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                return self.DONE
+
+
+class _WorkerSignals(QtCore.QObject):
+    """ 在主线程中创建，工作线程发送的信号会自动排队到主线程执行 """
+
+    results_ready = QtCore.Signal(object)  # [(item, 结果, 耗时), ...]
+    failed = QtCore.Signal(str)
+    worker_finished = QtCore.Signal()
+
+
+class _Worker(QtCore.QRunnable):
+    """ 一个工作线程: 不断从队列中取item执行，直到全部完成或者被取消，结果分批发送 """
+
+    BATCH_INTERVAL = 0.05  # 秒，结果最多等待这么久就发送一次
+
+    def __init__(self, work_queue, signals):
+        super(_Worker, self).__init__()
+
+        self.work_queue = work_queue
+        self.signals = signals
+
+    def run(self):
+        batch = []
+        last_emit_time = time.time()
+        try:
+            while not self.work_queue.cancelled.is_set():
+                item = self.work_queue.next_item()
+                if item is _WorkQueue.DONE:
+                    break
+
+                item_start = time.time()
+                result = self.work_queue.function(item)
+                batch.append((item, result, time.time() - item_start))
+                if time.time() - last_emit_time >= self.BATCH_INTERVAL:
+                    self.signals.results_ready.emit(batch)
+                    batch = []
+                    last_emit_time = time.time()
+        except Exception:
+            self.signals.failed.emit(traceback.format_exc())
+        finally:
+            if batch:
+                self.signals.results_ready.emit(batch)
+            self.signals.worker_finished.emit()
+
+
+class ThreadPoolTaskRunner(QtCore.QObject):
+    """ 和TaskRunner的信号一样，function在QThreadPool的max_workers个线程中执行，不能访问maya场景。
+        需要访问场景的部分放在scene_function(item, 结果)中，结果排队回到主线程后和TaskRunner一样分块执行。
+        所有工作线程退出并且主线程的队列处理完后才发送finished """
+
+    TIME_SLICE = TaskRunner.TIME_SLICE
+    PROGRESS_INTERVAL = TaskRunner.PROGRESS_INTERVAL
+
+    WORKER_PHASE = "worker"  # progress_model中function和scene_function的阶段名
+    SCENE_PHASE = "scene"
+
+    started = QtCore.Signal(int)  # 总数，没有长度的生成器为0
+    progress_changed = QtCore.Signal(int, int)  # 已经完成的数量, 总数
+    failed = QtCore.Signal(str)  # 出错时的traceback，发送后取消剩下的item
+    finished = QtCore.Signal(bool)  # 是否被取消或者出错
+
+    def __init__(self, max_workers=None, parent=None):
+        super(ThreadPoolTaskRunner, self).__init__(parent)
+
+        self.thread_pool = QtCore.QThreadPool(self)  # 不使用全局线程池，避免和maya的其他任务抢线程
+        if max_workers:
+            self.thread_pool.setMaxThreadCount(max_workers)
+
+        self.work_queue = None
+        self.scene_function = None
+        self.total_count = 0
+        self.completed_count = 0
+        self.progress_emit_count = 0
+        self.progress_model = ProgressModel()
+
+        self._scene_queue = collections.deque()  # 等待在主线程中执行scene_function的(item, 结果, 工作线程中的耗时)
+        self._active_workers = 0
+        self._cancelled = False
+        self._last_progress_time = 0.0
+        self._in_scene_slice = False
+
+        self._signals = _WorkerSignals(self)
+        self._signals.results_ready.connect(self.on_results_ready)
+        self._signals.failed.connect(self.on_worker_failed)
+        self._signals.worker_finished.connect(self.on_worker_finished)
+
+        self._scene_timer = QtCore.QTimer(self)
+        self._scene_timer.setInterval(0)
+        self._scene_timer.timeout.connect(self.run_scene_slice)
+
+    def max_workers(self):
+        return self.thread_pool.maxThreadCount()
+
+    def set_max_workers(self, max_workers):
+        self.thread_pool.setMaxThreadCount(max_workers)
+
+    def start(self, items, function, scene_function=None):
+        """ 正在执行(包括取消后等待工作线程退出)时返回False """
+        if self.is_running():
+            return False
+
+        self.work_queue = _WorkQueue(items, function)
+        self.scene_function = scene_function
+        try:
+            self.total_count = len(items)
+        except TypeError:
+            self.total_count = 0
+        self.completed_count = 0
+        self.progress_emit_count = 0
+        self.progress_model.start(self.total_count)
+        self._cancelled = False
+
+        self.started.emit(self.total_count)
+        self.emit_progress()
+
+        self._active_workers = self.max_workers()
+        for i in range(self._active_workers):
+            self.thread_pool.start(_Worker(self.work_queue, self._signals))
+        return True
+
+    def cancel(self):
+        """ 工作线程执行完当前的item后退出，主线程中还没有执行的scene_function也不再执行 """
+        if not self.is_running():
+            return
+
+        self._cancelled = True
+        self.work_queue.cancelled.set()
+        self._scene_queue.clear()
+        self._scene_timer.stop()
+        self.finish_if_done()  # 工作线程都已经退出时马上结束
+
+    def wait(self):
+        """ 关闭界面时使用，等待所有工作线程退出 """
+        self.thread_pool.waitForDone()
+
+    def is_running(self):
+        return self._active_workers > 0 or bool(self._scene_queue)
+
+    def on_results_ready(self, results):
+        if self._cancelled:
+            return
+
+        for item, result, duration in results:
+            self.progress_model.record_phase(self.WORKER_PHASE, duration, item)
+
+        if self.scene_function:
+            self._scene_queue.extend(results)
+            if not self._scene_timer.isActive():
+                self._scene_timer.start()
+        else:
+            for item, result, duration in results:
+                self.progress_model.record_item(item, duration)
+            self.completed_count += len(results)
+            self.emit_progress_throttled()
+
+    def on_worker_failed(self, error):
+        self.failed.emit(error)
+        self.cancel()
+
+    def on_worker_finished(self):
+        self._active_workers -= 1
+        self.finish_if_done()
+
+    def run_scene_slice(self):
+        if self._in_scene_slice:  # 和TaskRunner.run_slice一样，不能在进度信号的槽中嵌套执行
+            return
+
+        self._in_scene_slice = True
+        try:
+            self.run_scene_items()
+        finally:
+            self._in_scene_slice = False
+
+    def run_scene_items(self):
+        end_time = time.time() + self.TIME_SLICE
+        try:
+            while self._scene_queue:
+                item, result, worker_duration = self._scene_queue.popleft()
+                item_start = time.time()
+                self.scene_function(item, result)
+                duration = time.time() - item_start
+                self.progress_model.record_phase(self.SCENE_PHASE, duration, item)
+                self.progress_model.record_item(item, worker_duration + duration)
+                self.completed_count += 1
+                if time.time() >= end_time:
+                    break
+        except Exception:
+            self.on_worker_failed(traceback.format_exc())
+
+        if not self._scene_queue:
+            self._scene_timer.stop()
+        self.emit_progress_throttled()
+        self.finish_if_done()
+
+    def emit_progress_throttled(self):
+        if time.time() - self._last_progress_time >= self.PROGRESS_INTERVAL:
+            self.emit_progress()
+
+    def emit_progress(self):
+        self._last_progress_time = time.time()
+        self.progress_emit_count += 1
+        self.progress_changed.emit(self.completed_count, self.total_count)
+
+    def finish_if_done(self):
+        if self.is_running() or self.work_queue is None:
+            return
+
+        self.progress_model.finish()
+        self.emit_progress()  # 最后的进度总是发送
+        self.work_queue = None
+        self.scene_function = None
+        self.finished.emit(self._cancelled)
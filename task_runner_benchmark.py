@@ -0,0 +1,307 @@
+# coding:utf-8
+# 任务执行器性能测试: 对比每一步都更新进度条并调用processEvents的循环和分块执行的TaskRunner
+# 在maya的脚本编辑器中: import task_runner_benchmark; task_runner_benchmark.main()
+# 在maya外(需要PySide2): python task_runner_benchmark.py
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from PySide2 import QtCore
+from PySide2 import QtWidgets
+
+import task_runner
+
+
+def do_work(i):
+    """ 模拟一次很短的操作 """
+    return sum(range(2000))
+
+
+class ProgressWidget(QtWidgets.QWidget):
+    """ 和进度条示例一样的标签和进度条 """
+
+    def __init__(self, total_count):
+        super(ProgressWidget, self).__init__()
+
+        self.label = QtWidgets.QLabel("Operation Progress")
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, total_count)
+        self.update_count = 0
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress_bar)
+
+    def update_progress(self, completed_count, total_count):
+        self.label.setText("Processing operation: {0} (of {1})".format(completed_count, total_count))
+        self.progress_bar.setValue(completed_count)
+        self.update_count += 1
+
+
+class EventLoopMonitor(object):
+    """ 用一个间隔很短的QTimer测量事件循环的最大间隔，相当于界面最慢的响应时间 """
+
+    def __init__(self):
+        self.max_gap = 0.0
+        self.last_time = None
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(1)
+        self.timer.timeout.connect(self.tick)
+
+    def tick(self):
+        now = time.time()
+        if self.last_time is not None:
+            self.max_gap = max(self.max_gap, now - self.last_time)
+        self.last_time = now
+
+    def start(self):
+        self.max_gap = 0.0
+        self.last_time = None
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+
+def run_process_events_loop(widget, item_count):
+    """ 旧的run_progress_test: 每一步都更新界面并且调用processEvents """
+    for i in range(1, item_count + 1):
+        do_work(i)
+        widget.update_progress(i, item_count)
+        QtCore.QCoreApplication.processEvents()
+
+
+def run_task_runner(widget, item_count):
+    runner = task_runner.TaskRunner()
+    runner.progress_changed.connect(widget.update_progress)
+    runner.start(range(1, item_count + 1), do_work)
+    while runner.is_running():
+        QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.WaitForMoreEvents)
+    return runner
+
+
+def benchmark(item_count=2000):
+    print("{0} operations".format(item_count))
+    monitor = EventLoopMonitor()
+
+    start = time.time()
+    for i in range(1, item_count + 1):
+        do_work(i)
+    work_time = time.time() - start
+    print("  work only:         {0:.4f}s".format(work_time))
+
+    for name, run in (("processEvents loop", run_process_events_loop), ("TaskRunner", run_task_runner)):
+        widget = ProgressWidget(item_count)
+        widget.show()
+        QtCore.QCoreApplication.processEvents()
+
+        monitor.start()
+        start = time.time()
+        run(widget, item_count)
+        elapsed = time.time() - start
+        monitor.stop()
+
+        assert widget.progress_bar.value() == item_count
+        print("  {0:18s} {1:.4f}s ({2:6.0f} items/s), {3:5d} progress updates, longest UI freeze {4:.1f} ms".format(
+            name + ":", elapsed, item_count / elapsed, widget.update_count, monitor.max_gap * 1000))
+        widget.close()
+        widget.deleteLater()
+
+
+def check_cancel():
+    """ 取消后剩下的item不再执行，出错时停止并发送traceback """
+    runner = task_runner.TaskRunner()
+    done = []
+    results = []
+    runner.finished.connect(results.append)
+
+    def cancel_at_ten(i):
+        done.append(i)
+        if i == 10:
+            runner.cancel()
+    runner.start(range(100), cancel_at_ten)
+    while runner.is_running():
+        QtCore.QCoreApplication.processEvents()
+    assert done == list(range(11)) and results == [True], (done, results)
+
+    errors = []
+    runner.failed.connect(errors.append)
+    runner.start(iter([1, 0, 2]), lambda i: 1 / i)  # 生成器没有长度，总数为0
+    while runner.is_running():
+        QtCore.QCoreApplication.processEvents()
+    assert runner.completed_count == 1 and "ZeroDivisionError" in errors[0] and results[-1] is True
+    print("TaskRunner cancel and errors - ok")
+
+
+def check_reentrant_progress():
+    """ 进度信号的槽中处理事件时(例如模态QProgressDialog.setValue)，TaskRunner和ThreadPoolTaskRunner不会嵌套执行下一块，
+        qt不会在定时器的槽中再次触发同一个定时器，这里在槽中直接调用执行下一块的方法 """
+    for runner in (task_runner.TaskRunner(), task_runner.ThreadPoolTaskRunner(max_workers=2)):
+        runner.PROGRESS_INTERVAL = 0.0  # 每一块结束时都发送进度
+        in_progress_slot = [False]
+        nested = []  # 在进度信号的槽中执行的item
+        done = []
+
+        def process_item(i, *args):
+            if in_progress_slot[0]:
+                nested.append(i)
+            time.sleep(0.0005)
+            done.append(i)
+
+        def process_events(completed_count, total_count, runner=runner):
+            in_progress_slot[0] = True
+            QtCore.QCoreApplication.processEvents()
+            if isinstance(runner, task_runner.TaskRunner):
+                runner.run_slice()
+            else:
+                runner.run_scene_slice()
+            in_progress_slot[0] = False
+
+        if isinstance(runner, task_runner.TaskRunner):
+            runner.start(range(200), process_item)
+        else:
+            runner.start(range(200), lambda i: i, process_item)
+        runner.progress_changed.connect(process_events)  # start中发送的第一次进度不在执行块中
+        run_until_finished(runner)
+        if not isinstance(runner, task_runner.TaskRunner):
+            runner.wait()
+        assert not nested and sorted(done) == list(range(200)), (type(runner).__name__, len(nested), len(done))
+    print("TaskRunner progress slots calling processEvents: no nested slices - ok")
+
+
+HASH_DATA = b"x" * (512 * 1024)
+
+
+def hash_file(i):
+    """ 模拟计算一个文件的hash，hashlib处理大块数据时会释放GIL """
+    return hashlib.md5(HASH_DATA).hexdigest()
+
+
+def copy_file(i):
+    """ 模拟复制文件等待磁盘，sleep时会释放GIL """
+    time.sleep(0.002)
+    return i
+
+
+def parse_cache(i):
+    """ 纯python的解析，一直持有GIL，多线程不会更快 """
+    return sum(int(value) for value in "1 2 3 4 5 6 7 8 9".split() * 50)
+
+
+def run_until_finished(runner):
+    while runner.is_running():
+        QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.WaitForMoreEvents)
+
+
+def benchmark_thread_pool(item_count=1000):
+    """ 1、4、8个工作线程的吞吐量，对比主线程的TaskRunner """
+    print("Thread pool throughput, {0} operations (items/s)".format(item_count))
+    print("  {0:12s} {1:>10s} {2:>10s} {3:>10s} {4:>10s}".format("", "main", "1 worker", "4 workers", "8 workers"))
+    for name, function in (("hash file", hash_file), ("copy file", copy_file), ("parse cache", parse_cache)):
+        rates = []
+
+        runner = task_runner.TaskRunner()
+        start = time.time()
+        runner.start(range(item_count), function)
+        run_until_finished(runner)
+        rates.append(item_count / (time.time() - start))
+
+        for worker_count in (1, 4, 8):
+            runner = task_runner.ThreadPoolTaskRunner(worker_count)
+            results = []
+            start = time.time()
+            runner.start(range(item_count), function, lambda item, result: results.append(item))
+            run_until_finished(runner)
+            rates.append(item_count / (time.time() - start))
+            assert sorted(results) == list(range(item_count))
+            assert runner.completed_count == item_count
+
+        print("  {0:12s} {1:10.0f} {2:10.0f} {3:10.0f} {4:10.0f}".format(name, *rates))
+
+
+def check_thread_pool_cancel():
+    """ 取消后工作线程都退出才发送finished，之后不会再执行scene_function """
+    runner = task_runner.ThreadPoolTaskRunner(4)
+    applied = []
+    results = []
+    runner.finished.connect(results.append)
+    runner.start(range(10000), copy_file, lambda item, result: applied.append(item))
+    QtCore.QTimer.singleShot(100, runner.cancel)
+    run_until_finished(runner)
+    applied_count = len(applied)
+    assert results == [True] and 0 < applied_count < 10000, (results, applied_count)
+    runner.wait()
+    QtCore.QCoreApplication.processEvents()
+    assert len(applied) == applied_count
+
+    errors = []
+    runner.failed.connect(errors.append)
+    runner.start(range(100), lambda i: 1 / (i - 50))
+    run_until_finished(runner)
+    assert "ZeroDivisionError" in errors[0] and results[-1] is True
+    print("ThreadPoolTaskRunner cancel and errors - ok ({0} applied before cancel)".format(applied_count))
+
+
+def check_progress_model():
+    """ 速度和剩余时间使用最近的完成时间，报告中可以找到最慢的阶段和item """
+    runner = task_runner.TaskRunner()
+    statuses = []
+    runner.progress_changed.connect(lambda completed_count, total_count: statuses.append(runner.progress_model.format_status()))
+
+    def export(i):
+        with runner.progress_model.phase("export", i):
+            time.sleep(0.03 if i == 7 else 0.001)
+        with runner.progress_model.phase("write", i):
+            time.sleep(0.002)
+    runner.start(range(200), export)
+    run_until_finished(runner)
+
+    model = runner.progress_model
+    phases = model.phase_summary()
+    assert [phase["phase"] for phase in phases] == ["total", "write", "export"] or \
+        [phase["phase"] for phase in phases] == ["total", "export", "write"], phases
+    assert model.slowest_items(1)[0]["item"] == "7", model.slowest_items(3)
+    assert "ETA" in statuses[1] and "ETA" not in statuses[-1], statuses
+
+    start = time.time()
+    for i in range(100000):
+        model.record_item(i, 0.0)
+    record_cost = (time.time() - start) / 100000
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        json_path = os.path.join(temp_dir, "report.json")
+        csv_path = os.path.join(temp_dir, "report.csv")
+        model.write_report(json_path)
+        model.write_report(csv_path)
+        with open(json_path) as report_file:
+            report = json.load(report_file)
+        with open(csv_path) as report_file:
+            rows = list(csv.reader(report_file))
+        assert report["completed_count"] == 100200 and len(report["records"]) == len(rows) - 1
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print("ProgressModel: {0}, record cost {1:.2f} us per item".format(statuses[-1], record_cost * 1000000))
+    for phase in phases:
+        print("  {0:8s} {1:5d} items, total {2:.3f}s, mean {3:.2f} ms, max {4:.2f} ms".format(
+            phase["phase"], phase["count"], phase["total"], phase["mean"] * 1000, phase["max"] * 1000))
+
+
+def main():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    check_cancel()
+    check_progress_model()
+    check_reentrant_progress()
+    benchmark(2000)
+    benchmark(20000)
+    check_thread_pool_cancel()
+    benchmark_thread_pool()
+
+
+if __name__ == "__main__":
+    main()
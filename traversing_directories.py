@@ -1,5 +1,7 @@
 # coding:utf-8
 # 以树状结构显示指定路径下的所有内容，并且可以通过右键打开资源管理器并进入路径
+import os
+
 from PySide2 import QtCore
 from PySide2 import QtGui
 from PySide2 import QtWidgets
@@ -8,17 +10,31 @@ from shiboken2 import wrapInstance
 import maya.cmds as cmds
 import maya.OpenMayaUI as omui
 
+from directory_index import DirectoryIndex, DirectoryScanner, FuzzyPathIndex, INDEX_FILE_NAME
+
 def maya_main_window():
     main_window_ptr = omui.MQtUtil.mainWindow()
     return wrapInstance(long(main_window_ptr), QtWidgets.QWidget)
 
+
 class FileExplorerDialog(QtWidgets.QDialog):
 
     WINDOW_TITLE = "File Explorer"
 
-    DIRECTOR_PATH = "{0}scripts".format(cmds.internalVar(userAppDir=True))
+    DEFAULT_ROOT_PATH = "{0}scripts".format(cmds.internalVar(userAppDir=True))
+    INDEX_PATH = os.path.join(cmds.internalVar(userPrefDir=True), INDEX_FILE_NAME)  # 和TreeViewDialog共用目录索引
+
+    PATH_ROLE = QtCore.Qt.UserRole  # QtCore.Qt.UserRole可以理解为序号0,一个item可以拥有多个数据，因此可以通过QtCore.Qt.UserRole，QtCore.Qt.UserRole+1来设置数据的序号
+    IS_DIR_ROLE = QtCore.Qt.UserRole + 1
+    LOADED_ROLE = QtCore.Qt.UserRole + 2  # 目录的子节点是否已经读取
+
+    WATCH_DELAY = 200  # 毫秒，这段时间内同一个目录的多次变化只重新读取一次
+    SEARCH_DELAY = 100  # 输入停止后多少毫秒开始搜索，和TreeViewDialog一样
+
+    scan_requested = QtCore.Signal(str, int)  # 目录路径, scanner的generation
+    crawl_requested = QtCore.Signal(str, int)  # 根目录路径, crawler的generation
 
-    def __init__(self, parent=maya_main_window()):
+    def __init__(self, parent=maya_main_window(), root_path=None):
         super(FileExplorerDialog, self).__init__(parent)
 
         self.setWindowTitle(self.WINDOW_TITLE)
@@ -27,13 +43,38 @@ class FileExplorerDialog(QtWidgets.QDialog):
         elif cmds.about(macOS=True):
             self.setWindowFlags(QtCore.Qt.Tool)
 
+        self.root_path = root_path or self.DEFAULT_ROOT_PATH
+        self.dir_items = {}  # 目录路径 -> item，后台线程发送过来的结果通过它找到父节点
+        self.pending_dirs = set()  # 正在读取的目录
+        self.refreshing_dirs = {}  # 已经显示过的目录重新读取时 目录路径 -> 读取到的子节点，读取完成后和现有的子节点对比
+
+        self.directory_index = DirectoryIndex(self.INDEX_PATH)
+        self.scanner = DirectoryScanner(self.directory_index)
+        self.scan_thread = QtCore.QThread(self)
+        self.scanner.moveToThread(self.scan_thread) # scanner的槽函数会在scan_thread中按顺序执行
+
+        # 搜索用的文件名索引，另一个线程读取根目录下所有的文件，不会让展开目录等待
+        self.search_index = FuzzyPathIndex()
+        self.crawler = DirectoryScanner(self.directory_index)
+        self.crawl_thread = QtCore.QThread(self)
+        self.crawler.moveToThread(self.crawl_thread)
+
+        # 只监视展开的目录，目录变化时只重新读取这一个目录
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watched_dirs = set()
+        self.changed_dirs = set()
+        self.watch_timer = QtCore.QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(self.WATCH_DELAY)
+
         self.create_actions()
         self.create_widgets()
         self.create_layout()
         self.create_connections()
 
-        self.tree_wdg.setContextMenuPolicy(QtCore.Qt.CustomContextMenu) # 使Context菜单只针对tree_wdg
-        self.tree_wdg.customContextMenuRequested.connect(self.show_context_menu) # 使Context菜单为自定义的并给出菜单
+        for tree_wdg in (self.tree_wdg, self.results_wdg):
+            tree_wdg.setContextMenuPolicy(QtCore.Qt.CustomContextMenu) # 使Context菜单只针对tree_wdg
+            tree_wdg.customContextMenuRequested.connect(self.show_context_menu) # 使Context菜单为自定义的并给出菜单
 
         self.refresh_list()
 
@@ -41,74 +82,413 @@ class FileExplorerDialog(QtWidgets.QDialog):
         self.show_in_folder_action = QtWidgets.QAction("Show in Folder", self)
 
     def create_widgets(self):
-        self.path_label = QtWidgets.QLabel(self.DIRECTOR_PATH)
+        self.path_le = QtWidgets.QLineEdit(self.root_path)
+        self.browse_btn = QtWidgets.QPushButton("...")
+        self.browse_btn.setFixedWidth(30)
 
         self.tree_wdg = QtWidgets.QTreeWidget()
         self.tree_wdg.setHeaderHidden(True)
+        self.tree_wdg.setUniformRowHeights(True)
+
+        self.search_le = QtWidgets.QLineEdit()
+        self.search_le.setPlaceholderText("Search files...")
+        self.search_le.setClearButtonEnabled(True)
 
+        self.search_timer = QtCore.QTimer(self)  # 连续输入和后台读取到的每批文件只搜索一次
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY)
+
+        self.results_wdg = QtWidgets.QTreeWidget()  # 搜索结果按匹配程度排序显示
+        self.results_wdg.setHeaderLabels(["Name", "Folder"])
+        self.results_wdg.setRootIsDecorated(False)
+        self.results_wdg.setUniformRowHeights(True)
+        self.results_wdg.setColumnWidth(0, 200)
+
+        self.view_stack = QtWidgets.QStackedWidget()
+        self.view_stack.addWidget(self.tree_wdg)
+        self.view_stack.addWidget(self.results_wdg)
+
+        self.scan_progress_bar = QtWidgets.QProgressBar()
+        self.scan_progress_bar.setTextVisible(False)
+        self.scan_progress_bar.setMaximumWidth(80)
+        self.scan_label = QtWidgets.QLabel()
+
+        self.cancel_btn = QtWidgets.QPushButton("Cancel")
         self.close_btn = QtWidgets.QPushButton("Close")
     
     def create_layout(self):
+        path_layout = QtWidgets.QHBoxLayout()
+        path_layout.addWidget(self.path_le)
+        path_layout.addWidget(self.browse_btn)
+
         button_layout = QtWidgets.QHBoxLayout()
+        button_layout.addWidget(self.scan_progress_bar)
+        button_layout.addWidget(self.scan_label)
         button_layout.addStretch()
+        button_layout.addWidget(self.cancel_btn)
         button_layout.addWidget(self.close_btn)
 
         main_layout = QtWidgets.QVBoxLayout(self)
         main_layout.setContentsMargins(2, 2, 2, 2) # 设置左上右下的边距
-        main_layout.addWidget(self.path_label)
-        main_layout.addWidget(self.tree_wdg)
+        main_layout.addLayout(path_layout)
+        main_layout.addWidget(self.search_le)
+        main_layout.addWidget(self.view_stack)
         main_layout.addLayout(button_layout)
     
     def create_connections(self):
+        self.path_le.editingFinished.connect(self.on_path_edited)
+        self.browse_btn.clicked.connect(self.browse_root_path)
+        self.tree_wdg.itemExpanded.connect(self.on_item_expanded)
+        self.tree_wdg.itemCollapsed.connect(self.on_item_collapsed)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watch_timer.timeout.connect(self.refresh_changed_dirs)
+
+        self.scan_requested.connect(self.scanner.scan)
+        self.scanner.entries_found.connect(self.add_entries)
+        self.scanner.progress_changed.connect(self.update_scan_progress)
+        self.scanner.finished.connect(self.on_scan_finished)
+
+        self.search_le.textChanged.connect(self.on_search_changed)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.crawl_requested.connect(self.crawler.crawl)
+        self.crawler.paths_found.connect(self.add_search_paths)
+        self.crawler.finished.connect(self.on_crawl_finished)
+
+        self.cancel_btn.clicked.connect(self.cancel_scan)
         self.close_btn.clicked.connect(self.close)
         self.show_in_folder_action.triggered.connect(self.show_in_folder)
 
+    def set_root_path(self, root_path):
+        """ 改变显示的根目录，启动时只需要读取这一个目录 """
+        self.root_path = root_path
+        self.path_le.setText(root_path)
+        self.refresh_list()
+
+    def on_path_edited(self):
+        root_path = self.path_le.text()
+        if root_path != self.root_path:
+            self.set_root_path(root_path)
+
+    def browse_root_path(self):
+        root_path = QtWidgets.QFileDialog.getExistingDirectory(self, "Select Directory", self.root_path)
+        if root_path:
+            self.set_root_path(root_path)
+
     def refresh_list(self):
-        """ 显示文件树状结构 """
+        """ 显示文件树状结构，只读取根目录，子目录展开时才读取 """
+        self.cancel_scan()
         self.tree_wdg.clear()
+        self.dir_items = {}
+        self.unwatch_dirs(self.watched_dirs)
+        self.changed_dirs = set()
 
-        self.add_children(None, self.DIRECTOR_PATH)
-    
-    def add_children(self, parent_item, dir_path):
-        """ 添加所有的子节点 """
-        directory = QtCore.QDir(dir_path) # 创建目录为dir_path的QDir对象
-        # entryList作用是得到目录下的所有文件的字符串列表，参数第一个是设置过滤器，这里是要所有项并且没有.和..   第二个是设置排列，目录在最上方并且不区分大小写
-        files_in_directory = directory.entryList(QtCore.QDir.NoDotAndDotDot | QtCore.QDir.AllEntries, QtCore.QDir.DirsFirst | QtCore.QDir.IgnoreCase) 
-
-        for file_name in files_in_directory:
-            self.add_child(parent_item, dir_path, file_name)
-
-    def add_child(self, parent_item, dir_path, file_name):
-        """ 实现添加子节点 """
-        file_path = "{0}/{1}".format(dir_path, file_name)
-        file_info = QtCore.QFileInfo(file_path)
+        self.request_scan(self.root_path)
+        self.request_crawl()
+        self.watch_dir(self.root_path)  # 根目录一直都是展开的
+
+    def request_scan(self, dir_path, refresh=False):
+        """ 在后台线程中读取目录，界面不会卡住。refresh为True时是重新读取已经显示的目录，不显示进度 """
+        if not self.scan_thread.isRunning():
+            self.scan_thread.start()
+
+        self.pending_dirs.add(dir_path)
+        if refresh:
+            self.refreshing_dirs[dir_path] = []
+        else:
+            self.set_scanning(True)
+        self.scan_requested.emit(dir_path, self.scanner.generation)
+
+    def cancel_scan(self):
+        """ 停止正在读取的目录，没有读取完的目录下次展开时重新读取 """
+        if not self.pending_dirs:
+            return
+
+        self.scanner.cancel()
+        for dir_path in self.pending_dirs:
+            if dir_path not in self.refreshing_dirs: # 重新读取的目录保留现有的子节点
+                self.reset_dir_item(dir_path)
+        self.pending_dirs = set()
+        self.refreshing_dirs = {}
+        self.set_scanning(False)
+        self.scan_label.setText("Cancelled")
+
+    def reset_dir_item(self, dir_path):
+        item = self.dir_items.get(dir_path)
+        if item:
+            item.takeChildren()
+            item.setData(0, self.LOADED_ROLE, False)
+            self.tree_wdg.collapseItem(item)
 
-        if file_info.suffix().lower() == "pyc": # 过滤后缀为pyc的文件
+    def set_scanning(self, scanning):
+        self.scan_progress_bar.setVisible(scanning)
+        self.cancel_btn.setEnabled(scanning)
+
+    def on_item_expanded(self, item):
+        """ 第一次展开目录时读取子节点，再次展开时重新读取收起期间可能变化的目录 """
+        if not item.data(0, self.IS_DIR_ROLE):
+            return
+
+        if not item.data(0, self.LOADED_ROLE):
+            item.setData(0, self.LOADED_ROLE, True)
+            self.request_scan(item.data(0, self.PATH_ROLE))
+            self.watch_dir(item.data(0, self.PATH_ROLE))
             return
 
-        item = QtWidgets.QTreeWidgetItem(parent_item, [file_name])
-        item.setData(0, QtCore.Qt.UserRole, file_path) # QtCore.Qt.UserRole可以理解为序号0,一个item可以拥有多个数据，因此可以通过QtCore.Qt.UserRole，QtCore.Qt.UserRole+1来设置数据的序号
+        # 收起时展开的子目录会一起显示出来，但是不会发出itemExpanded信号
+        for dir_path in self.expanded_dirs(item):
+            self.watch_dir(dir_path)
+            self.changed_dirs.add(dir_path)
+        self.refresh_changed_dirs()
+
+    def on_item_collapsed(self, item):
+        """ 收起的目录和里面的子目录都不需要监视 """
+        dir_path = item.data(0, self.PATH_ROLE)
+        self.unwatch_dirs([path for path in self.watched_dirs if path == dir_path or path.startswith(dir_path + "/")])
+
+    def expanded_dirs(self, item):
+        """ item和它下面所有展开并且已经读取的目录 """
+        dir_paths = []
+        items = [item]
+        while items:
+            item = items.pop()
+            if item.isExpanded() and item.data(0, self.LOADED_ROLE):
+                dir_paths.append(item.data(0, self.PATH_ROLE))
+                items.extend(item.child(row) for row in range(item.childCount()))
+        return dir_paths
+
+    def watch_dir(self, dir_path):
+        if dir_path not in self.watched_dirs and self.watcher.addPath(dir_path):
+            self.watched_dirs.add(dir_path)
+
+    def unwatch_dirs(self, dir_paths):
+        dir_paths = [dir_path for dir_path in dir_paths if dir_path in self.watched_dirs]
+        if dir_paths:
+            self.watcher.removePaths(dir_paths)
+            self.watched_dirs.difference_update(dir_paths)
+
+    def on_directory_changed(self, dir_path):
+        """ 一次操作通常会产生很多变化，收集起来等WATCH_DELAY后一起处理，每个目录只读取一次 """
+        self.changed_dirs.add(dir_path)
+        if not self.watch_timer.isActive(): # 不重新开始计时，一直有变化的目录也会定时更新
+            self.watch_timer.start()
+
+    def refresh_changed_dirs(self):
+        changed_dirs = self.changed_dirs
+        self.changed_dirs = set()
+        for dir_path in sorted(changed_dirs):
+            if dir_path not in self.watched_dirs:
+                continue
+            if dir_path in self.pending_dirs: # 正在读取的目录等读取完成后再处理
+                self.changed_dirs.add(dir_path)
+                continue
+            self.request_scan(dir_path, refresh=True)
+
+        if self.changed_dirs:
+            self.watch_timer.start()
 
-        if file_info.isDir():
-            """ 如果是文件夹就用add_children方法 """
-            self.add_children(item, file_info.absoluteFilePath())
+    def is_current_scan(self, generation, dir_path):
+        """ 已经取消的目录还在排队的结果不需要处理 """
+        return generation == self.scanner.generation and dir_path in self.pending_dirs
 
-        if not parent_item:
+    def add_entries(self, generation, dir_path, entries):
+        """ 添加后台线程发送过来的一批子节点，一次性添加到父节点下 """
+        if not self.is_current_scan(generation, dir_path):
+            return
+
+        if dir_path in self.refreshing_dirs: # 重新读取时等全部读取完成后再对比
+            self.refreshing_dirs[dir_path].extend(entries)
+            return
+
+        items = []
+        for file_name, file_path, is_dir, dir_has_children in entries:
+            items.append(self.create_item(file_name, file_path, is_dir, dir_has_children))
+
+        parent_item = self.dir_items.get(dir_path)
+        if parent_item:
+            parent_item.addChildren(items)
+        else:
             """ 将item添加到最顶层树结构中 """
-            self.tree_wdg.addTopLevelItem(item)
+            self.tree_wdg.addTopLevelItems(items)
+
+    def create_item(self, file_name, file_path, is_dir, dir_has_children):
+        item = QtWidgets.QTreeWidgetItem([file_name])
+        item.setData(0, self.PATH_ROLE, file_path)
+        item.setData(0, self.IS_DIR_ROLE, is_dir)
+
+        if is_dir:
+            self.dir_items[file_path] = item
+            item.setData(0, self.LOADED_ROLE, False)
+            if dir_has_children: # 子节点还没有创建，也要显示展开的箭头
+                item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
+            else:
+                item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.DontShowIndicator)
+        return item
+
+    def update_dir_item(self, dir_path, entries):
+        """ 只删除不存在的和添加新的子节点，没有变化的子节点和展开的子目录保持不变 """
+        parent_item = self.dir_items.get(dir_path)
+        if parent_item is None and dir_path != self.root_path: # 父目录更新时已经删除了
+            return
+
+        if parent_item:
+            children = [parent_item.child(row) for row in range(parent_item.childCount())]
+        else:
+            children = [self.tree_wdg.topLevelItem(row) for row in range(self.tree_wdg.topLevelItemCount())]
+
+        old_items = dict((item.data(0, self.PATH_ROLE), item) for item in children)
+        new_entries = dict((entry[1], entry) for entry in entries)
+        removed_paths = set()
+        for file_path, item in old_items.items():
+            entry = new_entries.get(file_path)
+            if entry is None or entry[2] != item.data(0, self.IS_DIR_ROLE): # 删除或者变成了不同的类型
+                removed_paths.add(file_path)
+        self.remove_items(parent_item, [old_items[file_path] for file_path in removed_paths])
+
+        added_files = []
+        for row, (file_name, file_path, is_dir, dir_has_children) in enumerate(entries):
+            if file_path in old_items and file_path not in removed_paths:
+                continue
+
+            # 子节点是排好序的，按顺序插入后位置和entries中的一样
+            item = self.create_item(file_name, file_path, is_dir, dir_has_children)
+            if parent_item:
+                parent_item.insertChild(row, item)
+            else:
+                self.tree_wdg.insertTopLevelItem(row, item)
+
+            if is_dir:
+                self.crawl_requested.emit(file_path, self.crawler.generation)  # 新目录里的文件也要能搜索到
+            else:
+                added_files.append(file_path)
+
+        if parent_item:
+            if entries:
+                parent_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
+            else:
+                parent_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.DontShowIndicator)
+
+        if added_files:
+            self.search_index.add_paths(added_files)
+        if (added_files or removed_paths) and self.search_le.text():
+            self.schedule_search()
+
+    def remove_items(self, parent_item, items):
+        """ 删除子节点，同时删除目录索引、监视和搜索索引中的路径 """
+        removed_files = []
+        for item in items:
+            file_path = item.data(0, self.PATH_ROLE)
+            if parent_item:
+                parent_item.removeChild(item)
+            else:
+                self.tree_wdg.takeTopLevelItem(self.tree_wdg.indexOfTopLevelItem(item))
+
+            if item.data(0, self.IS_DIR_ROLE):
+                prefix = file_path + "/"
+                removed_dirs = [path for path in self.dir_items if path == file_path or path.startswith(prefix)]
+                for dir_path in removed_dirs:
+                    del self.dir_items[dir_path]
+                self.unwatch_dirs(removed_dirs)
+                self.search_index.remove_directory(file_path)
+            else:
+                removed_files.append(file_path)
+        self.search_index.remove_paths(removed_files)
+
+    def update_scan_progress(self, generation, dir_path, done_count, total_count):
+        if not self.is_current_scan(generation, dir_path) or dir_path in self.refreshing_dirs:
+            return
+
+        self.scan_progress_bar.setRange(0, total_count)
+        self.scan_progress_bar.setValue(done_count)
+        self.scan_label.setText("Loading {0}... {1}/{2}".format(dir_path.rsplit("/", 1)[-1], done_count, total_count))
+
+    def on_scan_finished(self, generation, dir_path, cancelled):
+        if not self.is_current_scan(generation, dir_path):
+            return
+
+        self.pending_dirs.discard(dir_path)
+        if dir_path in self.refreshing_dirs:
+            self.update_dir_item(dir_path, self.refreshing_dirs.pop(dir_path))
+
+        if not self.pending_dirs:
+            self.set_scanning(False)
+            self.scan_label.setText("{0} items".format(self.count_loaded_items()))
+
+    def count_loaded_items(self):
+        count = self.tree_wdg.topLevelItemCount()
+        for item in self.dir_items.values():
+            count += item.childCount()
+        return count
+
+    def request_crawl(self):
+        """ 重新建立搜索索引，修改时间没变的目录直接使用磁盘上的目录索引 """
+        if not self.crawl_thread.isRunning():
+            self.crawl_thread.start()
+
+        self.crawler.cancel()
+        self.search_index.clear()
+        self.search_le.setPlaceholderText("Indexing files...")
+        self.crawl_requested.emit(self.root_path, self.crawler.generation)
+
+    def add_search_paths(self, generation, root_path, paths):
+        """ 后台线程读取到的文件增量添加到索引中，正在搜索时更新结果 """
+        if generation != self.crawler.generation:
+            return
+
+        self.search_index.add_paths(paths)
+        if self.search_le.text():
+            self.schedule_search()
+
+    def on_crawl_finished(self, generation, root_path, cancelled):
+        if generation == self.crawler.generation and not cancelled:
+            self.search_le.setPlaceholderText("Search {0} files...".format(len(self.search_index)))
+
+    def on_search_changed(self, text):
+        if text.strip():
+            self.search_timer.start()
+        else:  # 清空搜索时马上显示目录树
+            self.apply_search()
+
+    def schedule_search(self):
+        """ 索引变化后更新搜索结果，读取过程中每批路径不单独搜索 """
+        if not self.search_timer.isActive():
+            self.search_timer.start()
+
+    def apply_search(self):
+        """ 查找并显示排在前面的结果 """
+        self.search_timer.stop()
+
+        text = self.search_le.text()
+        if not text.strip():
+            self.view_stack.setCurrentWidget(self.tree_wdg)
+            self.results_wdg.clear()
+            return
+
+        items = []
+        for file_path in self.search_index.search(text):
+            dir_path, file_name = file_path.rsplit("/", 1)
+            item = QtWidgets.QTreeWidgetItem([file_name, os.path.relpath(dir_path, self.root_path)])
+            item.setData(0, self.PATH_ROLE, file_path)
+            item.setData(0, self.IS_DIR_ROLE, False)
+            item.setToolTip(0, file_path)
+            items.append(item)
+
+        self.results_wdg.clear()
+        self.results_wdg.addTopLevelItems(items)
+        self.view_stack.setCurrentWidget(self.results_wdg)
 
     def show_context_menu(self, pos):
         """ 自定义菜单 """
-        item = self.tree_wdg.itemAt(pos) # 鼠标位置处的item
+        tree_wdg = self.view_stack.currentWidget()
+        item = tree_wdg.itemAt(pos) # 鼠标位置处的item
         if not item:
             return
         
-        file_path = item.data(0, QtCore.Qt.UserRole) # 得到item里的数据
+        file_path = item.data(0, self.PATH_ROLE) # 得到item里的数据
         self.show_in_folder_action.setData(file_path) # 设置action对应的数据
 
         context_menu = QtWidgets.QMenu() # 创建一个菜单
         context_menu.addAction(self.show_in_folder_action) # 将action添加到菜单下
-        context_menu.exec_(self.tree_wdg.mapToGlobal(pos)) # 在鼠标位置处右键显示菜单
+        context_menu.exec_(tree_wdg.mapToGlobal(pos)) # 在鼠标位置处右键显示菜单
 
     def show_in_folder(self):
         file_path = self.show_in_folder_action.data()
@@ -157,6 +537,19 @@ class FileExplorerDialog(QtWidgets.QDialog):
             return True
         
         return False
+
+    def closeEvent(self, e):
+        super(FileExplorerDialog, self).closeEvent(e)
+        self.watch_timer.stop()
+        self.search_timer.stop()
+        self.unwatch_dirs(self.watched_dirs)
+        self.cancel_scan()
+        self.scan_thread.quit()
+        self.scan_thread.wait()
+        self.crawler.cancel()
+        self.crawl_thread.quit()
+        self.crawl_thread.wait()
+        self.directory_index.close()
     
     
 if __name__ == "__main__":
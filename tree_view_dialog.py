@@ -1,5 +1,8 @@
 # coding:utf-8
 # 为QTreeView使用已有模式的树状结构
+import fnmatch
+import os
+
 from PySide2 import QtCore
 from PySide2 import QtWidgets
 from PySide2 import QtGui
@@ -8,16 +11,209 @@ import maya.OpenMayaUI as omui
 import maya.OpenMaya as om
 import maya.cmds as cmds
 
+from directory_index import DirectoryIndex, DirectoryScanner, FuzzyPathIndex, INDEX_FILE_NAME, join_path
+
 
 def maya_main_window():
     main_window_ptr = omui.MQtUtil.mainWindow()
     return wrapInstance(long(main_window_ptr), QtWidgets.QWidget)
 
 
+class FileNode(object):
+    """ 文件树中的一个节点，children为None表示目录还没有读取 """
+
+    __slots__ = ("name", "path", "is_dir", "has_children", "parent", "row", "children")
+
+    def __init__(self, name, path, is_dir, has_children, parent=None, row=0):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.has_children = has_children
+        self.parent = parent
+        self.row = row
+        self.children = None
+
+
+class IndexedFileSystemModel(QtCore.QAbstractItemModel):
+    """ 代替QFileSystemModel，目录展开时才通过DirectoryIndex读取，修改时间没变的目录直接使用磁盘上的索引 """
+
+    def __init__(self, directory_index, parent=None):
+        super(IndexedFileSystemModel, self).__init__(parent)
+
+        self.directory_index = directory_index
+        self.name_filters = []
+        self.root_node = None
+
+        icon_provider = QtWidgets.QFileIconProvider()
+        self.dir_icon = icon_provider.icon(QtWidgets.QFileIconProvider.Folder)
+        self.file_icon = icon_provider.icon(QtWidgets.QFileIconProvider.File)
+
+    def setRootPath(self, root_path):
+        self.beginResetModel()
+        self.root_node = FileNode(os.path.basename(root_path), root_path, True, True)
+        self.endResetModel()
+
+    def setNameFilters(self, name_filters):
+        """ 和QFileSystemModel的setNameFilterDisables(False)一样，不匹配的文件直接隐藏，目录全部显示 """
+        self.beginResetModel()
+        self.name_filters = list(name_filters)
+        if self.root_node:
+            self.root_node.children = None
+        self.endResetModel()
+
+    def accepts_file(self, file_name):
+        if not self.name_filters:
+            return True
+        for name_filter in self.name_filters:
+            if fnmatch.fnmatch(file_name, name_filter):
+                return True
+        return False
+
+    def node_from_index(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.root_node
+
+    def filePath(self, index):
+        return self.node_from_index(index).path
+
+    def isDir(self, index):
+        return self.node_from_index(index).is_dir
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        parent_node = self.node_from_index(parent)
+        if not parent_node or not parent_node.children or row < 0 or row >= len(parent_node.children) or column != 0:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, parent_node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self.root_node:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent_node.row, 0, parent_node)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        node = self.node_from_index(parent)
+        if not node or node.children is None or parent.column() > 0:
+            return 0
+        return len(node.children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        """ 没有读取的目录使用索引中记录的结果，决定是否显示展开的箭头 """
+        node = self.node_from_index(parent)
+        if not node or not node.is_dir:
+            return False
+        if node.children is None:
+            return node.has_children
+        return len(node.children) > 0
+
+    def canFetchMore(self, parent):
+        node = self.node_from_index(parent)
+        return bool(node and node.is_dir and node.children is None)
+
+    def fetchMore(self, parent):
+        node = self.node_from_index(parent)
+        if not self.canFetchMore(parent):
+            return
+
+        children = []
+        for file_name, is_dir, dir_has_children in self.directory_index.list_directory(node.path):
+            if is_dir or self.accepts_file(file_name):
+                children.append(FileNode(file_name, join_path(node.path, file_name), is_dir, dir_has_children,
+                                         node, len(children)))
+
+        node.children = []
+        if not children:
+            return
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        node.children = children
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            return node.name
+        if role == QtCore.Qt.DecorationRole:
+            return self.dir_icon if node.is_dir else self.file_icon
+        if role == QtCore.Qt.ToolTipRole:
+            return node.path
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole and section == 0:
+            return "Name"
+        return None
+
+
+class SearchResultModel(QtCore.QAbstractTableModel):
+    """ 显示排好序的搜索结果，和IndexedFileSystemModel一样提供filePath和isDir """
+
+    HEADER_LABELS = ["Name", "Folder"]
+
+    def __init__(self, parent=None):
+        super(SearchResultModel, self).__init__(parent)
+
+        self.paths = []
+        self.file_icon = QtWidgets.QFileIconProvider().icon(QtWidgets.QFileIconProvider.File)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = paths
+        self.endResetModel()
+
+    def filePath(self, index):
+        return self.paths[index.row()]
+
+    def isDir(self, index):
+        return False
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.HEADER_LABELS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        path = self.paths[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            dir_path, file_name = path.rsplit("/", 1)
+            return file_name if index.column() == 0 else dir_path
+        if role == QtCore.Qt.DecorationRole and index.column() == 0:
+            return self.file_icon
+        if role == QtCore.Qt.ToolTipRole:
+            return path
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADER_LABELS[section]
+        return None
+
+
 class TreeViewDialog(QtWidgets.QDialog):
 
     WINDOW_TITLE = "Tree View Dialog"
 
+    INDEX_PATH = os.path.join(cmds.internalVar(userPrefDir=True), INDEX_FILE_NAME)  # 和FileExplorerDialog共用目录索引
+
+    SEARCH_DELAY = 100  # 输入停止后多少毫秒开始搜索，20万个文件时一次查找和显示大约10毫秒
+
+    crawl_requested = QtCore.Signal(str, int)  # 根目录路径, crawler的generation
+
     def __init__(self, parent=maya_main_window()):
         super(TreeViewDialog, self).__init__(parent)
 
@@ -29,40 +225,122 @@ class TreeViewDialog(QtWidgets.QDialog):
         self.create_layout()
         self.create_connections()
 
+        self.request_crawl()
+
     def create_widgets(self):
-        root_path = "{}scripts".format(cmds.internalVar(userAppDir=True))  # 得到maya脚本目录
+        self.root_path = "{}scripts".format(cmds.internalVar(userAppDir=True))  # 得到maya脚本目录
 
-        self.model = QtWidgets.QFileSystemModel() # 获得一个FileSystem模式
-        self.model.setRootPath(root_path)
+        # QFileSystemModel每次打开都会重新读取所有展开的目录，这里换成使用磁盘索引的模式
+        self.directory_index = DirectoryIndex(self.INDEX_PATH)
+        self.model = IndexedFileSystemModel(self.directory_index, self)
+        self.model.setRootPath(self.root_path)
+        self.model.setNameFilters(["*.py"])  # 只显示.py后缀的文件，目录全部显示
 
         self.tree_view = QtWidgets.QTreeView() # 创建QTreeView控件
         self.tree_view.setModel(self.model) # 为控件添加模式
-        self.tree_view.setRootIndex(self.model.index(root_path))
-        self.tree_view.hideColumn(1)
+        self.tree_view.setUniformRowHeights(True)
         self.tree_view.setColumnWidth(0, 240)
 
-        # self.model.setFilter(QtCore.QDir.Dirs | QtCore.QDir.NoDotAndDotDot)
+        # 搜索用的文件名索引，在后台线程中读取根目录下所有的文件
+        self.search_index = FuzzyPathIndex()
+        self.crawler = DirectoryScanner(self.directory_index)
+        self.crawl_thread = QtCore.QThread(self)
+        self.crawler.moveToThread(self.crawl_thread)
+
+        self.search_le = QtWidgets.QLineEdit()
+        self.search_le.setPlaceholderText("Search scripts...")
+        self.search_le.setClearButtonEnabled(True)
+
+        self.search_timer = QtCore.QTimer(self)  # 连续输入时只搜索一次
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY)
+
+        self.search_model = SearchResultModel(self)
+        self.results_view = QtWidgets.QTreeView()  # 有搜索内容时代替tree_view显示
+        self.results_view.setModel(self.search_model)
+        self.results_view.setRootIsDecorated(False)
+        self.results_view.setUniformRowHeights(True)
+        self.results_view.setColumnWidth(0, 240)
 
-        self.model.setNameFilters(["*.py"])  # 使只能选中.py后缀的文件
-        self.model.setNameFilterDisables(False)  # 将不能选中的文件进行隐藏
+        self.view_stack = QtWidgets.QStackedWidget()
+        self.view_stack.addWidget(self.tree_view)
+        self.view_stack.addWidget(self.results_view)
 
     def create_layout(self):
         main_layout = QtWidgets.QVBoxLayout(self)
         main_layout.setContentsMargins(2, 2, 2, 2)
-        main_layout.addWidget(self.tree_view)
+        main_layout.addWidget(self.search_le)
+        main_layout.addWidget(self.view_stack)
 
 
     def create_connections(self):
         self.tree_view.doubleClicked.connect(self.on_double_clicked)
+        self.results_view.doubleClicked.connect(self.on_double_clicked)
+
+        self.search_le.textChanged.connect(self.on_search_changed)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.crawl_requested.connect(self.crawler.crawl)
+        self.crawler.paths_found.connect(self.add_search_paths)
+        self.crawler.finished.connect(self.on_crawl_finished)
+
+    def request_crawl(self):
+        if not self.crawl_thread.isRunning():
+            self.crawl_thread.start()
+
+        self.crawler.cancel()
+        self.search_index.clear()
+        self.search_le.setPlaceholderText("Indexing scripts...")
+        self.crawl_requested.emit(self.root_path, self.crawler.generation)
+
+    def add_search_paths(self, generation, root_path, paths):
+        """ 和tree_view一样只搜索.py文件，正在搜索时更新结果 """
+        if generation != self.crawler.generation:
+            return
+
+        self.search_index.add_paths([path for path in paths if self.model.accepts_file(path.rsplit("/", 1)[-1])])
+        if self.search_le.text() and not self.search_timer.isActive():  # 读取过程中每批路径不单独搜索
+            self.search_timer.start()
+
+    def on_crawl_finished(self, generation, root_path, cancelled):
+        if generation == self.crawler.generation and not cancelled:
+            self.search_le.setPlaceholderText("Search {0} scripts...".format(len(self.search_index)))
+
+    def on_search_changed(self, text):
+        if text.strip():
+            self.search_timer.start()
+        else:  # 清空搜索时马上显示目录树
+            self.apply_search()
+
+    def apply_search(self):
+        """ 查找并显示排在前面的结果 """
+        self.search_timer.stop()
+
+        text = self.search_le.text()
+        if not text.strip():
+            self.view_stack.setCurrentWidget(self.tree_view)
+            self.search_model.set_paths([])
+            return
+
+        self.search_model.set_paths(self.search_index.search(text))
+        self.view_stack.setCurrentWidget(self.results_view)
 
     def on_double_clicked(self, index):
-        path = self.model.filePath(index)
+        model = index.model()  # 目录树或者搜索结果
+        path = model.filePath(index)
 
-        if self.model.isDir(index):
+        if model.isDir(index):
             print("Directory selected: {}".format(path))
         else:
             print("Directory selected: {}".format(path))
 
+    def closeEvent(self, e):
+        super(TreeViewDialog, self).closeEvent(e)
+        self.search_timer.stop()
+        self.crawler.cancel()
+        self.crawl_thread.quit()
+        self.crawl_thread.wait()
+        self.directory_index.close()
+
 
 if __name__ == '__main__':
     try: